@@ -10,24 +10,29 @@ import math
 sys.path.append(os.getcwd())
 
 from pipeline.models.xgb_baseline import load_xgb_model, load_full_data
-from pipeline.dataset_builder import build_sequence_dataset
+from pipeline.preprocessing import required_features
+from pipeline.similarity import TrajectoryIndex, last_windows
 from pipeline.models.transformer_model import RULTransformer
 from pipeline.models.uncertainty import predict_uncertainty as compute_mc_uncertainty
-from pipeline.models.train_transformer import DEVICE
+from pipeline.models.train_transformer import DEVICE, load_sequence_store
+from pipeline.models.window_dataset import WindowDataset
+from pipeline.models.model_meta import feature_mismatch
 
 # Configuration
-TRANSFORMER_RMSE = 11.6
+TRANSFORMER_RMSE = 16.9
 COMBINED_RMSE = 9.5
-MODEL_RMSE = 11.6
-MODEL_MAE = 6.3
+MODEL_RMSE = 16.9
+MODEL_MAE = 11.4
 TRANSFORMER_PATH = "pipeline/models/checkpoints/transformer.pt"
 WINDOW_SIZE = 50
-XGB_RMSE = 7.75
-TRANS_RMSE = 11.61
+XGB_RMSE = 7.96
+TRANS_RMSE = 16.88
 
 # Global State (Singleton pattern via module-level variables)
 _XGB_MODEL = None
 _TRANS_MODEL = None
+_SIM_INDEX = None
+_SEQ_STORE = None
 _FULL_DF = None
 _FEATURES = None
 _ENGINE_IDS = []
@@ -37,38 +42,49 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def _initialize_system():
-    global _XGB_MODEL, _TRANS_MODEL, _FULL_DF, _FEATURES, _ENGINE_IDS
+    global _XGB_MODEL, _TRANS_MODEL, _SIM_INDEX, _SEQ_STORE, _FULL_DF, _FEATURES, _ENGINE_IDS
     
     if _FULL_DF is not None:
         return # Already initialized
 
     logger.info("Initializing Inference Logic...")
 
-    # 1. Load Data (Once)
+    # 1. Load XGBoost (Once)
+    logger.info("Loading XGBoost Model...")
+    try:
+        _XGB_MODEL = load_xgb_model()
+    except Exception as e:
+        logger.error(f"Failed to load XGBoost: {e}")
+
+    # 2. Load Data (Once)
+    # Without a Transformer only the columns the booster reads (and their dependencies)
+    # have to be generated; the Transformer consumes every feature column.
+    required = None
+    if _XGB_MODEL is not None and not os.path.exists(TRANSFORMER_PATH):
+        required = required_features(_XGB_MODEL)
     logger.info("Loading full dataset via pipeline...")
-    _FULL_DF, _FEATURES = load_full_data()
+    _FULL_DF, _FEATURES = load_full_data(required=required)
     
     # Store unique Engine IDs (sorted)
     # _FULL_DF has 'engine_id' (int), 'cycle' (int), 'RUL', 'health_index', etc.
     _ENGINE_IDS = sorted(_FULL_DF['engine_id'].unique().tolist())
     logger.info(f"Loaded data for {len(_ENGINE_IDS)} engines.")
 
-    # 2. Load XGBoost (Once)
-    logger.info("Loading XGBoost Model...")
+    # Similarity index over the training HI trajectories (built in memory, cheap)
     try:
-        _XGB_MODEL = load_xgb_model()
+        _SIM_INDEX = TrajectoryIndex().build(_FULL_DF)
     except Exception as e:
-        logger.error(f"Failed to load XGBoost: {e}")
+        logger.error(f"Failed to build similarity index: {e}")
 
     # 3. Load Transformer (Once)
     logger.info("Loading Transformer Model...")
     if os.path.exists(TRANSFORMER_PATH):
         try:
-            # Determine input_dim from dataset features
-            # The pipeline uses features from load_full_data. 
-            # In verify_system we see input_dim is derived from X_seq shape.
-            # Here we assume X_seq features == _FEATURES
-            input_dim = len(_FEATURES) 
+            # Sequences come from the memory-mapped sequence store shared with training
+            # and evaluation (built once per version of the data); its features are the
+            # Transformer's training inputs
+            _SEQ_STORE = load_sequence_store(WINDOW_SIZE)
+            input_dim = len(_SEQ_STORE.features)
             
             _TRANS_MODEL = RULTransformer(
                 input_dim=input_dim, 
@@ -81,6 +97,9 @@ def _initialize_system():
             _TRANS_MODEL.load_state_dict(torch.load(TRANSFORMER_PATH, map_location=DEVICE))
             _TRANS_MODEL.eval()
             logger.info("Transformer Loaded Successfully.")
+            mismatch = feature_mismatch(TRANSFORMER_PATH)
+            if mismatch:
+                logger.warning(mismatch)
         except Exception as e:
             logger.error(f"Failed to load Transformer: {e}")
     else:
@@ -110,10 +129,20 @@ def _get_engine_data(eid):
         raise RuntimeError("System not initialized")
     return _FULL_DF[_FULL_DF['engine_id'] == eid]
 
+def _engine_sequences(eid, eng_df):
+    """
+    Sequences of one engine, from the sequence store or built from its rows without one.
+    Item i ends at row i of the engine (the first WINDOW_SIZE - 1 are shorter prefixes),
+    so early cycles can be scored too.
+    """
+    if _SEQ_STORE is not None:
+        return _SEQ_STORE.dataset(engines=[eid], window=WINDOW_SIZE, min_length=1)
+    return WindowDataset.from_frame(eng_df, _FEATURES, window=WINDOW_SIZE, min_length=1)
+
 def predict_rul(engine_id, cycle=None):
     """
     Returns RUL predictions for the specific engine.
-    Output: { "rul_xgb": float, "rul_transformer": float, "rul_combined": float }
+    Output: { "rul_xgb": float, "rul_transformer": float, "rul_similarity": float, "rul_combined": float }
     """
     eid = _parse_engine_id(engine_id)
     if eid not in _ENGINE_IDS:
@@ -161,27 +190,25 @@ def predict_rul(engine_id, cycle=None):
     rul_trans = 0.0
     if _TRANS_MODEL:
         try:
-            # Build sequence for THIS engine only
-            # We need at least 'window' rows.
-            # dataset_builder.build_sequence_dataset iterates. 
-            # We can pass this single-engine DF.
-            # Using _FEATURES as the feature set.
+            # Sequences of THIS engine only
+            # Before cycle WINDOW_SIZE the sequence is the shorter prefix up to 'idx'
             
             # Check length
-            if len(eng_df) >= WINDOW_SIZE:
-                X_seq, _ = build_sequence_dataset(eng_df, _FEATURES, window=WINDOW_SIZE)
+            if len(eng_df) > 0:
+                X_seq = _engine_sequences(eid, eng_df)
                 
                 if len(X_seq) > 0:
                     # Target sequence ending at 'idx'
-                    # X_seq[i] corresponds to window ending at i + window_size
-                    seq_idx = idx - WINDOW_SIZE
+                    # X_seq[i] corresponds to the sequence ending at row i
+                    seq_idx = idx
                     
                     if 0 <= seq_idx < len(X_seq):
                         logger.info(f"Using sequence index {seq_idx} (Engine Index {idx})")
-                        last_seq = X_seq[seq_idx]
+                        # A single sample is unpadded, so its mask is not needed
+                        last_seq, _, _ = X_seq[seq_idx]
                         
-                        # Tensorize
-                        seq_tensor = torch.tensor(last_seq, dtype=torch.float32).unsqueeze(0).to(DEVICE)
+                        # Window sliced from the stored rows (float32)
+                        seq_tensor = last_seq.unsqueeze(0).to(DEVICE)
                         
                         with torch.no_grad():
                             pred, weights = _TRANS_MODEL(seq_tensor, return_attention=True)
@@ -190,7 +217,7 @@ def predict_rul(engine_id, cycle=None):
                             # Process Attention Weights
                             # Shape: [1, nhead, seq_len, seq_len]
                             # Average across heads: [1, seq_len, seq_len]
-                            attn_avg = weights.mean(dim=1)  # [1, 50, 50]
+                            attn_avg = weights.mean(dim=1)  # [1, 50, 50] (shorter for early cycles)
                             
                             # Downsample to 10x10
                             # Use Adaptive Average Pooling
@@ -209,6 +236,15 @@ def predict_rul(engine_id, cycle=None):
             logger.error(f"Transformer inference error: {e}")
             attn_map = []  # Ensure variable exists on error
 
+    # Similarity Inference (HI window ending at idx, matched against the other engines)
+    rul_sim = 0.0
+    if _SIM_INDEX is not None:
+        try:
+            _, query = last_windows(eng_df.iloc[:idx + 1], _SIM_INDEX.window)
+            rul_sim = float(_SIM_INDEX.predict(query, exclude=eid)[0])
+        except Exception as e:
+            logger.error(f"Similarity inference error: {e}")
+
     # Fallback / Combination logic
     final_rul = rul_xgb
     if rul_trans != 0:
@@ -229,6 +265,7 @@ def predict_rul(engine_id, cycle=None):
     return {
         "rul_xgb": round(rul_xgb, 2),
         "rul_transformer": round(rul_trans, 2),
+        "rul_similarity": round(rul_sim, 2),
         "rul_combined": round(final_rul, 2),
         "rmse": MODEL_RMSE,
         "rmse_xgb": XGB_RMSE,
@@ -252,18 +289,20 @@ def predict_uncertainty(engine_id):
         return {"uncertainty": 0.0, "confidence": 0.0}
 
     eng_df = _get_engine_data(eid)
-    if len(eng_df) < WINDOW_SIZE:
+    if eng_df.empty:
         return {"uncertainty": 0.0, "confidence": 0.0}
 
     try:
         # Get last sequence
-        X_seq, _ = build_sequence_dataset(eng_df, _FEATURES, window=WINDOW_SIZE)
+        X_seq = _engine_sequences(eid, eng_df)
         if len(X_seq) == 0:
              return {"uncertainty": 0.0, "confidence": 0.0}
              
-        idx = len(X_seq) // 2
-        last_seq = X_seq[idx]
-        seq_tensor = torch.tensor(last_seq, dtype=torch.float32).unsqueeze(0).to(DEVICE)
+        # Middle full window (the last prefix for engines shorter than the window)
+        n = len(X_seq)
+        idx = WINDOW_SIZE - 1 + (n - WINDOW_SIZE + 1) // 2 if n >= WINDOW_SIZE else n - 1
+        last_seq, _, _ = X_seq[idx]
+        seq_tensor = last_seq.unsqueeze(0).to(DEVICE)
         
         # Run MC Dropout
         mean_preds, std_preds, _ = compute_mc_uncertainty(_TRANS_MODEL, seq_tensor, n_samples=30)
@@ -0,0 +1,98 @@
+"""
+Benchmark: the pandas and polars execution backends of PreprocessingPipeline.
+
+Run from the project root:
+    python benchmarks/bench_backends.py [--rows 2000000] [--backends pandas polars] [--tol 1e-4]
+
+Writes train_FD001 replicated with fresh engine ids to a temporary CMAPSS file of
+about --rows rows, then times load + fit_transform on every backend (the pandas
+backend loads through load_fleet without the label cache) and compares every
+backend's frame to the first one's, column by column in units of the reference
+column's standard deviation. Exits with status 1 if the columns differ or any
+column is further apart than `--tol` (the BACKEND_TOLERANCE contract). The
+polars backend needs the optional polars package; the timings only hold for the
+host's CPU count, which is printed with them.
+"""
+import sys
+import os
+import time
+import tempfile
+import argparse
+
+sys.path.append(os.getcwd())
+
+import numpy as np
+from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.data_loader import load_fleet
+from pipeline.backends import get_backend, BACKEND_TOLERANCE
+from pipeline.preprocessing import PreprocessingPipeline
+
+
+def write_fleet_file(path, n_rows):
+    with open(os.path.join(DATA_PATH, TRAIN_FILE)) as f:
+        lines = [line.split(' ', 1) for line in f]
+    n_engines = max(int(engine) for engine, _ in lines)
+    copies = -(-n_rows // len(lines))
+    with open(path, 'w') as f:
+        for k in range(copies):
+            f.writelines(f"{int(engine) + k * n_engines} {rest}" for engine, rest in lines)
+
+
+def run(name, path):
+    preprocessor = PreprocessingPipeline(backend=name)
+    backend = get_backend(name)
+    start = time.perf_counter()
+    if backend.name == "pandas":
+        df = load_fleet(path, use_cache=False)
+    else:
+        df = backend.load(path)
+    df_final = preprocessor.fit_transform(df)
+    return time.perf_counter() - start, df_final
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--backends", nargs="+", default=["pandas", "polars"])
+    parser.add_argument("--tol", type=float, default=BACKEND_TOLERANCE,
+                        help="max allowed |difference| in reference column standard deviations")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "train_fleet.txt")
+        write_fleet_file(path, args.rows)
+
+        results = []
+        reference = None
+        for name in args.backends:
+            t, df_final = run(name, path)
+            if reference is None:
+                # The reference columns wait on disk, so only one frame is in memory at a time
+                reference = list(df_final.columns)
+                for i, c in enumerate(reference):
+                    np.save(os.path.join(tmp, f"ref{i}.npy"), df_final[c].to_numpy())
+                err, worst = 0.0, "-"
+            elif list(df_final.columns) != reference:
+                err, worst = np.inf, "columns differ"
+            else:
+                err, worst = 0.0, "-"
+                for i, c in enumerate(reference):
+                    a = df_final[c].to_numpy(np.float64)
+                    b = np.load(os.path.join(tmp, f"ref{i}.npy"), mmap_mode='r').astype(np.float64)
+                    diff = float(np.abs(a - b).max()) / (float(b.std()) or 1.0)
+                    if diff > err:
+                        err, worst = diff, c
+            results.append((name, t, len(df_final), err, worst))
+            del df_final
+
+    print(f"\n{results[0][2]} rows, {os.cpu_count()} CPUs")
+    for name, t, _, err, worst in results:
+        print(f"  {name:<8} {t:8.2f}s  x{results[0][1] / t:5.2f}  (max diff {err:.1e} std, {worst})")
+
+    ok = all(err <= args.tol for _, _, _, err, _ in results)
+    print(f"tolerance {args.tol:.0e} std: {'PASS' if ok else 'FAIL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
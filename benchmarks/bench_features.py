@@ -0,0 +1,142 @@
+"""
+Benchmark: add_degradation_features vs. the previous column-by-column implementation.
+
+Run from the project root:
+    python benchmarks/bench_features.py [--sizes 20000 2000000 20000000] [--sensor-scaling]
+
+Builds normalized FD001 frames of the requested sizes (train_FD001 replicated with
+fresh engine ids), then times the current stage against the previous one, which
+inserted ~7 columns per sensor one at a time and masked engine boundaries with a
+Python loop over engine starts. The previous trend looked forward (slope of the
+next window_long readings); the current one is trailing, so the trend columns are
+compared against the previous ones shifted by window_long - 1 rows. 20M rows need roughly 25 GB of RAM, so the
+default sizes stop at 2M.
+
+--sensor-scaling additionally times the current stage on 200k rows with the kept
+sensors replicated 1x, 2x and 4x, to show the cost per sensor as sensors are added.
+"""
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.getcwd())
+
+import numpy as np
+import pandas as pd
+from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.data_loader import load_and_label, SETTING_COLS
+from pipeline.sensor_cleaner import remove_constant_sensors
+from pipeline.normalizer import normalize_dataframe
+from pipeline.feature_engineering import add_degradation_features
+
+
+def legacy_add_degradation_features(df, sensor_cols, window_short=5, window_long=10):
+    """The feature stage before the preallocated block (kept here for comparison only)."""
+    df_feat = df.sort_values(by=['engine_id', 'cycle'])
+    x_long = np.arange(window_long)
+    w_long = x_long - x_long.mean()
+    denom_long = (w_long**2).sum()
+
+    for sensor in sensor_cols:
+        vals = df_feat[sensor].values
+        s_series = df_feat[sensor]
+        df_feat[f'{sensor}_rm{window_short}'] = s_series.rolling(window=window_short).mean().fillna(0)
+        df_feat[f'{sensor}_rm{window_long}'] = s_series.rolling(window=window_long).mean().fillna(0)
+        df_feat[f'{sensor}_rs{window_short}'] = s_series.rolling(window=window_short).std().fillna(0)
+        df_feat[f'{sensor}_rs{window_long}'] = s_series.rolling(window=window_long).std().fillna(0)
+        df_feat[f'{sensor}_delta'] = s_series.diff().fillna(0)
+        conv = np.convolve(vals, w_long[::-1], mode='full')[window_long - 1 : len(vals) + window_long - 1]
+        df_feat[f'{sensor}_trend'] = conv / denom_long
+
+    ids = df_feat['engine_id'].values
+    start_indices = np.insert(np.where(ids[:-1] != ids[1:])[0] + 1, 0, 0)
+    for idx in start_indices:
+        for sensor in sensor_cols:
+            df_feat.at[idx, f'{sensor}_delta'] = 0
+    for w in [window_short, window_long]:
+        mask = np.ones(len(df_feat), dtype=bool)
+        for idx in start_indices:
+            mask[idx : min(idx + w - 1, len(df_feat))] = False
+        cols_w = [c for c in df_feat.columns
+                  if c.endswith(f'_rm{w}') or c.endswith(f'_rs{w}') or c.endswith('_trend') and w == window_long]
+        df_feat.loc[~mask, cols_w] = 0.0
+
+    base_mask = df_feat['cycle'] <= 20
+    for sensor in sensor_cols:
+        stats = df_feat[base_mask].groupby('engine_id')[sensor].agg(['mean', 'std'])
+        df_feat[f'{sensor}_mean'] = df_feat['engine_id'].map(stats['mean'])
+        df_feat[f'{sensor}_std'] = df_feat['engine_id'].map(stats['std'])
+        df_feat[f'{sensor}_drift'] = (df_feat[sensor] - df_feat[f'{sensor}_mean']) / (df_feat[f'{sensor}_std'] + 1e-9)
+        df_feat.drop(columns=[f'{sensor}_mean', f'{sensor}_std'], inplace=True)
+    return df_feat.fillna(0)
+
+
+def normalized_frame(n_rows):
+    df = load_and_label(os.path.join(DATA_PATH, TRAIN_FILE), use_cache=False)
+    df_clean, kept = remove_constant_sensors(df)
+    df_norm, _ = normalize_dataframe(df_clean, SETTING_COLS + kept)
+
+    copies = -(-n_rows // len(df_norm))
+    n_engines = int(df_norm['engine_id'].max())
+    parts = []
+    for k in range(copies):
+        part = df_norm.copy()
+        part['engine_id'] += k * n_engines
+        parts.append(part)
+    big = pd.concat(parts, ignore_index=True)
+    # Cut on an engine boundary at or after n_rows
+    ids = big['engine_id'].to_numpy()
+    end = n_rows + np.argmax(ids[n_rows:] != ids[n_rows - 1]) if n_rows < len(big) else len(big)
+    return big.iloc[:end].reset_index(drop=True), kept
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 2_000_000])
+    parser.add_argument("--sensor-scaling", action="store_true")
+    args = parser.parse_args()
+
+    if args.sensor_scaling:
+        df, kept = normalized_frame(200_000)
+        print(f"\nSensor scaling, {len(df)} rows")
+        for copies in [1, 2, 4]:
+            extra = {f'{s}x{k}': df[s] for k in range(1, copies) for s in kept}
+            wide = pd.concat([df, pd.DataFrame(extra)], axis=1) if extra else df
+            sensors = kept + list(extra)
+            t, _ = timed(lambda: add_degradation_features(wide, sensors))
+            print(f"  {len(sensors):3d} sensors  {t:6.2f}s  ({1e3 * t / len(sensors):.1f} ms per sensor)")
+
+    for n_rows in args.sizes:
+        df, kept = normalized_frame(n_rows)
+        print(f"\n{len(df)} rows, {len(kept)} sensors")
+
+        t_new, new = timed(lambda: add_degradation_features(df, kept))
+        t_old, old = timed(lambda: legacy_add_degradation_features(df, kept))
+
+        # Column by column to keep the comparison itself from doubling memory
+        pos = new.groupby('engine_id').cumcount().to_numpy()
+        lag = 10 - 1
+        err = 0.0
+        for col in [c for c in old.columns if c not in df.columns]:
+            a = new[col].to_numpy(np.float64)
+            b = old[col].to_numpy(np.float64)
+            if col.endswith('_trend'):
+                # Trailing slope at t == forward slope at t - lag (both complete in the engine)
+                keep = pos[lag:] >= 2 * lag
+                a, b = a[lag:][keep], b[:-lag][keep]
+            err = max(err, float((np.abs(a - b) / (np.abs(b) + 1)).max()))
+        blocks = new._mgr.nblocks if hasattr(new, '_mgr') else float('nan')
+        print(f"  previous    {t_old:8.2f}s")
+        print(f"  block       {t_new:8.2f}s  x{t_old / t_new:5.2f}  ({blocks} blocks, max rel diff {err:.1e})")
+        del new, old, df
+
+
+if __name__ == "__main__":
+    main()
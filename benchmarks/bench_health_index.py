@@ -0,0 +1,104 @@
+"""
+Benchmark: HealthIndexModel fit methods and transform vs. the previous add_health_index.
+
+Run from the project root:
+    python benchmarks/bench_health_index.py [--sizes 20000 2000000]
+
+Builds FD001 feature frames of the requested sizes (train_FD001 replicated with
+fresh engine ids), then times the previous HI stage (full-SVD PCA on the whole
+feature matrix, MinMaxScaler, groupby/lambda rolling smoothing) against
+HealthIndexModel.fit_transform with every fit method, and the fitted model's
+transform (projection + segmented smoothing) on the same frame. Differences are
+the largest absolute difference of health_index to the previous stage;
+"incremental" is an approximation of the leading component, the others are exact.
+"""
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.getcwd())
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import MinMaxScaler
+from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.data_loader import load_and_label, SETTING_COLS
+from pipeline.sensor_cleaner import remove_constant_sensors
+from pipeline.normalizer import normalize_dataframe
+from pipeline.feature_engineering import add_degradation_features
+from pipeline.health_index import HealthIndexModel, HI_FIT_METHODS, select_health_features
+
+
+def legacy_add_health_index(df, feature_cols):
+    """The HI stage before HealthIndexModel (kept here for comparison only)."""
+    df_hi = df.copy()
+    selected = select_health_features(feature_cols)
+    pca = PCA(n_components=1)
+    df_hi['health_index_raw'] = pca.fit_transform(df_hi[selected])
+    dtype = df_hi[selected[0]].dtype
+    df_hi['health_index_raw'] = df_hi.groupby('engine_id')['health_index_raw'].transform(
+        lambda x: x.rolling(window=5, min_periods=1).mean()
+    ).astype(dtype)
+    df_hi['health_index'] = MinMaxScaler().fit_transform(df_hi[['health_index_raw']])
+    if df_hi['health_index'].corr(df_hi['cycle']) > 0:
+        df_hi['health_index'] = 1 - df_hi['health_index']
+    df_hi['health_index'] = df_hi['health_index'].astype(dtype)
+    return df_hi
+
+
+def feature_frame(n_rows):
+    df = load_and_label(os.path.join(DATA_PATH, TRAIN_FILE), use_cache=False)
+    df_clean, kept = remove_constant_sensors(df)
+    df_norm, _ = normalize_dataframe(df_clean, SETTING_COLS + kept)
+
+    copies = -(-n_rows // len(df_norm))
+    n_engines = int(df_norm['engine_id'].max())
+    parts = []
+    for k in range(copies):
+        part = df_norm.copy()
+        part['engine_id'] += k * n_engines
+        parts.append(part)
+    big = pd.concat(parts, ignore_index=True)
+    df_feat = add_degradation_features(big, kept, inplace=True)
+    return df_feat, [c for c in df_feat.columns if c not in ['engine_id', 'cycle', 'RUL']]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 2_000_000])
+    args = parser.parse_args()
+
+    for n_rows in args.sizes:
+        df, feature_cols = feature_frame(n_rows)
+        t_old, old = timed(lambda: legacy_add_health_index(df, feature_cols))
+        reference = old['health_index'].to_numpy(np.float64)
+        del old
+
+        rows = []
+        model = None
+        for method in HI_FIT_METHODS:
+            model = HealthIndexModel(method=method)
+            t, out = timed(lambda: model.fit_transform(df, feature_cols))
+            rows.append((f"fit {method}", t, np.abs(out['health_index'].to_numpy(np.float64) - reference).max()))
+            del out
+        t, out = timed(lambda: model.transform(df))
+        rows.append(("transform", t, np.abs(out['health_index'].to_numpy(np.float64) - reference).max()))
+        del out
+
+        print(f"\n{len(df)} rows, {len(select_health_features(feature_cols))} HI inputs")
+        print(f"  previous             {t_old:8.2f}s")
+        for label, t, err in rows:
+            print(f"  {label:<20} {t:8.2f}s  x{t_old / t:6.2f}  (max |HI diff| {err:.1e})")
+        del df
+
+
+if __name__ == "__main__":
+    main()
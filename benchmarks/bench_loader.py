@@ -0,0 +1,88 @@
+"""
+Benchmark: typed CMAPSS parser vs. the original regex/merge loader.
+
+Run from the project root:
+    python benchmarks/bench_loader.py [--replicate 100]
+
+Times three variants on train_FD001 and on a file made of N concatenated copies of it:
+  - legacy:   pd.read_csv(sep=r'\\s+') + groupby/merge RUL labelling (int64/float64)
+  - typed:    read_cmapss + label_rul (int32/float32)
+  - usecols:  typed, skipping the sensors FD001 knows to be constant
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.getcwd())
+
+import pandas as pd
+from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.data_loader import load_and_label, CMAPSS_COLUMNS, _HAS_PYARROW
+
+# Sensors removed by remove_constant_sensors on FD001
+FD001_CONSTANT = ['s1', 's5', 's10', 's16', 's18', 's19']
+
+
+def legacy_load_and_label(filepath):
+    """The loader as it was before the typed parser (kept here for comparison only)."""
+    df = pd.read_csv(filepath, sep=r'\s+', header=None, names=CMAPSS_COLUMNS)
+    df = df.sort_values(['engine_id', 'cycle'])
+    rul = df.groupby('engine_id')['cycle'].max().reset_index()
+    rul.columns = ['engine_id', 'max_cycle']
+    df = df.merge(rul, on='engine_id', how='left')
+    df['RUL'] = (df['max_cycle'] - df['cycle']).clip(upper=125)
+    return df.drop(columns=['max_cycle'])
+
+
+def time_best(fn, repeats):
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(filepath, label, repeats):
+    usecols = [c for c in CMAPSS_COLUMNS if c not in FD001_CONSTANT]
+    variants = [
+        ("legacy", lambda: legacy_load_and_label(filepath)),
+        ("typed", lambda: load_and_label(filepath, use_cache=False)),
+        ("usecols", lambda: load_and_label(filepath, usecols=usecols, use_cache=False)),
+    ]
+
+    print(f"\n{label}: {os.path.getsize(filepath) / 1e6:.1f} MB")
+    base = None
+    for name, fn in variants:
+        seconds, df = time_best(fn, repeats)
+        mem_mb = df.memory_usage(index=False).sum() / 1e6
+        base = base or seconds
+        print(f"  {name:<8} {seconds:8.3f}s  x{base / seconds:5.2f}  rows={len(df):>9}  frame={mem_mb:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replicate", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    train_path = os.path.join(DATA_PATH, TRAIN_FILE)
+    print(f"pyarrow available: {_HAS_PYARROW}")
+    run(train_path, TRAIN_FILE, args.repeats)
+
+    with open(train_path, 'rb') as f:
+        raw = f.read()
+    with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as tmp:
+        for _ in range(args.replicate):
+            tmp.write(raw)
+    try:
+        run(tmp.name, f"{TRAIN_FILE} x{args.replicate}", max(1, args.repeats // 3))
+    finally:
+        os.remove(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: peak memory per preprocessing stage, copy mode vs. in-place mode.
+
+Run from the project root:
+    python benchmarks/bench_memory.py [--replicate 10]
+
+Runs remove_constant_sensors -> normalize_dataframe -> add_degradation_features ->
+add_health_index on train_FD001 (replicated N times with fresh engine ids) once with
+the default copying stages and once with inplace=True, and reports for every stage
+the peak traced allocation (tracemalloc, which sees NumPy buffers) and the memory
+still held when the stage returns. The loaded input frame is allocated before tracing
+starts, so all figures are on top of it.
+"""
+import sys
+import os
+import gc
+import time
+import argparse
+import tracemalloc
+
+sys.path.append(os.getcwd())
+
+import numpy as np
+import pandas as pd
+from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.data_loader import load_and_label, SETTING_COLS
+from pipeline.sensor_cleaner import remove_constant_sensors
+from pipeline.normalizer import normalize_dataframe
+from pipeline.feature_engineering import add_degradation_features
+from pipeline.health_index import add_health_index
+
+
+def replicated_frame(replicate):
+    df = load_and_label(os.path.join(DATA_PATH, TRAIN_FILE), use_cache=False)
+    if replicate == 1:
+        return df
+    n_engines = int(df['engine_id'].max())
+    copies = []
+    for k in range(replicate):
+        part = df.copy()
+        part['engine_id'] += k * n_engines
+        copies.append(part)
+    return pd.concat(copies, ignore_index=True)
+
+
+def run_chain(df, inplace):
+    """Runs the stages, yielding (stage name, callable) so each can be measured."""
+    state = {'df': df}
+
+    def clean():
+        state['df'], state['kept'] = remove_constant_sensors(state['df'], inplace=inplace)
+
+    def normalize():
+        cols = SETTING_COLS + state['kept']
+        state['df'], _ = normalize_dataframe(state['df'], cols, inplace=inplace)
+
+    def features():
+        state['df'] = add_degradation_features(state['df'], state['kept'], inplace=inplace)
+
+    def health_index():
+        cols = [c for c in state['df'].columns if c not in ['engine_id', 'cycle', 'RUL']]
+        state['df'], _ = add_health_index(state['df'], cols, inplace=inplace)
+
+    return state, [("clean", clean), ("normalize", normalize), ("features", features),
+                   ("health_index", health_index)]
+
+
+def measure(df, inplace):
+    # Keep only the chain's reference to the input so copy mode can free it like a script would
+    state, stages = run_chain(df, inplace)
+    rows = []
+    gc.collect()
+    tracemalloc.start()
+    for name, stage in stages:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        stage()
+        seconds = time.perf_counter() - start
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        rows.append((name, seconds, before / 2**20, peak / 2**20, after / 2**20))
+    overall = max(r[3] for r in rows)
+    tracemalloc.stop()
+    return rows, overall, state['df']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replicate", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    for mode, inplace in [("copy", False), ("inplace", True)]:
+        rows, overall, out = measure(replicated_frame(args.replicate), inplace)
+        results[mode] = (rows, overall, out)
+        print(f"\n{mode} mode ({len(out)} rows, {out.shape[1]} columns)")
+        print(f"  {'stage':<14}{'seconds':>9}{'held before':>14}{'peak':>10}{'held after':>13}  (MB)")
+        for name, seconds, before, peak, after in rows:
+            print(f"  {name:<14}{seconds:9.2f}{before:14.1f}{peak:10.1f}{after:13.1f}")
+        print(f"  overall peak: {overall:.1f} MB")
+
+    copy_out, inplace_out = results["copy"][2], results["inplace"][2]
+    same = copy_out.columns.equals(inplace_out.columns) and np.allclose(
+        copy_out.to_numpy(np.float64), inplace_out.to_numpy(np.float64), equal_nan=True)
+    print(f"\nPeak reduction: {results['copy'][1] / results['inplace'][1]:.2f}x, identical output: {same}")
+
+
+if __name__ == "__main__":
+    main()
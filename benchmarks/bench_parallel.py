@@ -0,0 +1,78 @@
+"""
+Benchmark: PreprocessingPipeline.fit_transform vs. the engine-partitioned run_parallel.
+
+Run from the project root:
+    python benchmarks/bench_parallel.py [--rows 2000000] [--processes 1 2 4 8]
+
+Replicates train_FD001 with fresh engine ids up to --rows (2M rows is ~10k engines),
+runs the in-memory chain once as the reference, then run_parallel with every
+requested process count, and reports wall time, speedup and the largest relative
+difference to the reference. Process counts above os.cpu_count() are skipped, so
+the speedup column only means something on a machine with several cores.
+"""
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.getcwd())
+
+import numpy as np
+import pandas as pd
+from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.data_loader import load_and_label
+from pipeline.preprocessing import PreprocessingPipeline
+from pipeline.parallel import run_parallel
+
+
+def fleet_frame(n_rows):
+    df = load_and_label(os.path.join(DATA_PATH, TRAIN_FILE), use_cache=False)
+    copies = -(-n_rows // len(df))
+    n_engines = int(df['engine_id'].max())
+    parts = []
+    for k in range(copies):
+        part = df.copy()
+        part['engine_id'] += k * n_engines
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    df = fleet_frame(args.rows)
+    print(f"{len(df)} rows, {df['engine_id'].nunique()} engines, {os.cpu_count()} CPUs")
+
+    t_ref, reference = timed(lambda: PreprocessingPipeline().fit_transform(df))
+    cols = [c for c in reference.columns if c != 'health_index_raw']
+    scale = reference[cols].abs().max().to_numpy(np.float64) + 1
+
+    results = []
+    for processes in args.processes:
+        if processes > (os.cpu_count() or 1):
+            print(f"Skipping {processes} processes (only {os.cpu_count()} CPUs)")
+            continue
+        t, (out, _) = timed(lambda: run_parallel(df, processes=processes))
+        # Column by column to keep the comparison itself from doubling memory
+        err = max(float((np.abs(out[c].to_numpy(np.float64) - reference[c].to_numpy(np.float64)) / s).max())
+                  for c, s in zip(cols, scale))
+        results.append((processes, t, err, list(out.columns) == list(reference.columns)))
+        del out
+
+    print(f"\n  fit_transform        {t_ref:8.2f}s")
+    for processes, t, err, same_cols in results:
+        print(f"  run_parallel  p={processes:<3d} {t:8.2f}s  x{t_ref / t:5.2f}  "
+              f"(max rel diff {err:.1e}, same columns {same_cols})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: TrajectoryIndex build and top-k queries (brute NumPy vs. KD-tree).
+
+Run from the project root:
+    python benchmarks/bench_similarity.py [--engines 100 1000] [--k 10]
+
+Fits the preprocessing chain on train_FD001 and replicates its health_index
+trajectories (with small noise) up to the requested number of training engines.
+For both search methods it reports the build time, the time per engine of one
+batch query over the whole original fleet (each engine's last HI window, itself
+excluded), and the latency of single-engine queries. The KD-tree neighbors are
+checked against the brute ones.
+"""
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.getcwd())
+
+import numpy as np
+import pandas as pd
+from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.data_loader import load_and_label
+from pipeline.preprocessing import PreprocessingPipeline
+from pipeline.similarity import TrajectoryIndex, SIMILARITY_METHODS, last_windows
+
+
+def trajectory_frame(n_engines):
+    df = PreprocessingPipeline().fit_transform(load_and_label(os.path.join(DATA_PATH, TRAIN_FILE), use_cache=False))
+    df = df[['engine_id', 'cycle', 'RUL', 'health_index']]
+    base = int(df['engine_id'].max())
+    rng = np.random.default_rng(0)
+    parts = []
+    for k in range(-(-n_engines // base)):
+        part = df.copy()
+        part['engine_id'] += k * base
+        if k:
+            part['health_index'] += rng.normal(0, 0.01, len(part)).astype(np.float32)
+        parts.append(part)
+    big = pd.concat(parts, ignore_index=True)
+    return df, big[big['engine_id'] <= n_engines]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engines", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    for n_engines in args.engines:
+        fleet, train = trajectory_frame(n_engines)
+        ids, Q = last_windows(fleet)
+
+        rows, reference = [], None
+        for method in SIMILARITY_METHODS:
+            t_build, index = timed(lambda: TrajectoryIndex(method=method).build(train))
+            t_batch, (_, neighbors, _) = timed(lambda: index.query(Q, args.k, exclude=ids))
+            start = time.perf_counter()
+            for q, e in zip(Q, ids):
+                index.query(q, args.k, exclude=e)
+            t_single = (time.perf_counter() - start) / len(Q)
+            reference = neighbors if reference is None else reference
+            rows.append((method, len(index.embeddings), t_build, t_batch / len(Q), t_single,
+                         (neighbors == reference).mean()))
+
+        print(f"\n{n_engines} training engines, {len(Q)} query engines, k={args.k}")
+        for method, n_windows, t_build, t_batch, t_single, agree in rows:
+            print(f"  {method:<7} {n_windows:8d} windows  build {t_build:6.2f}s  "
+                  f"batch {t_batch * 1e3:7.3f} ms/engine  single {t_single * 1e3:7.3f} ms  "
+                  f"(neighbors equal to brute {agree:.1%})")
+
+
+if __name__ == "__main__":
+    main()
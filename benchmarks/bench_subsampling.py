@@ -0,0 +1,98 @@
+"""
+Benchmark: Transformer accuracy vs. training time with per-epoch window subsampling.
+
+Run from the project root:
+    python benchmarks/bench_subsampling.py [--configs 1 4 8 4:2] [--budget 300]
+
+Trains the Track B Transformer from scratch on FD001 (the train_transformer data,
+split and model) once per configuration. A configuration is a window stride,
+optionally with the low-RUL weight: "4" draws every 4th window of every engine per
+epoch (WindowSubsampler, new offsets each epoch), "4:2" also draws the windows at or
+below LOW_RUL twice as often, "1" is every window every epoch. For every epoch it
+reports the training time, the cumulative time and the validation RMSE (always on
+every validation window). Each configuration trains for the same budget of
+training seconds (whole epochs, at most --epochs), so the summary compares what
+the same wall time buys: the mean epoch time and its speedup over the first
+configuration, the best RMSE reached, and the training time each configuration
+needed to reach the best RMSE of the first one.
+"""
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.getcwd())
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from pipeline.models.transformer_model import RULTransformer
+from pipeline.models.window_dataset import make_loader
+from pipeline.models.train_transformer import (load_window_datasets, train_sampler, train_epoch, validate,
+                                               BATCH_SIZE, LR, MIN_LENGTH, NUM_WORKERS, DEVICE)
+
+
+def parse_config(text):
+    stride, _, weight = text.partition(":")
+    return int(stride), float(weight or 1)
+
+
+def run(config, train_ds, val_ds, input_dim, budget, max_epochs):
+    stride, weight = parse_config(config)
+    torch.manual_seed(0)
+    model = RULTransformer(input_dim=input_dim, d_model=64, nhead=4, num_layers=2, dropout=0.1).to(DEVICE)
+    optimizer = optim.AdamW(model.parameters(), lr=LR)
+    criterion = nn.HuberLoss()
+
+    sampler = train_sampler(train_ds, stride, weight, seed=0)
+    train_dl = make_loader(train_ds, BATCH_SIZE, shuffle=True, num_workers=NUM_WORKERS, device=DEVICE,
+                           seed=0, sampler=sampler)
+    val_dl = make_loader(val_ds, BATCH_SIZE, num_workers=NUM_WORKERS, device=DEVICE)
+    n_drawn = len(sampler) if sampler is not None else len(train_ds)
+
+    print(f"\nstride {stride}, low-RUL weight {weight:g}: {n_drawn} of {len(train_ds)} samples per epoch")
+    history, elapsed = [], 0.0
+    for epoch in range(max_epochs):
+        if elapsed >= budget:
+            break
+        start = time.perf_counter()
+        loss = train_epoch(model, train_dl, optimizer, criterion)
+        seconds = time.perf_counter() - start
+        elapsed += seconds
+        rmse, _ = validate(model, val_dl)
+        history.append((seconds, elapsed, rmse))
+        print(f"  epoch {epoch + 1:2d}  train {seconds:7.2f}s  total {elapsed:8.2f}s  "
+              f"loss {loss:8.4f}  val RMSE {rmse:7.3f}")
+        sys.stdout.flush()
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--configs", nargs="+", default=["1", "4", "8", "4:2"])
+    parser.add_argument("--budget", type=float, default=300.0, help="training seconds per configuration")
+    parser.add_argument("--epochs", type=int, default=50)
+    args = parser.parse_args()
+
+    train_ds, val_ds, input_dim = load_window_datasets(min_length=MIN_LENGTH)
+    results = [(config, run(config, train_ds, val_ds, input_dim, args.budget, args.epochs))
+               for config in args.configs]
+
+    base_time, target = None, None
+    print(f"\n{'config':<8} {'epochs':>6} {'s/epoch':>8} {'speedup':>8} {'total s':>8} {'best RMSE':>10} "
+          f"{'s to reach':>10}")
+    for config, history in results:
+        times, elapsed, rmses = (np.array(column) for column in zip(*history))
+        if base_time is None:
+            base_time, target = times.mean(), rmses.min()
+        reached = np.flatnonzero(rmses <= target)
+        to_target = f"{elapsed[reached[0]]:10.2f}" if len(reached) else f"{'-':>10}"
+        print(f"{config:<8} {len(times):6d} {times.mean():8.2f} {base_time / times.mean():7.2f}x "
+              f"{elapsed[-1]:8.2f} {rmses.min():10.3f} {to_target}")
+    print(f"('s to reach': training seconds until the validation RMSE was at most {target:.3f}, "
+          f"the best of {results[0][0]})")
+
+
+if __name__ == "__main__":
+    main()
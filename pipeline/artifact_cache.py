@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import functools
+import pandas as pd
+from pipeline.config import CACHE_PATH, ARTIFACT_CACHE_MAX_MB
+from pipeline.frame_store import save_frame, load_frame, read_meta, write_meta, hash_file
+
+ARTIFACT_CACHE_PATH = os.path.join(CACHE_PATH, "artifacts")
+
+# Bump whenever the stored artifact layout changes
+ARTIFACT_CACHE_VERSION = 1
+
+# Modules whose code determines a processed frame; editing any of them changes the
+# code version and therefore every artifact key
+STAGE_MODULES = [
+    "config.py", "data_loader.py", "sensor_cleaner.py", "streaming_stats.py", "normalizer.py",
+    "rolling.py", "feature_engineering.py", "health_index.py", "preprocessing.py",
+    os.path.join("backends", "base.py"), os.path.join("backends", "pandas_backend.py"),
+    os.path.join("backends", "polars_backend.py"), os.path.join("models", "xgb_baseline.py"),
+]
+
+HASH_INDEX_FILE = "content_hashes.json"
+
+@functools.lru_cache(maxsize=1)
+def code_version() -> str:
+    """Hash of the source of the pipeline stages (computed once per process)."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.blake2b(digest_size=16)
+    for name in STAGE_MODULES:
+        path = os.path.join(root, name)
+        h.update(name.encode())
+        h.update(hash_file(path).encode() if os.path.exists(path) else b'-')
+    return h.hexdigest()
+
+class ArtifactCache:
+    """
+    Content-addressed store of processed frames (e.g. the `load_full_data` output).
+
+    An entry's key hashes the content of every input file, the pipeline code
+    version (`code_version`) and the stage parameters, so an entry can never be
+    served for different inputs, code or settings, and identical requests from
+    different scripts share one entry. Entries are `frame_store` directories, so a
+    hit memory-maps the columns instead of recomputing or parsing anything.
+
+    Every hit refreshes the entry's last-access time; after each write the least
+    recently used entries are evicted until the cache fits in `max_bytes`.
+    """
+
+    def __init__(self, root: str = ARTIFACT_CACHE_PATH, max_bytes: int = ARTIFACT_CACHE_MAX_MB << 20):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def key(self, sources: list, params: dict) -> str:
+        """
+        Artifact key for a set of input files and stage parameters.
+
+        Args:
+            sources: Input file paths (order matters, e.g. for engine-id namespacing).
+            params: JSON-serialisable stage parameters.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"v{ARTIFACT_CACHE_VERSION}|{code_version()}".encode())
+        for path in sources:
+            h.update(b'|')
+            h.update(self._content_hash(path).encode())
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def get(self, key: str):
+        """
+        Returns (frame, meta) for a stored key, or None.
+
+        The frame's columns are memory-mapped copy-on-write (edits stay in memory).
+        """
+        path = self._entry_path(key)
+        meta = read_meta(path)
+        if meta is None or meta.get('version') != ARTIFACT_CACHE_VERSION:
+            return None
+        try:
+            df = load_frame(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        meta['last_access'] = time.time()
+        try:
+            write_meta(path, meta)
+        except OSError:
+            pass
+        return df, meta
+
+    def put(self, key: str, df: pd.DataFrame, meta: dict = None):
+        """Stores a frame (plus JSON-serialisable meta) under `key`, then evicts if needed."""
+        path = self._entry_path(key)
+        now = time.time()
+        save_frame(df, path, meta={'version': ARTIFACT_CACHE_VERSION, 'key': key, 'created': now,
+                                   'last_access': now, **(meta or {})})
+        self.evict(keep=key)
+
+    def get_or_build(self, sources: list, params: dict, build, description: str = ""):
+        """
+        Returns (frame, meta) from the cache, or runs `build()` and stores its result.
+
+        Args:
+            sources: Input files of the artifact.
+            params: Stage parameters of the artifact.
+            build: Callable returning (frame, meta) on a miss.
+            description: Short label shown by the CLI.
+        """
+        key = self.key(sources, params)
+        hit = self.get(key)
+        if hit is not None:
+            print(f"Artifact cache hit: {description or key}")
+            return hit
+
+        df, meta = build()
+        try:
+            self.put(key, df, {'description': description, 'params': params,
+                               'sources': [os.path.abspath(p) for p in sources], **(meta or {})})
+        except (OSError, TypeError) as e:
+            # The artifact is still returned; it is just not cached
+            print(f"Warning: could not write artifact {key}: {e}")
+        return df, meta
+
+    def entries(self) -> list:
+        """Stored entries, most recently used first: dicts with key, bytes and meta."""
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            meta = read_meta(path)
+            if meta is None or '.tmp-' in name:
+                continue
+            out.append({'key': name, 'bytes': _dir_size(path), 'meta': meta})
+        return sorted(out, key=lambda e: e['meta'].get('last_access', 0), reverse=True)
+
+    def evict(self, max_bytes: int = None, keep: str = None) -> list:
+        """
+        Removes least recently used entries until the cache fits in `max_bytes`.
+
+        Args:
+            max_bytes: Size limit (default: self.max_bytes).
+            keep: Key that is never evicted (the entry just written).
+
+        Returns:
+            list: Evicted keys.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e['bytes'] for e in entries)
+        evicted = []
+        for entry in reversed(entries):
+            if total <= limit:
+                break
+            if entry['key'] == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, entry['key']), ignore_errors=True)
+            total -= entry['bytes']
+            evicted.append(entry['key'])
+        return evicted
+
+    def clear(self):
+        """Removes every artifact (the content hash index is kept)."""
+        for entry in self.entries():
+            shutil.rmtree(os.path.join(self.root, entry['key']), ignore_errors=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.root, key)
+
+    def _content_hash(self, path):
+        # Content hashes are remembered per (path, size, mtime), so an unchanged input
+        # is only hashed once instead of on every lookup
+        st = os.stat(path)
+        index_path = os.path.join(self.root, HASH_INDEX_FILE)
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        abspath = os.path.abspath(path)
+        entry = index.get(abspath)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['content_hash']
+
+        digest = hash_file(path)
+        index[abspath] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'content_hash': digest}
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{index_path}.tmp-{os.getpid()}"
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            pass
+        return digest
+
+def _dir_size(path) -> int:
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the processed-frame artifact cache.")
+    parser.add_argument("command", choices=["list", "clear", "evict"])
+    parser.add_argument("--max-mb", type=float, default=None,
+                        help="Size limit for 'evict' (default: ARTIFACT_CACHE_MAX_MB)")
+    args = parser.parse_args()
+
+    cache = ArtifactCache()
+    if args.command == "list":
+        entries = cache.entries()
+        total = sum(e['bytes'] for e in entries)
+        print(f"{len(entries)} artifacts in {cache.root}, {total / 2**20:.1f} MB "
+              f"(limit {cache.max_bytes / 2**20:.0f} MB)")
+        for e in entries:
+            meta = e['meta']
+            used = time.strftime('%Y-%m-%d %H:%M', time.localtime(meta.get('last_access', 0)))
+            print(f"  {e['key']}  {e['bytes'] / 2**20:8.1f} MB  last used {used}  {meta.get('description', '')}")
+    elif args.command == "clear":
+        n = len(cache.entries())
+        cache.clear()
+        print(f"Removed {n} artifacts from {cache.root}")
+    else:
+        limit = None if args.max_mb is None else int(args.max_mb * 2**20)
+        evicted = cache.evict(limit)
+        print(f"Evicted {len(evicted)} artifacts")
@@ -0,0 +1,22 @@
+from pipeline.config import BACKEND
+from pipeline.backends.base import Backend, BACKEND_TOLERANCE
+from pipeline.backends.pandas_backend import PandasBackend
+
+BACKENDS = ("pandas", "polars")
+
+def get_backend(name: str = None) -> Backend:
+    """
+    Returns the execution backend `name` (default: BACKEND in pipeline/config.py).
+
+    "polars" needs the optional polars package; without it the pandas backend is
+    used and a warning is printed.
+    """
+    name = BACKEND if name is None else name
+    if name not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}, got {name!r}")
+    if name == "polars":
+        from pipeline.backends.polars_backend import PolarsBackend, _HAS_POLARS
+        if _HAS_POLARS:
+            return PolarsBackend()
+        print("Warning: polars is not installed, using the pandas backend")
+    return PandasBackend()
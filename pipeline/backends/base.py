@@ -0,0 +1,108 @@
+import pandas as pd
+from pipeline.data_loader import SETTING_COLS, SENSOR_COLS
+
+EXCLUDE_COLS = ['engine_id', 'cycle', 'RUL']
+
+# Agreement contract of the backends: every output column of `fit_transform` matches
+# the pandas backend's to this many of its standard deviations (checked by
+# benchmarks/bench_backends.py). Rolling statistics are summed in a different order,
+# and the drift of a near-constant baseline divides rounding-level differences by
+# a tiny std, so the outputs are close but not bit-identical.
+BACKEND_TOLERANCE = 1e-4
+
+class Backend:
+    """
+    Execution backend of the preprocessing stages.
+
+    A backend implements the stage operations (load, column statistics for the
+    variance screen and the scaler, scaling, rolling features, HI projection) on
+    its own frame type; `fit_transform` chains them into the training transform
+    and fills a `PreprocessingPipeline` with the fitted parameters, so whatever
+    backend fitted it, `transform` and serving replay the same parameters.
+    Every backend's output agrees with the pandas reference to BACKEND_TOLERANCE.
+
+    Frames only cross to pandas at the edges (`from_pandas` / `to_pandas`), so a
+    lazy backend can keep the stages in between as one query.
+    """
+
+    name = None
+
+    def from_pandas(self, df: pd.DataFrame):
+        """Converts a labeled pandas frame to the backend's frame type."""
+        raise NotImplementedError
+
+    def to_pandas(self, frame) -> pd.DataFrame:
+        """Materializes a backend frame as a pandas frame (sorted by engine_id, cycle)."""
+        raise NotImplementedError
+
+    def load(self, sources, data_path: str = ""):
+        """Loads and labels CMAPSS files (engine ids namespaced like `load_fleet`)."""
+        raise NotImplementedError
+
+    def column_stats(self, frame, columns: list):
+        """RunningMoments of `columns` (drives the variance screen and the scaler)."""
+        raise NotImplementedError
+
+    def drop(self, frame, columns: list):
+        raise NotImplementedError
+
+    def scale(self, frame, scaler):
+        """Applies a fitted StandardScaler to its columns (`scaler.feature_names_in_`)."""
+        raise NotImplementedError
+
+    def add_features(self, frame, sensor_cols: list, window_short: int, window_long: int, windows: list):
+        """Adds the `add_degradation_features` columns."""
+        raise NotImplementedError
+
+    def health_index(self, frame, candidates: list, hi_window: int, method: str) -> tuple:
+        """
+        Fits the HI projection and adds health_index_raw / health_index.
+
+        Returns:
+            tuple: (frame, HealthIndexModel)
+        """
+        raise NotImplementedError
+
+    def fit_transform(self, df, preprocessor) -> pd.DataFrame:
+        """
+        Runs clean -> normalize -> features -> health index and fits `preprocessor`.
+
+        Args:
+            df: Labeled pandas frame or a frame of this backend (e.g. from `load`).
+            preprocessor: PreprocessingPipeline to fill with the fitted parameters
+                          (only global normalization is supported).
+
+        Returns:
+            pd.DataFrame: Same columns as `PreprocessingPipeline.fit_transform`.
+        """
+        if preprocessor.normalization != "global":
+            raise ValueError(f"The {self.name} backend only supports global normalization")
+        frame = self.from_pandas(df) if isinstance(df, pd.DataFrame) else df
+
+        # One pass of column statistics drives both the sensor screen and the scaler
+        sensor_cols = [c for c in SENSOR_COLS if c in self.columns(frame)]
+        stats = self.column_stats(frame, SETTING_COLS + sensor_cols)
+        variances = stats.var(ddof=1)
+        kept = [s for s in sensor_cols if variances[s] >= preprocessor.threshold]
+        dropped = [s for s in sensor_cols if s not in kept]
+        print(f"[{self.name}] Sensors removed: {len(dropped)} {dropped}")
+
+        scaler = stats.to_scaler(SETTING_COLS + kept)
+        frame = self.scale(self.drop(frame, dropped), scaler)
+        frame = self.add_features(frame, kept, preprocessor.window_short, preprocessor.window_long,
+                                  preprocessor.windows)
+        feature_cols = [c for c in self.columns(frame) if c not in EXCLUDE_COLS]
+        frame, model = self.health_index(frame, feature_cols, preprocessor.hi_window, preprocessor.hi_method)
+        df_final = self.to_pandas(frame)
+
+        preprocessor.kept_sensors = kept
+        preprocessor.scaler = scaler
+        preprocessor.regime_normalizer = None
+        preprocessor.feature_cols = feature_cols
+        preprocessor.set_health_model(model)
+        if 'RUL' in df_final.columns:
+            preprocessor.max_rul = float(df_final['RUL'].max())
+        return df_final
+
+    def columns(self, frame) -> list:
+        return list(frame.columns)
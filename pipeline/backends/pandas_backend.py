@@ -0,0 +1,45 @@
+from pipeline.data_loader import load_fleet, is_sorted, SORT_KEYS
+from pipeline.streaming_stats import RunningMoments
+from pipeline.normalizer import normalize_dataframe
+from pipeline.feature_engineering import add_degradation_features
+from pipeline.health_index import HealthIndexModel
+from pipeline.backends.base import Backend
+
+class PandasBackend(Backend):
+    """
+    The eager pandas/NumPy stages (the reference implementation).
+
+    Every operation calls the stage function of the pipeline package directly and
+    works in place on the frame it was handed.
+    """
+
+    name = "pandas"
+
+    def from_pandas(self, df):
+        # fit_transform owns what it is handed, so it works on a copy of the caller's frame
+        return df.copy() if is_sorted(df) else df.sort_values(by=SORT_KEYS, ignore_index=True)
+
+    def to_pandas(self, frame):
+        return frame
+
+    def load(self, sources, data_path=""):
+        return load_fleet(sources, data_path=data_path)
+
+    def column_stats(self, frame, columns):
+        return RunningMoments.from_frame(frame, columns)
+
+    def drop(self, frame, columns):
+        frame.drop(columns=columns, inplace=True)
+        return frame
+
+    def scale(self, frame, scaler):
+        frame, _ = normalize_dataframe(frame, list(scaler.feature_names_in_), scaler=scaler, inplace=True)
+        return frame
+
+    def add_features(self, frame, sensor_cols, window_short, window_long, windows):
+        return add_degradation_features(frame, sensor_cols, window_short, window_long, windows=windows,
+                                        inplace=True)
+
+    def health_index(self, frame, candidates, hi_window, method):
+        model = HealthIndexModel(method=method, window=hi_window)
+        return model.fit_transform(frame, candidates, inplace=True), model
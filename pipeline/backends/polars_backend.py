@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+from pipeline.config import ENGINE_ID_STRIDE
+from pipeline.data_loader import (CMAPSS_COLUMNS, INDEX_COLS, SORT_KEYS, RUL_CAP, FLOAT_DTYPE, resolve_sources,
+                                  is_sorted)
+from pipeline.streaming_stats import RunningMoments
+from pipeline.feature_engineering import feature_column_names, _rolling_windows
+from pipeline.health_index import select_health_features, first_component, HealthIndexModel
+from pipeline.backends.base import Backend
+
+try:
+    import polars as pl
+    _HAS_POLARS = True
+except ImportError:
+    _HAS_POLARS = False
+
+# Temporary columns of the feature query: position of a row inside its engine and
+# the per-engine drift baseline of every sensor (suffixes)
+POS_COL = '_pos'
+BASE_MEAN = '_base_mean'
+BASE_STD = '_base_std'
+
+def _polars_float(dtype):
+    return pl.Float32 if np.dtype(dtype) == np.float32 else pl.Float64
+
+class PolarsBackend(Backend):
+    """
+    Lazy Polars implementation of the stages.
+
+    Load, scaling and feature engineering only extend one LazyFrame query; it is
+    executed once, multithreaded by the Polars engine, when the HI projection needs
+    the feature matrix. Only the column statistics (one aggregate row) are
+    collected before that. Rolling windows are evaluated over the sorted columns
+    and kept where the window lies inside one engine (position >= window - 1),
+    like `SegmentRolling`, so no per-engine grouping is needed for them.
+    """
+
+    name = "polars"
+
+    def from_pandas(self, df):
+        frame = pl.DataFrame({c: df[c].to_numpy() for c in df.columns})
+        if not is_sorted(df):
+            frame = frame.sort(SORT_KEYS)
+        return frame.lazy()
+
+    def to_pandas(self, frame):
+        if isinstance(frame, pl.LazyFrame):
+            frame = frame.collect()
+        return pd.DataFrame({c: frame[c].to_numpy(writable=True) for c in frame.columns}, copy=False)
+
+    def load(self, sources, data_path=""):
+        dtype = _polars_float(FLOAT_DTYPE)
+        frames = []
+        for i, path in enumerate(resolve_sources(sources, data_path)):
+            # Trailing spaces are empty extra fields, as in read_cmapss
+            with open(path, 'rb') as f:
+                n_fields = len(f.readline().rstrip(b'\r\n').split(b' '))
+            pads = [f'_pad{k}' for k in range(max(n_fields - len(CMAPSS_COLUMNS), 0))]
+            schema = {c: (pl.Int32 if c in INDEX_COLS else dtype) for c in CMAPSS_COLUMNS}
+            schema.update({c: pl.String for c in pads})
+            frame = pl.scan_csv(path, has_header=False, separator=' ', schema=schema).select(CMAPSS_COLUMNS)
+            if i:
+                frame = frame.with_columns(pl.col('engine_id') + i * ENGINE_ID_STRIDE)
+            frames.append(frame)
+
+        frame = pl.concat(frames).sort(SORT_KEYS)
+        # RUL = max cycle of the engine - cycle, capped (see label_rul)
+        rul = (pl.col('cycle').max().over('engine_id') - pl.col('cycle')).clip(upper_bound=RUL_CAP)
+        return frame.with_columns(rul.alias('RUL'))
+
+    def column_stats(self, frame, columns):
+        exprs = []
+        for c in columns:
+            x = pl.col(c).cast(pl.Float64)
+            exprs += [x.count().alias(f'{c}:n'), x.mean().alias(f'{c}:mean'), x.var(ddof=0).alias(f'{c}:var')]
+        row = np.array(frame.select(exprs).collect().row(0), dtype=np.float64)
+
+        stats = RunningMoments(columns)
+        stats.count = row[0::3].astype(np.int64)
+        stats.mean = np.nan_to_num(row[1::3])
+        stats.m2 = np.nan_to_num(row[2::3]) * stats.count
+        return stats
+
+    def columns(self, frame):
+        return frame.collect_schema().names()
+
+    def drop(self, frame, columns):
+        return frame.drop(columns)
+
+    def scale(self, frame, scaler):
+        # In the column's own precision, like StandardScaler.transform (which casts its
+        # mean/scale to float32 for float32 input), so both backends round identically
+        schema = frame.collect_schema()
+        return frame.with_columns([
+            ((pl.col(c) - pl.lit(mean, dtype=schema[c])) / pl.lit(scale, dtype=schema[c])).alias(c)
+            for c, mean, scale in zip(scaler.feature_names_in_, scaler.mean_, scaler.scale_)
+        ])
+
+    def add_features(self, frame, sensor_cols, window_short, window_long, windows):
+        windows = _rolling_windows(window_short, window_long, windows)
+        schema = frame.collect_schema()
+        dtype = schema[sensor_cols[0]] if sensor_cols else _polars_float(FLOAT_DTYPE)
+        pos = pl.col(POS_COL)
+        tau = pos.cast(pl.Float64)
+
+        def complete(expr, w):
+            # Only windows inside one engine are evaluated; incomplete ones are 0
+            return pl.when(pos >= w - 1).then(expr).otherwise(0.0)
+
+        exprs = {}
+        for s in sensor_cols:
+            x = pl.col(s).cast(pl.Float64)
+            for w in windows:
+                exprs[f'{s}_rm{w}'] = complete(x.rolling_mean(w), w)
+                exprs[f'{s}_rs{w}'] = complete(x.rolling_std(w, ddof=1), w) if w > 1 else pl.lit(0.0)
+            exprs[f'{s}_delta'] = pl.when(pos > 0).then(x.diff()).otherwise(0.0)
+            if window_long >= 2:
+                # Trailing least-squares slope from windowed sums of x and tau * x
+                w = window_long
+                slope = ((tau * x).rolling_sum(w) - (tau - (w - 1) / 2.0) * x.rolling_sum(w)) / (w * (w * w - 1) / 12.0)
+                exprs[f'{s}_trend'] = complete(slope, w)
+            else:
+                exprs[f'{s}_trend'] = pl.lit(0.0)
+            # Drift against the engine's baseline (joined below)
+            exprs[f'{s}_drift'] = (x - pl.col(f'{s}{BASE_MEAN}')) / (pl.col(f'{s}{BASE_STD}') + 1e-9)
+
+        # Baseline: first 20 cycles of each engine (mean and sample std), one grouped
+        # aggregation joined back onto the rows (engines without one get null -> 0)
+        baseline = frame.filter(pl.col('cycle') <= 20).group_by('engine_id').agg(
+            [pl.col(s).cast(pl.Float64).mean().alias(f'{s}{BASE_MEAN}') for s in sensor_cols]
+            + [pl.col(s).cast(pl.Float64).std().alias(f'{s}{BASE_STD}') for s in sensor_cols])
+        temporary = [POS_COL] + [f'{s}{suffix}' for suffix in (BASE_MEAN, BASE_STD) for s in sensor_cols]
+
+        names = feature_column_names(sensor_cols, window_short, window_long, windows)
+        return (frame
+                .with_columns(pl.int_range(pl.len(), dtype=pl.Int32).over('engine_id').alias(POS_COL))
+                .join(baseline, on='engine_id', how='left', maintain_order='left')
+                # Missing readings are nulls here (not NaN), so one fill_null covers them
+                .with_columns([exprs[n].fill_null(0.0).cast(dtype).alias(n) for n in names])
+                .drop(temporary))
+
+    def health_index(self, frame, candidates, hi_window, method):
+        # The projection is fitted from the covariance of the collected matrix only
+        if method != "covariance":
+            raise ValueError(f"The {self.name} backend only supports the covariance HI fit, got {method!r}")
+        hi_features = select_health_features(candidates)
+        print(f"Selected {len(hi_features)} features for PCA out of {len(candidates)} candidates.")
+        if not hi_features:
+            raise ValueError("No features selected for PCA. Check column names.")
+
+        # Runs the whole query (load/scale/features) once
+        frame = frame.collect() if isinstance(frame, pl.LazyFrame) else frame
+        dtype = frame.schema[hi_features[0]]
+
+        x = frame.select(hi_features).to_numpy().astype(np.float64)
+        mean = x.mean(axis=0)
+        x -= mean
+        component = first_component(x.T @ x / (len(x) - 1))
+        raw = x @ component
+        del x
+
+        smooth = pl.col('health_index_raw').rolling_mean(hi_window, min_samples=1).over('engine_id')
+        frame = frame.with_columns(pl.Series('health_index_raw', raw)).with_columns(smooth.cast(dtype))
+        r = pl.col('health_index_raw').cast(pl.Float64)
+        hi_min, hi_max, corr = frame.select(r.min().alias('min'), r.max().alias('max'),
+                                               pl.corr(r, pl.col('cycle')).alias('corr')).row(0)
+        hi_flip = bool(corr is not None and corr > 0)
+
+        hi = (r - hi_min) / ((hi_max - hi_min) or 1.0)
+        frame = frame.with_columns(((1 - hi) if hi_flip else hi).cast(dtype).alias('health_index'))
+        return frame, HealthIndexModel.from_params(hi_features, mean, component, hi_min, hi_max, hi_flip, hi_window)
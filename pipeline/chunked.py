@@ -0,0 +1,294 @@
+import os
+import io
+import json
+import glob
+import shutil
+import numpy as np
+import pandas as pd
+from pipeline.config import DATA_PATH, ENGINE_ID_STRIDE, FEATURE_WINDOWS
+from pipeline.data_loader import resolve_sources, read_cmapss, label_rul, SETTING_COLS, SENSOR_COLS, FLOAT_DTYPE
+from pipeline.normalizer import normalize_dataframe
+from pipeline.streaming_stats import RunningMoments
+from pipeline.feature_engineering import add_degradation_features
+from pipeline.health_index import select_health_features, smooth_health_index, StreamingCovariance, first_component
+from pipeline.frame_store import save_frame, load_frame, add_column
+
+# Out-of-core ("chunked") mode of the preprocessing pipeline.
+#
+# load -> remove_constant_sensors -> normalize -> add_degradation_features -> add_health_index
+# is run over engine-aligned chunks so that peak memory depends on the chunk size,
+# not on the fleet size:
+#   pass 1  streams the raw file once for sensor variance and scaler statistics
+#   pass 2  streams it again, cleans/normalizes/engineers each chunk, accumulates the
+#           PCA covariance and writes the chunk to disk
+#   finish  fits the HI projection, then appends health_index_raw / health_index to
+#           every written chunk (reading only the HI input columns, memory-mapped)
+
+MANIFEST_FILE = "manifest.json"
+
+# Rough working-set multiplier of the in-memory stages (frame copies + temporaries)
+STAGE_COPY_FACTOR = 4
+
+# Columns generated per kept sensor by add_degradation_features (rm/rs per window, delta, trend, drift)
+FEATURES_PER_SENSOR = 2 * len(FEATURE_WINDOWS) + 3
+
+def rows_for_budget(memory_budget_mb: float, n_sensors: int = len(SENSOR_COLS)) -> int:
+    """
+    Translates a memory budget into a chunk size (rows) for the widest stage.
+
+    Args:
+        memory_budget_mb: Peak memory allowed for one chunk in flight.
+        n_sensors: Number of sensors carried through feature engineering.
+
+    Returns:
+        int: Rows per chunk (at least 1).
+    """
+    n_cols = 3 + len(SETTING_COLS) + n_sensors * (1 + FEATURES_PER_SENSOR) + 2
+    bytes_per_row = n_cols * 8 * STAGE_COPY_FACTOR
+    return max(1, int(memory_budget_mb * 2**20 // bytes_per_row))
+
+def iter_engine_chunks(sources, rows_per_chunk: int, usecols: list = None, data_path: str = ""):
+    """
+    Streams labeled chunks of one or more CMAPSS files without ever splitting an engine.
+
+    Each file is read in newline-aligned blocks of about `rows_per_chunk` rows. The
+    rows of the last engine in a block are held back and prepended to the next block,
+    so every yielded chunk contains complete engines (a single engine longer than the
+    chunk size is yielded on its own). Engine ids are namespaced per file exactly like
+    `load_fleet`.
+
+    Args:
+        sources: Path, glob pattern, or list of paths/globs.
+        rows_per_chunk: Target chunk size in rows.
+        usecols: Optional subset of settings/sensors to read.
+        data_path: Directory that relative sources are resolved against.
+
+    Yields:
+        pd.DataFrame: Labeled chunk sorted by (engine_id, cycle).
+
+    Raises:
+        ValueError: If a file is not grouped by engine_id.
+    """
+    files = resolve_sources(sources, data_path)
+    for i, path in enumerate(files):
+        offset = i * ENGINE_ID_STRIDE
+        seen = set()
+        carry = None
+
+        for block in _iter_blocks(path, rows_per_chunk, usecols):
+            if carry is not None and len(carry):
+                block = pd.concat([carry, block], ignore_index=True)
+
+            # Hold back the trailing engine: it may continue in the next block
+            ids = block['engine_id'].to_numpy()
+            others = np.flatnonzero(ids != ids[-1])
+            cut = others[-1] + 1 if len(others) else 0
+            carry = block.iloc[cut:]
+            if cut == 0:
+                continue
+            yield _finish_chunk(block.iloc[:cut], offset, seen, path)
+
+        if carry is not None and len(carry):
+            yield _finish_chunk(carry, offset, seen, path)
+
+def _iter_blocks(path, rows_per_chunk, usecols):
+    with open(path, 'rb') as f:
+        # Estimate the line length from the head of the file
+        sample = f.read(1 << 16)
+        bytes_per_row = max(1, len(sample) // max(sample.count(b'\n'), 1))
+        block_bytes = max(rows_per_chunk * bytes_per_row, 1)
+        f.seek(0)
+
+        while True:
+            buf = f.read(block_bytes)
+            if not buf:
+                break
+            buf += f.readline()
+            if buf.strip():
+                yield read_cmapss(io.BytesIO(buf), usecols=usecols)
+
+def _finish_chunk(chunk, offset, seen, path):
+    ids = chunk['engine_id'].to_numpy()
+    run_ids = ids[np.r_[True, ids[1:] != ids[:-1]]]
+    if len(np.unique(run_ids)) != len(run_ids) or not seen.isdisjoint(run_ids.tolist()):
+        raise ValueError(f"{path}: out-of-core mode needs the rows of each engine to be contiguous")
+    seen.update(run_ids.tolist())
+
+    df = label_rul(chunk)
+    if offset:
+        df['engine_id'] += offset
+    return df
+
+def run_out_of_core(sources, output_dir: str, memory_budget_mb: float = 512, data_path: str = DATA_PATH,
+                    threshold: float = 1e-6) -> dict:
+    """
+    Runs the full preprocessing chain out of core and writes the result chunk by chunk.
+
+    Produces the same columns as the in-memory chain
+    (load_and_label -> remove_constant_sensors -> normalize_dataframe ->
+    add_degradation_features -> add_health_index) while holding at most one
+    engine-aligned chunk in memory. Chunks are sized from `memory_budget_mb`.
+
+    Args:
+        sources: Path, glob pattern, or list of paths/globs.
+        output_dir: Directory for the chunk files and manifest (existing chunks are replaced).
+        memory_budget_mb: Peak memory budget of one chunk in flight.
+        data_path: Directory that relative sources are resolved against.
+        threshold: Variance threshold of the constant-sensor screen.
+
+    Returns:
+        dict: The manifest (fitted parameters, feature columns and chunk list).
+    """
+    rows = rows_for_budget(memory_budget_mb)
+    print(f"Out-of-core run: budget {memory_budget_mb} MB -> {rows} rows per chunk")
+
+    # Pass 1: variance screen + scaler statistics
+    print("Pass 1: global statistics...")
+    raw_cols = SETTING_COLS + SENSOR_COLS
+    moments = RunningMoments(raw_cols)
+    for chunk in iter_engine_chunks(sources, rows, data_path=data_path):
+        moments.update(chunk)
+
+    sample_var = moments.var(ddof=1)
+    kept_sensors = [s for s in SENSOR_COLS if sample_var[s] >= threshold]
+    drop_sensors = [s for s in SENSOR_COLS if s not in kept_sensors]
+    print(f"Sensors removed: {len(drop_sensors)} {drop_sensors}")
+
+    features_to_normalize = SETTING_COLS + kept_sensors
+    scaler = moments.to_scaler(features_to_normalize)
+
+    # Pass 2: transform every chunk, accumulate PCA covariance, write to disk
+    print("Pass 2: transforming and writing chunks...")
+    os.makedirs(output_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(output_dir, "part-*")):
+        shutil.rmtree(old)
+
+    parts = []
+    covariance = None
+    columns = None
+    rows_per_engine_chunk = []
+    rows = rows_for_budget(memory_budget_mb, len(kept_sensors))
+    for chunk in iter_engine_chunks(sources, rows, data_path=data_path):
+        # The chunk is owned by this loop, so every stage works on it in place
+        chunk.drop(columns=drop_sensors, inplace=True)
+        df_norm, _ = normalize_dataframe(chunk, features_to_normalize, scaler=scaler, inplace=True)
+        df_feat = add_degradation_features(df_norm, kept_sensors, windows=FEATURE_WINDOWS, inplace=True)
+
+        if covariance is None:
+            columns = list(df_feat.columns)
+            covariance = StreamingCovariance(select_health_features(columns))
+        covariance.update(df_feat)
+
+        part = os.path.join(output_dir, f"part-{len(parts):05d}")
+        save_frame(df_feat, part)
+        parts.append(os.path.basename(part))
+        rows_per_engine_chunk.append(len(df_feat))
+
+    if not parts:
+        raise ValueError("No rows read from the given sources.")
+
+    # Finish: HI projection, then global min-max and orientation
+    print("Fitting health index projection...")
+    hi_features = covariance.columns
+    pca_mean = covariance.mean()
+    component = first_component(covariance.cov())
+
+    # HI columns are stored in the precision of the features (see PRECISION)
+    hi_dtype = np.dtype(FLOAT_DTYPE)
+    hi_min, hi_max = np.inf, -np.inf
+    n, mean_r, mean_c, co = 0, 0.0, 0.0, 0.0
+    for part in parts:
+        path = os.path.join(output_dir, part)
+        df_part = load_frame(path, columns=['engine_id', 'cycle'] + hi_features)
+        raw = (df_part[hi_features].to_numpy(dtype=np.float64) - pca_mean) @ component
+        df_hi = pd.DataFrame({'engine_id': df_part['engine_id'].to_numpy(), 'health_index_raw': raw})
+        smoothed = smooth_health_index(df_hi).to_numpy().astype(hi_dtype)
+        add_column(path, 'health_index_raw', smoothed)
+        smoothed = smoothed.astype(np.float64)
+
+        hi_min = min(hi_min, smoothed.min())
+        hi_max = max(hi_max, smoothed.max())
+
+        # Merge the raw-HI/cycle co-moment for the orientation check
+        cycle = df_part['cycle'].to_numpy(dtype=np.float64)
+        n_b = len(cycle)
+        mr_b, mc_b = smoothed.mean(), cycle.mean()
+        co_b = ((smoothed - mr_b) * (cycle - mc_b)).sum()
+        n_ab = n + n_b
+        co += co_b + (mr_b - mean_r) * (mc_b - mean_c) * n * n_b / n_ab
+        mean_r += (mr_b - mean_r) * n_b / n_ab
+        mean_c += (mc_b - mean_c) * n_b / n_ab
+        n = n_ab
+
+    # Same orientation rule as add_health_index: positive correlation with cycle -> flip
+    hi_flip = bool(co > 0)
+    hi_range = (hi_max - hi_min) or 1.0
+    for part in parts:
+        path = os.path.join(output_dir, part)
+        raw = load_frame(path, columns=['health_index_raw'])['health_index_raw'].to_numpy(dtype=np.float64)
+        hi = (raw - hi_min) / hi_range
+        add_column(path, 'health_index', (1 - hi if hi_flip else hi).astype(hi_dtype))
+
+    exclude_cols = ['engine_id', 'cycle', 'RUL']
+    manifest = {
+        'parts': parts,
+        'part_rows': rows_per_engine_chunk,
+        'n_rows': int(sum(rows_per_engine_chunk)),
+        'memory_budget_mb': memory_budget_mb,
+        'kept_sensors': kept_sensors,
+        'features_to_normalize': features_to_normalize,
+        'scaler_mean': scaler.mean_.tolist(),
+        'scaler_scale': scaler.scale_.tolist(),
+        'feature_cols': [c for c in columns if c not in exclude_cols],
+        'hi_features': hi_features,
+        'pca_mean': pca_mean.tolist(),
+        'pca_component': component.tolist(),
+        'hi_min': float(hi_min),
+        'hi_max': float(hi_max),
+        'hi_flip': hi_flip,
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Wrote {manifest['n_rows']} rows in {len(parts)} chunks to {output_dir}")
+    return manifest
+
+def read_manifest(output_dir: str) -> dict:
+    with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def iter_out_of_core(output_dir: str, columns: list = None):
+    """Yields the chunks written by `run_out_of_core` (memory-mapped), in order."""
+    for part in read_manifest(output_dir)['parts']:
+        yield load_frame(os.path.join(output_dir, part), columns=columns)
+
+def load_out_of_core(output_dir: str, columns: list = None) -> pd.DataFrame:
+    """Concatenates all chunks of an out-of-core run (only for results that fit in memory)."""
+    return pd.concat(list(iter_out_of_core(output_dir, columns)), ignore_index=True)
+
+if __name__ == "__main__":
+    import sys
+    from pipeline.config import TRAIN_FILES
+    from pipeline.data_loader import load_fleet
+    from pipeline.sensor_cleaner import remove_constant_sensors
+    from pipeline.health_index import add_health_index
+
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    out_dir = os.path.join("output", "out_of_core")
+
+    manifest = run_out_of_core(TRAIN_FILES, out_dir, memory_budget_mb=budget)
+    df_ooc = load_out_of_core(out_dir)
+
+    # Compare against the in-memory chain
+    print("\nRunning the in-memory chain for comparison...")
+    df = load_fleet(TRAIN_FILES, data_path=DATA_PATH)
+    df_clean, kept_sensors = remove_constant_sensors(df)
+    df_norm, _ = normalize_dataframe(df_clean, SETTING_COLS + kept_sensors)
+    df_feat = add_degradation_features(df_norm, kept_sensors, windows=FEATURE_WINDOWS)
+    feature_cols = [c for c in df_feat.columns if c not in ['engine_id', 'cycle', 'RUL']]
+    df_mem, _ = add_health_index(df_feat, feature_cols)
+
+    print(f"Chunks: {len(manifest['parts'])}, rows: {len(df_ooc)} (in-memory: {len(df_mem)})")
+    print(f"Same columns: {list(df_ooc.columns) == list(df_mem.columns)}")
+    diff = (df_ooc['health_index'].to_numpy() - df_mem['health_index'].to_numpy())
+    print(f"Max |health_index difference|: {np.abs(diff).max():.2e}")
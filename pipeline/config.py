@@ -7,3 +7,58 @@ TRAIN_FILE = "train_FD001.txt"
 TEST_FILE = "test_FD001.txt"
 
 MODEL_PATH = "./models"
+
+# On-disk cache for parsed/labeled frames (see pipeline/frame_store.py)
+CACHE_PATH = "cache/"
+
+USE_CACHE = True
+
+# Subsets loaded by the pipeline: paths or glob patterns relative to DATA_PATH,
+# e.g. ["train_FD00*.txt"] to train on FD001-FD004 together
+TRAIN_FILES = [TRAIN_FILE]
+
+TEST_FILES = [TEST_FILE]
+
+# Engine ids of the i-th subset are namespaced as i * ENGINE_ID_STRIDE + engine_id
+ENGINE_ID_STRIDE = 100000
+
+# Sensor normalization: "global" (one StandardScaler) or "regime" (per operating
+# regime, for the multi-condition subsets FD002/FD004)
+NORMALIZATION = "global"
+
+N_REGIMES = 6
+
+# Floating-point precision of settings, sensors, engineered features, HI and
+# sequence tensors: "float64" (default) or "float32" (opt-in: half the memory and
+# bandwidth, validated against float64 by benchmarks/bench_precision.py)
+PRECISION = "float64"
+
+# Rolling mean/std windows of the engineered features (the trend uses the longer
+# of the two default windows); e.g. [5, 10, 20, 30, 50] for longer-horizon features
+FEATURE_WINDOWS = [5, 10]
+
+# Health Index projection fit (pipeline/health_index.py HealthIndexModel): "covariance"
+# (batched exact covariance + eigenvector), "incremental" (IncrementalPCA),
+# "randomized" (randomized SVD) or "pca" (full SVD); batches hold HI_BATCH_ROWS rows
+HI_FIT_METHOD = "covariance"
+HI_BATCH_ROWS = 1 << 16
+
+# Similarity-based RUL (pipeline/similarity.py TrajectoryIndex): length of the HI
+# windows that are matched, number of neighbor engines and search method
+# ("brute" vectorized NumPy or "kdtree")
+SIMILARITY_WINDOW = 30
+SIMILARITY_K = 10
+SIMILARITY_METHOD = "brute"
+
+# Execution backend of PreprocessingPipeline.fit_transform (pipeline/backends/):
+# "pandas" (eager, the reference) or "polars" (one lazy query; needs
+# the optional polars package, global NORMALIZATION only)
+BACKEND = "pandas"
+
+# Row dtype of the memory-mapped sequence store (pipeline/sequence_store.py):
+# "float32", or "float16" to halve it (batches are cast back to float32)
+SEQUENCE_DTYPE = "float32"
+
+# Content-addressed cache of fully processed training frames (pipeline/artifact_cache.py);
+# least recently used entries are evicted beyond this size
+ARTIFACT_CACHE_MAX_MB = 2048
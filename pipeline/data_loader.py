@@ -1,43 +1,357 @@
+import os
+import io
+import glob
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
+from pipeline.config import CACHE_PATH, USE_CACHE, ENGINE_ID_STRIDE, PRECISION
+from pipeline.frame_store import save_frame, load_frame, read_meta, write_meta, file_fingerprint, hash_file
 
-def load_and_label(filepath) -> pd.DataFrame:
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+# CMAPSS schema: 2 index columns, 3 operating settings, 21 sensors
+INDEX_COLS = ['engine_id', 'cycle']
+SETTING_COLS = ['op1', 'op2', 'op3']
+SENSOR_COLS = [f's{i}' for i in range(1, 22)]
+CMAPSS_COLUMNS = INDEX_COLS + SETTING_COLS + SENSOR_COLS
+
+# Every later stage keeps the float dtype it receives, so this sets the precision
+# of the whole pipeline (see PRECISION in config.py)
+FLOAT_DTYPE = np.dtype(PRECISION).type
+
+RUL_CAP = 125
+
+# Files are split into byte ranges of at least this size for parallel parsing
+MIN_RANGE_BYTES = 8 << 20
+
+# Row order of every stage: frames already in this order (is_sorted) are not re-sorted
+SORT_KEYS = ['engine_id', 'cycle']
+
+# Bump whenever the parsed/labeled layout changes so stale caches are rebuilt
+LABEL_CACHE_VERSION = 2
+
+def load_and_label(filepath, usecols: list = None, use_cache: bool = USE_CACHE, cache_path: str = CACHE_PATH,
+                   float_dtype=FLOAT_DTYPE) -> pd.DataFrame:
     """
     Loads the NASA CMAPSS dataset, assigns column names, computes RUL, and returns a DataFrame.
+
+    When `use_cache` is set, the labeled frame is stored in a columnar on-disk cache
+    keyed by the source path, size, mtime and content hash, and later calls reload it
+    memory-mapped instead of reparsing the text file.
+
+    `usecols` restricts parsing to a subset of the settings/sensors (e.g. to skip
+    sensors known to be constant); see `read_cmapss`. `float_dtype` is the
+    precision of the settings and sensors (default from PRECISION in config.py).
     """
-    # Define column names
-    index_cols = ['engine_id', 'cycle']
-    setting_cols = ['op1', 'op2', 'op3']
-    sensor_cols = [f's{i}' for i in range(1, 22)]
-    cols = index_cols + setting_cols + sensor_cols
-
-    # Load data
-    # The data is space-separated and header-less
-    df = pd.read_csv(filepath, sep=r'\s+', header=None, names=cols)
-
-    # Sort by engine_id and cycle
-    df = df.sort_values(['engine_id', 'cycle'])
-
-    # Compute RUL (Remaining Useful Life)
-    # RUL = max_cycle_for_that_engine - current_cycle
-    # We group by engine_id and get the max cycle for each group
-    rul = df.groupby('engine_id')['cycle'].max().reset_index()
-    rul.columns = ['engine_id', 'max_cycle']
-    
-    # Merge max_cycle back to the original dataframe
-    df = df.merge(rul, on='engine_id', how='left')
-    
-    # Calculate RUL
-    df['RUL'] = df['max_cycle'] - df['cycle']
-    
+    if not use_cache:
+        return _parse_and_label(filepath, usecols, float_dtype)
+
+    cache_dir = _label_cache_dir(filepath, cache_path, usecols, float_dtype)
+    df = _load_label_cache(filepath, cache_dir)
+    if df is not None:
+        return df
+
+    # Fingerprint before parsing so a concurrent append invalidates the entry
+    fingerprint = file_fingerprint(filepath)
+    df = _parse_and_label(filepath, usecols, float_dtype)
+    try:
+        save_frame(df, cache_dir, meta={'version': LABEL_CACHE_VERSION, **fingerprint})
+    except OSError as e:
+        print(f"Warning: could not write label cache to {cache_dir}: {e}")
+    return df
+
+def _label_cache_dir(filepath, cache_path, usecols=None, float_dtype=FLOAT_DTYPE):
+    source = os.path.abspath(filepath) + '|' + np.dtype(float_dtype).name
+    if usecols is not None:
+        source += '|' + ','.join(sorted(usecols))
+    key = hashlib.sha1(source.encode()).hexdigest()[:16]
+    return os.path.join(cache_path, "labeled", key)
+
+def _load_label_cache(filepath, cache_dir):
+    """Returns the cached labeled frame if it is still valid for `filepath`, else None."""
+    meta = read_meta(cache_dir)
+    if meta is None or meta.get('version') != LABEL_CACHE_VERSION:
+        return None
+
+    st = os.stat(filepath)
+    if meta.get('size') != st.st_size:
+        return None
+
+    if meta.get('mtime_ns') != st.st_mtime_ns:
+        # Same size but touched: only the content hash can tell if it really changed
+        if hash_file(filepath) != meta.get('content_hash'):
+            return None
+        meta['mtime_ns'] = st.st_mtime_ns
+        try:
+            write_meta(cache_dir, meta)
+        except OSError:
+            pass
+
+    try:
+        return load_frame(cache_dir)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _parse_and_label(filepath, usecols: list = None, float_dtype=FLOAT_DTYPE) -> pd.DataFrame:
+    """Parses the raw CMAPSS text file and attaches the capped RUL label."""
+    df = read_cmapss(filepath, usecols=usecols, float_dtype=float_dtype)
+    return label_rul(df)
+
+def read_cmapss(filepath, usecols: list = None, float_dtype=FLOAT_DTYPE) -> pd.DataFrame:
+    """
+    Fast typed reader for the whitespace-separated CMAPSS text format.
+
+    Uses the pyarrow CSV reader when it is installed and the pandas C parser
+    otherwise. Both split on a single space (CMAPSS has no runs of spaces between
+    fields, only trailing ones) which keeps pandas off the slow regex/Python path.
+    If a file does not follow that layout we fall back to the regex separator.
+
+    Args:
+        filepath: Path (or binary buffer) of a CMAPSS train/test file.
+        usecols: Optional subset of CMAPSS_COLUMNS to materialize. 'engine_id'
+                 and 'cycle' are always read.
+        float_dtype: dtype of the setting and sensor columns (default: PRECISION).
+
+    Returns:
+        pd.DataFrame: int32 engine_id/cycle plus the requested settings/sensors.
+    """
+    if usecols is None:
+        cols = list(CMAPSS_COLUMNS)
+    else:
+        unknown = set(usecols) - set(CMAPSS_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown CMAPSS columns: {sorted(unknown)}")
+        cols = [c for c in CMAPSS_COLUMNS if c in INDEX_COLS or c in usecols]
+
+    dtypes = {c: (np.int32 if c in INDEX_COLS else float_dtype) for c in cols}
+
+    if _HAS_PYARROW:
+        try:
+            return _read_cmapss_arrow(filepath, cols, dtypes)
+        except pa.ArrowInvalid:
+            pass
+    else:
+        try:
+            # Trailing spaces show up as empty extra fields, which we never read
+            return pd.read_csv(filepath, sep=' ', header=None, names=CMAPSS_COLUMNS + ['_pad1', '_pad2'],
+                               usecols=cols, dtype=dtypes, engine='c', float_precision='legacy')[cols]
+        except (pd.errors.ParserError, ValueError):
+            pass
+
+    if hasattr(filepath, 'seek'):
+        filepath.seek(0)
+    df = pd.read_csv(filepath, sep=r'\s+', header=None, names=CMAPSS_COLUMNS, usecols=cols)
+    return df.astype(dtypes)[cols]
+
+def _read_cmapss_arrow(filepath, cols, dtypes):
+    # Count the fields of the first line so trailing-space padding gets a name
+    if hasattr(filepath, 'seek'):
+        pos = filepath.tell()
+        first = filepath.readline()
+        filepath.seek(pos)
+    else:
+        with open(filepath, 'rb') as f:
+            first = f.readline()
+    n_fields = len(first.rstrip(b'\r\n').split(b' '))
+    names = CMAPSS_COLUMNS + [f'_pad{i}' for i in range(max(n_fields - len(CMAPSS_COLUMNS), 0))]
+
+    table = pacsv.read_csv(
+        filepath,
+        read_options=pacsv.ReadOptions(column_names=names),
+        parse_options=pacsv.ParseOptions(delimiter=' '),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=cols,
+            column_types={c: pa.from_numpy_dtype(np.dtype(t)) for c, t in dtypes.items()},
+        ),
+    )
+    return table.to_pandas()
+
+def label_rul(df: pd.DataFrame, cap: int = RUL_CAP) -> pd.DataFrame:
+    """
+    Sorts by (engine_id, cycle) and adds the piecewise-linear RUL target.
+
+    RUL = max_cycle_for_that_engine - current_cycle, capped at `cap`.
+    """
+    # Sort by engine_id and cycle (skipped when the file is already in order)
+    if not is_sorted(df):
+        df = df.sort_values(['engine_id', 'cycle'])
+    df = df.reset_index(drop=True)
+
+    # Broadcast each engine's max cycle back onto its rows (no merge needed)
+    max_cycle = df.groupby('engine_id', sort=False)['cycle'].transform('max')
+
     # Cap RUL at 125 (Piecewise Linear Degradation)
-    df['RUL'] = df['RUL'].clip(upper=125)
-    
-    # Drop max_cycle as it's no longer needed, keeping RUL
-    df = df.drop(columns=['max_cycle'])
+    df['RUL'] = (max_cycle - df['cycle']).clip(upper=cap)
 
     return df
 
+def float_dtype_of(df: pd.DataFrame, cols) -> np.dtype:
+    """Float dtype that new columns derived from `cols` should use (float64 for integer inputs)."""
+    dtype = np.result_type(*[df[c].dtype for c in cols]) if len(cols) else np.dtype(FLOAT_DTYPE)
+    return dtype if dtype.kind == 'f' else np.dtype(np.float64)
+
+def is_sorted(df: pd.DataFrame) -> bool:
+    """
+    True if the rows of `df` are ordered by (engine_id, cycle): engine ids never
+    decrease and cycles increase within each engine. One vectorized pass over the
+    data, so frames reordered after loading are never mistaken for sorted ones.
+    """
+    engine = df['engine_id'].to_numpy()
+    cycle = df['cycle'].to_numpy()
+    d_engine = np.diff(engine)
+    return bool(np.all((d_engine > 0) | ((d_engine == 0) & (np.diff(cycle) > 0))))
+
+def resolve_sources(sources, data_path: str = "") -> list:
+    """
+    Expands a path, a glob pattern, or a list of either into a sorted, de-duplicated file list.
+
+    Relative entries are resolved against `data_path`. The order of the list is the
+    order of `sources` (each glob expanded alphabetically), which fixes the subset index
+    used for engine-id namespacing.
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+
+    files = []
+    for src in sources:
+        src = os.path.join(data_path, src)
+        matches = sorted(glob.glob(src)) if glob.has_magic(src) else [src]
+        if not matches:
+            raise FileNotFoundError(f"No files match {src}")
+        for m in matches:
+            if m not in files:
+                files.append(m)
+    return files
+
+def load_fleet(sources, usecols: list = None, processes: int = None, data_path: str = "",
+               use_cache: bool = USE_CACHE, cache_path: str = CACHE_PATH, float_dtype=FLOAT_DTYPE) -> pd.DataFrame:
+    """
+    Loads and labels several CMAPSS subsets (e.g. FD001-FD004 plus own fleets) into one frame.
+
+    Files without a valid label cache are cut into newline-aligned byte ranges and
+    parsed in a process pool, so parse time scales with the number of cores rather
+    than the number of files. Engine ids are namespaced per subset as
+    `subset_index * ENGINE_ID_STRIDE + engine_id`; the first subset keeps its ids,
+    so a single-file fleet is identical to `load_and_label`.
+
+    Args:
+        sources: Path, glob pattern, or list of paths/globs.
+        usecols: Optional subset of settings/sensors to materialize (see `read_cmapss`).
+        processes: Worker processes (default: os.cpu_count()).
+        data_path: Directory that relative sources are resolved against.
+        use_cache: Read/write the per-file label cache (see `load_and_label`).
+        cache_path: Root of the label cache.
+        float_dtype: Precision of the settings and sensors (default: PRECISION).
+
+    Returns:
+        pd.DataFrame: Labeled frame of all subsets, ordered by subset, engine_id, cycle.
+    """
+    files = resolve_sources(sources, data_path)
+    processes = processes or os.cpu_count() or 1
+
+    # 1. Serve what we can from the label cache
+    frames = [None] * len(files)
+    if use_cache:
+        for i, path in enumerate(files):
+            frames[i] = _load_label_cache(path, _label_cache_dir(path, cache_path, usecols, float_dtype))
+
+    # 2. Parse the rest as byte ranges across the pool
+    pending = [i for i, df in enumerate(frames) if df is None]
+    if pending:
+        fingerprints = {i: file_fingerprint(files[i]) for i in pending} if use_cache else {}
+        sizes = [os.path.getsize(files[i]) for i in pending]
+        target = max(MIN_RANGE_BYTES, sum(sizes) // processes + 1)
+
+        tasks = []
+        for i, size in zip(pending, sizes):
+            for start, end in _split_ranges(files[i], size, target):
+                tasks.append((i, files[i], start, end, usecols, float_dtype))
+
+        if processes > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(processes, len(tasks))) as pool:
+                parts = list(pool.map(_parse_range, tasks))
+        else:
+            parts = [_parse_range(t) for t in tasks]
+
+        for i in pending:
+            file_parts = [part for (j, *_), part in zip(tasks, parts) if j == i]
+            df = label_rul(_concat_frames(file_parts))
+            if use_cache:
+                cache_dir = _label_cache_dir(files[i], cache_path, usecols, float_dtype)
+                try:
+                    save_frame(df, cache_dir, meta={'version': LABEL_CACHE_VERSION, **fingerprints[i]})
+                except OSError as e:
+                    print(f"Warning: could not write label cache to {cache_dir}: {e}")
+            frames[i] = df
+
+    # 3. Namespace engine ids and stitch the subsets together
+    for i, (path, df) in enumerate(zip(files, frames)):
+        if len(df) and df['engine_id'].max() >= ENGINE_ID_STRIDE:
+            raise ValueError(f"{path}: engine ids must be < ENGINE_ID_STRIDE ({ENGINE_ID_STRIDE})")
+    offsets = [i * ENGINE_ID_STRIDE for i in range(len(frames))]
+
+    # Every subset is sorted and the offsets grow with the subset index
+    return _concat_frames(frames, engine_offsets=offsets)
+
+def _split_ranges(filepath, size, target):
+    """Cuts a file into byte ranges of roughly `target` bytes that end on a newline."""
+    if size <= target:
+        return [(0, size)]
+
+    bounds = [0]
+    with open(filepath, 'rb') as f:
+        while bounds[-1] + target < size:
+            f.seek(bounds[-1] + target)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _parse_range(task):
+    # Runs in a worker process: parse one byte range of one file
+    _, filepath, start, end, usecols, float_dtype = task
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        buf = f.read(end - start)
+    return read_cmapss(io.BytesIO(buf), usecols=usecols, float_dtype=float_dtype)
+
+def _concat_frames(frames, engine_offsets=None):
+    """
+    Concatenates frames with identical columns by filling one preallocated array per column.
+
+    Each value is copied exactly once (no intermediate pd.concat blocks). When
+    `engine_offsets` is given, the offset of each frame is added to its engine_id
+    while it is being copied.
+    """
+    if len(frames) == 1 and not (engine_offsets and engine_offsets[0]):
+        return frames[0]
+
+    columns = list(frames[0].columns)
+    total = sum(len(df) for df in frames)
+    data = {}
+    for col in columns:
+        out = np.empty(total, dtype=frames[0][col].dtype)
+        pos = 0
+        for k, df in enumerate(frames):
+            n = len(df)
+            values = df[col].to_numpy()
+            if col == 'engine_id' and engine_offsets and engine_offsets[k]:
+                np.add(values, engine_offsets[k], out=out[pos:pos + n])
+            else:
+                out[pos:pos + n] = values
+            pos += n
+        data[col] = out
+    return pd.DataFrame(data, copy=False)
+
 if __name__ == "__main__":
     import os
     # Loading configuration to use path is a better practice but user asked for specific path in main block
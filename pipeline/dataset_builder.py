@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from pipeline.feature_engineering import segment_positions
 
 def build_tabular_dataset(df: pd.DataFrame, feature_cols: list, target_col: str = "RUL") -> tuple:
     """
@@ -23,53 +24,86 @@ def build_tabular_dataset(df: pd.DataFrame, feature_cols: list, target_col: str
     
     return X, y
 
-def build_sequence_dataset(df: pd.DataFrame, feature_cols: list, window: int = 30, target_col: str = "RUL", max_samples: int = None) -> tuple:
+def engine_window_runs(engine_ids: np.ndarray, window: int, max_samples: int = None) -> tuple:
+    """
+    Locates the sliding windows of every engine in a frame sorted by engine.
+
+    Windows never cross engines and engines shorter than `window` have none. With
+    `max_samples`, windows are counted engine by engine in order and the count is
+    cut at `max_samples` (the last engine may be cut inside).
+
+    Args:
+        engine_ids: engine_id column, every engine one contiguous run.
+        window: Size of the sliding window.
+        max_samples: Optional limit on the total number of windows.
+
+    Returns:
+        tuple: (first, counts)
+            first: Row where the first window of each engine starts.
+            counts: Number of windows of each engine (0 for short engines).
+    """
+    starts, lengths, _ = segment_positions(engine_ids)
+    return starts, window_counts(lengths, window, max_samples)
+
+def window_counts(lengths: np.ndarray, window: int, max_samples: int = None) -> np.ndarray:
+    """Number of windows of each engine of `lengths` rows (see `engine_window_runs`)."""
+    counts = np.maximum(np.asarray(lengths, dtype=np.int64) - window + 1, 0)
+    if max_samples is not None:
+        before = np.cumsum(counts) - counts
+        counts = np.clip(max_samples - before, 0, counts)
+    return counts
+
+def build_sequence_dataset(df: pd.DataFrame, feature_cols: list, window: int = 30, target_col: str = "RUL",
+                           max_samples: int = None, copy: bool = True) -> tuple:
     """
     Creates a sequence dataset (sliding window) for LSTM/RNN models.
-    
+
+    The feature columns are read once into a contiguous (rows, features) block and
+    the windows are strided views into it (`sliding_window_view`), so no window is
+    sliced out one by one; the target of a window is the target at its last row.
+
     Args:
         df: Input DataFrame.
         feature_cols: List of feature columns to include.
         window: Size of the sliding window (default 30).
         target_col: Name of the target column (default "RUL").
         max_samples: Optional limit on number of samples to generate (for debugging).
-        
+        copy: True (default) gathers all windows into one array. False returns
+              read-only views instead, one per engine, without copying any window.
+
     Returns:
         tuple: (X_seq, y_seq)
-            X_seq: Numpy array of shape (num_samples, window, num_features).
-            y_seq: Numpy array of shape (num_samples,).
+            copy=True:
+                X_seq: Numpy array of shape (num_samples, window, num_features).
+                y_seq: Numpy array of shape (num_samples,).
+            copy=False: lists with one entry per engine that has windows:
+                X_seq: Read-only views of shape (engine_samples, window, num_features).
+                y_seq: Target views of shape (engine_samples,).
     """
-    X_seq = []
-    y_seq = []
-    
-    # Process each engine independently to avoid mixing data across engines
-    for engine_id, engine_df in df.groupby('engine_id'):
-        
-        # If max_samples reached, stop
-        if max_samples is not None and len(X_seq) >= max_samples:
-            break
+    # Engines in engine_id order, rows in their original order (like groupby('engine_id'))
+    engine_ids = df['engine_id'].to_numpy()
+    if len(engine_ids) and (engine_ids[1:] < engine_ids[:-1]).any():
+        df = df.iloc[np.argsort(engine_ids, kind='stable')]
+        engine_ids = df['engine_id'].to_numpy()
 
-        # If engine duration is shorter than window, we skip it (or zero-pad, but skipping is cleaner for quality)
-        if len(engine_df) < window:
-            continue
-            
-        data = engine_df[feature_cols].values
-        targets = engine_df[target_col].values
-        
-        # Slide window
-        # We want to go from index 0 -> window-1, 1 -> window, ...
-        # Range of starting indices: 0 to len - window
-        for i in range(len(engine_df) - window + 1):
-            if max_samples is not None and len(X_seq) >= max_samples:
-                break
-                
-            window_data = data[i : i + window]
-            target = targets[i + window - 1] # Target at the last timestep of the window
-            
-            X_seq.append(window_data)
-            y_seq.append(target)
-            
-    return np.array(X_seq), np.array(y_seq)
+    data = np.ascontiguousarray(df[feature_cols].to_numpy())
+    targets = df[target_col].to_numpy()
+    first, counts = engine_window_runs(engine_ids, window, max_samples)
+
+    # (rows - window + 1, window, features) views; window i covers rows i .. i + window - 1
+    if len(data) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(data, window, axis=0).transpose(0, 2, 1)
+    else:
+        windows = np.empty((0, window, data.shape[1]), dtype=data.dtype)
+
+    if not copy:
+        runs = [(f, n) for f, n in zip(first, counts) if n > 0]
+        return ([windows[f:f + n] for f, n in runs],
+                [targets[f + window - 1:f + window - 1 + n] for f, n in runs])
+
+    # One gather of every window (and of the targets at their last rows)
+    starts = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return windows[starts], targets[starts + window - 1]
 
 if __name__ == "__main__":
     from pipeline.data_loader import load_and_label
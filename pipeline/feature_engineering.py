@@ -2,6 +2,18 @@ import pandas as pd
 import numpy as np
 from scipy import stats
 import sys
+from pipeline.data_loader import SORT_KEYS, is_sorted, float_dtype_of
+from pipeline.rolling import SegmentRolling
+
+# Version of the engineered feature definitions. Bump whenever a feature (or the Health
+# Index built on them) is computed differently, so models trained on older features are
+# detected (see pipeline/models/model_meta.py). 1: forward-looking `_trend`;
+# 2: trailing `_trend` slope.
+FEATURE_VERSION = 2
+
+# Cells (rows x sensors) per kernel tile in add_degradation_features: 64k float64
+# values = 512 KB per temporary, small enough to stay in cache between kernels
+TILE_CELLS = 1 << 16
 
 def _slope_func(y):
     """Helper to compute slope for a rolling window."""
@@ -19,271 +31,270 @@ def _slope_func(y):
         return 0.0
     return np.polyfit(x, y, 1)[0]
 
-def add_degradation_features(df: pd.DataFrame, sensor_cols: list, window_short: int = 5, window_long: int = 10) -> pd.DataFrame:
+def feature_column_names(sensor_cols: list, window_short: int = 5, window_long: int = 10,
+                         windows: list = None) -> list:
+    """
+    Names of the columns generated by `add_degradation_features`, in output order.
+
+    Per sensor: rolling means, rolling stds, delta and trend; then one drift column
+    per sensor. `windows` defaults to [window_short, window_long].
+    """
+    windows = _rolling_windows(window_short, window_long, windows)
+    names = []
+    for sensor in sensor_cols:
+        names += [f'{sensor}_rm{w}' for w in windows]
+        names += [f'{sensor}_rs{w}' for w in windows]
+        names += [f'{sensor}_delta', f'{sensor}_trend']
+    names += [f'{sensor}_drift' for sensor in sensor_cols]
+    return names
+
+def _rolling_windows(window_short, window_long, windows):
+    if windows is None:
+        return [window_short, window_long]
+    windows = list(dict.fromkeys(int(w) for w in windows))
+    if not windows or min(windows) < 1:
+        raise ValueError(f"Rolling windows must be positive integers, got {windows}")
+    return windows
+
+def segment_positions(engine_ids: np.ndarray) -> tuple:
+    """
+    Describes the engine segments of a frame sorted by (engine_id, cycle).
+
+    Args:
+        engine_ids: engine_id column (sorted, so every engine is one contiguous run).
+
+    Returns:
+        tuple: (starts, lengths, pos)
+            starts: Row index where each engine begins.
+            lengths: Number of rows of each engine.
+            pos: Position of every row inside its engine (0 at the engine's first row).
+    """
+    n = len(engine_ids)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    starts = np.flatnonzero(np.r_[True, engine_ids[1:] != engine_ids[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    pos = np.arange(n) - np.repeat(starts, lengths)
+    return starts, lengths, pos
+
+def _feature_plan(names: list, sensor_cols: list, windows: list, window_long: int) -> dict:
+    """
+    Groups the requested feature columns by kernel.
+
+    Returns:
+        dict: (kind, window) -> (block rows, sensor indices), with kind one of
+              'mean', 'std', 'delta', 'trend' and 'drift' (window None where unused).
+    """
+    source = {}
+    for i, sensor in enumerate(sensor_cols):
+        for w in windows:
+            source[f'{sensor}_rm{w}'] = ('mean', w, i)
+            source[f'{sensor}_rs{w}'] = ('std', w, i)
+        source[f'{sensor}_delta'] = ('delta', None, i)
+        source[f'{sensor}_trend'] = ('trend', window_long, i)
+        source[f'{sensor}_drift'] = ('drift', None, i)
+
+    plan = {}
+    for row, name in enumerate(names):
+        kind, w, i = source[name]
+        rows, sensors = plan.setdefault((kind, w), ([], []))
+        rows.append(row)
+        sensors.append(i)
+    return plan
+
+def _row_tiles(starts: np.ndarray, n_rows: int, tile_rows: int) -> list:
+    """
+    Splits rows into consecutive (lo, hi) tiles of about `tile_rows` rows that start
+    on engine boundaries (an engine longer than a tile gets a tile of its own).
+    """
+    if n_rows == 0:
+        return []
+    targets = np.arange(0, n_rows, max(tile_rows, 1))
+    cuts = starts[np.minimum(np.searchsorted(starts, targets), len(starts) - 1)]
+    cuts = np.unique(np.r_[cuts, n_rows])
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def _segment_sums(rows: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Column sums of consecutive groups of `rows` (group g has counts[g] rows, possibly 0).
+    """
+    # A zero row at the end keeps every reduceat offset in range; groups with no rows
+    # get the row at their offset from reduceat and are reset to 0
+    padded = np.concatenate([rows, np.zeros((1,) + rows.shape[1:])])
+    offsets = np.r_[0, np.cumsum(counts[:-1])].astype(np.int64)
+    sums = np.add.reduceat(padded, offsets, axis=0) if len(counts) else padded[:0]
+    sums[counts == 0] = 0.0
+    return sums
+
+def add_degradation_features(df: pd.DataFrame, sensor_cols: list, window_short: int = 5, window_long: int = 10,
+                             windows: list = None, inplace: bool = False, required=None) -> pd.DataFrame:
     """
     Adds rolling statistics, trends, and drift features to the DataFrame.
 
+    All generated features are written into one preallocated (features x rows)
+    block and attached to the frame with a single concat, so the frame is never
+    fragmented by column-by-column inserts. Every kernel works on the whole
+    (rows x sensors) matrix at once, with no per-sensor loop: rolling means, stds
+    and the trend slope come from per-engine prefix sums (see `SegmentRolling`),
+    which serve every window and never reach into the previous engine, so the
+    first (window - 1) rows of each engine are exactly 0 without masking; the drift
+    baselines of all sensors come from one grouped reduction and are broadcast.
+
     Args:
         df: Input DataFrame.
         sensor_cols: List of sensor columns to calculate features for.
         window_short: Window size for short-term rolling stats.
         window_long: Window size for long-term rolling stats and trend.
+        windows: Rolling mean/std windows, e.g. [5, 10, 20, 30, 50]
+                 (default: [window_short, window_long]).
+        inplace: If True, `df` may be sorted in place and its columns are reused
+                 in the result without a defensive copy; the caller hands over
+                 ownership and must use the returned frame.
+        required: Optional collection of column names; only the generated columns in
+                  it are computed (names this stage does not generate are ignored).
+                  Default: all columns of `feature_column_names`.
+
+    The trend is the least-squares slope of the last `window_long` readings up to
+    and including the current cycle (a trailing window, like the rolling stats).
+
+    New columns take the float dtype of the sensor columns (float32 when PRECISION
+    is "float32"); rolling, trend and drift are accumulated in float64 and then cast.
 
     Returns:
         pd.DataFrame: DataFrame enriched with new features.
     """
-    df_feat = df.copy()
-    
-    # Pre-calculate x for slope if we wanted to optimize, but we'll specific implementation inside loop
+    # Ensure sorted: frames already in order (e.g. from load_and_label) skip the sort.
+    # The result is a new frame either way (see the concat below), so no copy is needed here.
+    if is_sorted(df):
+        df_feat = df
+    elif inplace:
+        df.sort_values(by=SORT_KEYS, inplace=True)
+        df_feat = df
+    else:
+        df_feat = df.sort_values(by=SORT_KEYS)
+    dtype = float_dtype_of(df_feat, sensor_cols)
+    windows = _rolling_windows(window_short, window_long, windows)
     
     print(f"Generating features for {len(sensor_cols)} sensors using vectorized operations...")
     sys.stdout.flush()
-    
-    # Pre-compute weights for slope calculation
-    # Slope = sum((x - mx) * (y - my)) / sum((x - mx)^2)
-    # Since sum(x-mx) = 0, numerator = sum((x-mx)*y)
-    # We can compute this as a convolution of y with (x-mx).
-    # We need to do this for both window_long (trend).
-    
-    # Weights for window_long
-    x_long = np.arange(window_long)
-    mx_long = x_long.mean()
-    w_long = x_long - mx_long
-    denom_long = (w_long**2).sum()
-    
-    # We reverse weights for np.convolve (or use correlate), but pandas rolling supports 'win_type' for some things, but not arbitrary weights easily without apply.
-    # Actually, using rolling().mean() etc is fine. The bottleneck was rolling().apply().
-    # We will use explicit numpy strides or simple convolution per group if possible.
-    # But grouping + convolution might be tricky with pandas indices.
-    # Faster approach for Hackathon:
-    # Iterate sensors (15) is fine.
-    # Inside: grouping by engine is slow if many engines? No, 200 engines is fine.
-    # The slow part was 200 engines * N cycles * rolling apply.
-    # Let's vectorize across the whole dataframe (ignoring engine boundaries for the convolution, then masking boundaries).
-    # OR: Just loop over sensors, and for each sensor, use a fast rolling window on the whole column, 
-    # but we MUST respect engine boundaries.
-    # Best way: Use grouping but optimize the function.
-    
-    # Let's use a custom function that operates on the whole array but resets at engine boundaries?
-    # Simpler: groupby().transform() with a vectorized func?
-    # No, rolling() on a GroupBy object is optimized for mean/std. It is NOT optimized for apply.
-    
-    # OPTIMIZATION:
-    # We can use the fact that data is likely sorted by engine_id, cycle.
-    # We can apply convolution on the entire column, then set the first (window-1) values of each engine to NaN.
-    # This avoids python loops per window.
-    
-    # Ensure sorted
-    df_feat = df_feat.sort_values(by=['engine_id', 'cycle'])
-    
-    # Identify engine boundaries (indices where engine_id changes)
-    # Actually, if we just run rolling on the whole column, we bleed data from Engine 1 to Engine 2.
-    # But if we mask out the first W-1 elements of each engine, we are safe.
-    
-    # Get starts of engines
-    # shift(1) != current
-    engine_change = df_feat['engine_id'] != df_feat['engine_id'].shift(1)
-    # We need to invalidate 'window' steps after engine change.
-    # We'll handle this cleanup at the end.
-    
-    for i, sensor in enumerate(sensor_cols):
-        # Quick progress
-        # print(f"Processing {sensor}...") 
-        
-        # 1. Rolling Mean & Std (Pandas is fast enough here usually, but we can do global too)
-        # To be safe and correct with boundaries without complex masking logic for EVERY feature,
-        # let's try the global approach with masking.
-        
-        # Extract series
-        vals = df_feat[sensor].values
-        
-        # 1. Rolling Mean/Std
-        # global rolling
-        s_series = df_feat[sensor]
-        
-        # Using pure pandas rolling on the whole column is fast
-        df_feat[f'{sensor}_rm{window_short}'] = s_series.rolling(window=window_short).mean().fillna(0)
-        df_feat[f'{sensor}_rm{window_long}'] = s_series.rolling(window=window_long).mean().fillna(0)
-        df_feat[f'{sensor}_rs{window_short}'] = s_series.rolling(window=window_short).std().fillna(0)
-        df_feat[f'{sensor}_rs{window_long}'] = s_series.rolling(window=window_long).std().fillna(0)
-        
-        # 2. Delta
-        df_feat[f'{sensor}_delta'] = s_series.diff().fillna(0)
-
-        # 3. Rolling Trend (Slope) - Vectorized Convolution
-        # convolve(vals, w_long, mode='same')?
-        # valid: output size N - K + 1. 
-        # same: output size N. 
-        # We need casual convolution (only past). 
-        # np.convolve is "full" overlap centered usually?
-        # We want: y[t] = dot(x[t-W+1:t+1], w)
-        # This is cross-correlation or convolution with reversed weights.
-        
-        # Let's use np.convolve with 'full', then slice.
-        # w_long needs to be applied such that w_long[-1] multiplies x[t], w_long[-2] multiplies x[t-1]...
-        # So if we define w_long as [x_0, x_1...], we align latest with latest.
-        # Actually standard definition of slope is weighted sum.
-        # If we use np.convolve(input, weights_reversed, mode='valid') we get valid outputs.
-        # We can pad input with NaNs or 0s at start.
-        
-        # Weights (x_long - mx) correspond to positions [0, 1, ..., W-1] in the window.
-        # 0 is the oldest point, W-1 is the newest.
-        # So we want dot product of window[0..W-1] with w_long[0..W-1].
-        # Convolution flip kernel. So we use w_long[::-1].
-        
-        check_conv = np.convolve(vals, w_long[::-1], mode='full')
-        # The result at index t (corresponding to input index t) should use input[t-W+1 : t+1].
-        # np.convolve 'full' output size is N+W-1.
-        # We want the value at index `t` to represent the window ending at `t`.
-        # The convolution result at index `i` corresponds to overlap.
-        # Correct shift:
-        # We want the result to align with the end of the window.
-        # For 'full', the first complete overlap (using W points) is at index W-1.
-        # So we take slice [W-1 : N + W-1] -> NO.
-        # Input length N. Output length N+W-1.
-        # We want output length N.
-        # Slice should be: [:N] with some shift?
-        # Let's trace:
-        # Index W-1 of convolve is dot(vals[0:W], w_reversed). Perfet.
-        # So we take `check_conv[window_long-1 : -window_long+1]` if we padded?
-        # Actually easiest is: check_conv[:len(vals)] shifted?
-        # Let's just use slicing: `check_conv[window_long-1 : len(vals) + window_long - 1]`
-        
-        conv_res = check_conv[window_long-1 : len(vals) + window_long - 1]
-        
-        # Denominator is constant
-        slope = conv_res / denom_long
-        df_feat[f'{sensor}_trend'] = slope
-
-        # 4. Drift (Baseline)
-        # This needs per-engine baseline. 
-        # Groupby is unavoidable for calculating the baseline, but we can map it back fast.
-        # This part was not the slow bottleneck (it's one agg per engine).
-        # We can allow this to remain or optimize.
-        # Optimization:
-        # Calculate all baselines at once for all sensors?
-        # We are inside sensor loop.
-        # It's fast enough.
-        
-        # Correction: We must NOT use data from previous engine.
-        # We will mask "bad" indices.
-        
-    # Correcting data bleeding across engines
-    # For each engine, the first `window` rows have potentially used data from previous engine (for rolling)
-    # or are incomplete.
-    # Group by engine and just re-apply mask?
-    # Or cleaner:
-    # Iterate through engine start indices and set previous `window` rows to NaN or 0?
-    
-    # We can detect engine switches and build a mask.
-    # mask = True valid, False invalid.
-    # Initially all True.
-    # For every engine change at index `idx`:
-    # indices [idx, idx+1, ..., idx+window-1] are invalid for window-based features.
-    
-    # Since window sizes are small (5, 10, 30), we can just loop engine starts (200 of them) and mask.
-    # This is negligible cost.
-    
-    # Find indices where engine changes
-    # engine_id is integer?
-    ids = df_feat['engine_id'].values
-    change_indices = np.where(ids[:-1] != ids[1:])[0] + 1
-    # Include index 0
-    start_indices = np.insert(change_indices, 0, 0)
-    
-    # Windows used
-    windows = [window_short, window_long]
-    # Delta uses 1.
-    
-    for idx in start_indices:
-        # 1. Delta: index `idx` delta is invalid (diff with prev engine). Set to 0.
-        for sensor in sensor_cols:
-             df_feat.at[idx, f'{sensor}_delta'] = 0
-             
-        # 2. Rolling
-        # For rows `idx` to `idx + window - 1`, the rolling value includes prev engine data.
-        # We should set them to 0 or first valid value?
-        # The prompt said "forward-fill then zero-fill".
-        # If we set to NaN, we can fill later. 
-        # But wait, original code did: rolling()... then fillna(0) within group.
-        # Which implicitly means start of group is NaN then filled with 0.
-        # So we should set these bleeding values to 0 (or NaN then 0).
-        
-        for w in windows:
-            # Range to invalid
-            if idx + w - 1 < len(df_feat): # Check bounds
-                # We want to clear [idx : idx + w - 1]
-                # Actually, pandas rolling min_periods=None implies we need full window.
-                # If we have less than window, it gives NaN.
-                # But here we ran global rolling, so it took prev values.
-                # So yes, we MUST clear them.
-                
-                # Doing this cell-by-cell in python loop for every sensor is slow if done loosely.
-                # Better: Create a global boolean mask for each window size.
-                pass 
-                
-    # Vectorized masking
-    # Create a mask for each window size
-    # invalid_mask_W = zeros(N)
-    # for idx in start_indices: invalid_mask[idx : idx+W-1] = 1
-    # This is fast.
-    
-    for w in windows:
-        mask = np.ones(len(df_feat), dtype=bool)
-        for idx in start_indices:
-            end = min(idx + w - 1, len(df_feat))
-            mask[idx : end] = False
-            
-        # Apply mask to all columns using this window
-        # Which columns?
-        cols_w = [c for c in df_feat.columns if c.endswith(f'_rm{w}') or c.endswith(f'_rs{w}') or c.endswith(f'_trend') and w == window_long]
-        # Note: trend uses window_long
-        
-        df_feat.loc[~mask, cols_w] = 0.0
+
+    all_names = feature_column_names(sensor_cols, window_short, window_long, windows)
+    if required is None:
+        names = all_names
+    else:
+        wanted = set(required)
+        names = [c for c in all_names if c in wanted]
+    stale = [c for c in all_names if c in df_feat.columns]
+    if stale:
+        # Recomputing features on an already-featured frame replaces them
+        df_feat = df_feat.drop(columns=stale)
+
+    n_rows = len(df_feat)
+
+    # One (features x rows) block: each feature is a contiguous row that becomes one
+    # column of the result without another copy
+    block = np.empty((len(names), n_rows), dtype=dtype)
+
+    # Which block rows each kernel fills, and for which sensors (only the kernels,
+    # windows and sensors behind the requested columns are computed at all)
+    plan = _feature_plan(names, sensor_cols, windows, window_long)
+    used = sorted({i for _, sensors in plan.values() for i in sensors})
+    roll_sensors = sorted({i for (kind, _), (_, sensors) in plan.items()
+                           if kind in ('mean', 'std', 'trend') for i in sensors})
+
+    # Position of every row inside its engine (shared by all sensors and windows)
+    starts, lengths, pos = segment_positions(df_feat['engine_id'].to_numpy())
+    segment = np.repeat(np.arange(len(lengths)), lengths)
+
+    # The used sensors as one (rows x sensors) float64 matrix, column-major so that the
+    # transposed kernel results land in block's (features x rows) layout contiguously
+    values = np.asfortranarray(df_feat[[sensor_cols[i] for i in used]].to_numpy(dtype=np.float64))
+    column = {i: k for k, i in enumerate(used)}
+
+    def columns_of(sensors, among):
+        # Column indices of `sensors` inside a matrix holding the sensors `among`
+        # (None when that is every column, so no gather is needed)
+        if list(sensors) == list(among):
+            return None
+        position = {i: k for k, i in enumerate(among)}
+        return [position[i] for i in sensors]
+
+    def gather(a, cols):
+        return a if cols is None else a[:, cols]
 
     # Drift Calculation (Needs Baseline)
-    # We can do this vectorized for all sensors at once?
-    # Or keep the per-sensor loop for drift as it is not the bottleneck (agg is fast).
-    # Re-implement drift inside the sensor loop or after?
-    # Let's do it after to keep the main loop clean or inside.
-    # Inside is cleaner for column management.
-    
-    # Let's re-add drift calculation in a separate block or iterate again?
-    # Iterating 15 times for lightweight AGG is fine.
-    
-    print("Calculating drift features...")
-    sys.stdout.flush()
-    # Baseline: First 20 cycles.
-    base_mask = df_feat['cycle'] <= 20
-    
-    for sensor in sensor_cols:
-        # Global drift calc
-        # We need mean/std per engine.
-        # transform() is efficient.
-        
-        # Filter baseline data
-        # grouping entire df is slightly expensive? No, 20k rows is nothing.
-        # But we only want baseline rows.
-        
-        # Fast aligned mapping:
-        # 1. Compute baselines
-        stats = df_feat[base_mask].groupby('engine_id')[sensor].agg(['mean', 'std'])
-        # stats index is engine_id
-        
-        # 2. Map to full df
-        # map() is fast
-        df_feat[f'{sensor}_mean'] = df_feat['engine_id'].map(stats['mean'])
-        df_feat[f'{sensor}_std'] = df_feat['engine_id'].map(stats['std'])
-        
-        # 3. Compute
+    drift_rows, drift_sensors = plan.get(('drift', None), ([], []))
+    if drift_sensors:
+        print("Calculating drift features...")
+        sys.stdout.flush()
+        drift_cols = columns_of(drift_sensors, used)
+        # Baseline: First 20 cycles of each engine (mean and sample std per engine), for
+        # all sensors at once with one grouped reduction over the baseline rows
+        base_mask = df_feat['cycle'].to_numpy() <= 20
+        base_segment = segment[base_mask]
+        base_count = np.bincount(base_segment, minlength=len(lengths)).astype(np.float64)
         epsilon = 1e-9
-        df_feat[f'{sensor}_drift'] = (df_feat[sensor] - df_feat[f'{sensor}_mean']) / (df_feat[f'{sensor}_std'] + epsilon)
-        
-        # Drop temp
-        df_feat.drop(columns=[f'{sensor}_mean', f'{sensor}_std'], inplace=True)
-    
-    # Final fillna for safety
-    df_feat = df_feat.fillna(0)
+
+        # In float64: near-constant baselines make this ill-conditioned
+        base_vals = gather(values[base_mask], drift_cols)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            base_mean = _segment_sums(base_vals, base_count) / base_count[:, None]
+            sq = _segment_sums((base_vals - base_mean[base_segment]) ** 2, base_count)
+            base_std = np.sqrt(sq / (base_count[:, None] - 1))
+        base_std[base_count < 2] = np.nan
+        # (sensors x engines), so expanding them per row yields block's layout directly
+        base_mean_t = np.ascontiguousarray(base_mean.T)
+        base_scale_t = np.ascontiguousarray(base_std.T) + epsilon
+
+    roll_cols = columns_of(roll_sensors, used)
+    kernels = [(key, rows, columns_of(sensors, roll_sensors if key[0] != 'delta' else used))
+               for key, (rows, sensors) in plan.items() if key[0] != 'drift']
+
+    # The kernels run over the sensor matrix one row tile at a time. Tiles are cut
+    # at engine starts (rolling windows never cross an engine, so tiles are independent)
+    # and sized so that each float64 temporary stays cache-sized: full-height 2D
+    # temporaries would make every elementwise kernel a trip through main memory.
+    for lo, hi in _row_tiles(starts, n_rows, TILE_CELLS // max(len(used), 1)):
+        x = values[lo:hi]
+        tile = block[:, lo:hi]
+        roll = SegmentRolling(gather(x, roll_cols), pos[lo:hi]) if roll_sensors else None
+
+        for (kind, w), rows, cols in kernels:
+            if kind == 'mean':
+                # 1. Rolling Mean/Std for every window from the same prefix sums
+                tile[rows] = gather(roll.mean(w), cols).T
+            elif kind == 'std':
+                tile[rows] = gather(roll.std(w), cols).T
+            elif kind == 'delta':
+                # 2. Delta (0 on each engine's first row; tiles start on an engine's first row)
+                xd = gather(x, cols)
+                delta = np.empty((xd.shape[1], hi - lo))
+                delta[:, 0] = 0.0
+                delta[:, 1:] = (xd[1:] - xd[:-1]).T
+                delta[:, pos[lo:hi] == 0] = 0.0
+                tile[rows] = delta
+            else:
+                # 3. Rolling Trend (least-squares slope over the last window_long rows)
+                tile[rows] = gather(roll.slope(w), cols).T
+
+        if drift_sensors:
+            # 4. Drift: broadcast the per-engine baselines over the tile's rows
+            seg = segment[lo:hi]
+            with np.errstate(invalid='ignore'):
+                tile[drift_rows] = ((gather(x, drift_cols).T - base_mean_t[:, seg])
+                                    / base_scale_t[:, seg])
+
+        # Fillna for safety (engines without a usable baseline, NaN inputs)
+        np.copyto(tile, 0, where=np.isnan(tile))
+    del values
+
+    nan_cols = df_feat.columns[df_feat.isna().any()].tolist()
+    if nan_cols:
+        df_feat = df_feat.fillna({c: 0 for c in nan_cols})
+
+    features = pd.DataFrame(block.T, index=df_feat.index, columns=names, copy=False)
+    df_feat = pd.concat([df_feat, features], axis=1)
     
     return df_feat
 
@@ -0,0 +1,157 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+META_FILE = "meta.json"
+
+def file_fingerprint(filepath, chunk_size: int = 1 << 20) -> dict:
+    """
+    Returns the cheap (size, mtime) and the expensive (content hash) identity of a file.
+
+    Args:
+        filepath: Path to the source file.
+        chunk_size: Read size used while hashing (default 1 MiB).
+
+    Returns:
+        dict: {'path', 'size', 'mtime_ns', 'content_hash'}
+    """
+    st = os.stat(filepath)
+    return {
+        'path': os.path.abspath(filepath),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'content_hash': hash_file(filepath, chunk_size),
+    }
+
+def hash_file(filepath, chunk_size: int = 1 << 20) -> str:
+    """Streams a file through blake2b and returns the hex digest."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def save_frame(df: pd.DataFrame, path: str, meta: dict = None):
+    """
+    Stores a DataFrame as one .npy file per column plus a JSON sidecar.
+
+    The layout is columnar and uncompressed so that `load_frame` can memory-map
+    every column straight from the page cache instead of parsing anything.
+    The directory is written next to its final location and swapped in with a
+    rename, so readers never observe a half-written frame.
+
+    Args:
+        df: DataFrame with numeric columns (the index is not stored).
+        path: Target directory.
+        meta: Optional JSON-serialisable dict stored alongside the columns.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        values = np.ascontiguousarray(df[col].to_numpy())
+        if values.dtype == object:
+            raise TypeError(f"Column '{col}' has object dtype and cannot be stored columnar.")
+        np.save(os.path.join(tmp_path, f"{i}.npy"), values, allow_pickle=False)
+        columns.append({'name': col, 'file': f"{i}.npy", 'dtype': values.dtype.str})
+
+    with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+        json.dump({'columns': columns, 'n_rows': len(df), 'meta': meta or {}}, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    os.replace(tmp_path, path)
+
+def read_meta(path) -> dict:
+    """Returns the user metadata of a stored frame, or None if it does not exist."""
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            return json.load(f)['meta']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def write_meta(path, meta: dict):
+    """Rewrites the user metadata of a stored frame in place (columns are untouched)."""
+    meta_path = os.path.join(path, META_FILE)
+    with open(meta_path) as f:
+        payload = json.load(f)
+    payload['meta'] = meta
+    tmp_meta = f"{meta_path}.tmp-{os.getpid()}"
+    with open(tmp_meta, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_meta, meta_path)
+
+def add_column(path, name: str, values):
+    """
+    Appends (or replaces) one column of a stored frame without rewriting the others.
+
+    Args:
+        path: Directory created by `save_frame`.
+        name: Column name.
+        values: 1D array with one value per stored row.
+    """
+    meta_path = os.path.join(path, META_FILE)
+    with open(meta_path) as f:
+        payload = json.load(f)
+
+    values = np.ascontiguousarray(values)
+    if values.ndim != 1 or len(values) != payload['n_rows']:
+        raise ValueError(f"Column '{name}' must be 1D with {payload['n_rows']} rows, got shape {values.shape}")
+
+    existing = [c for c in payload['columns'] if c['name'] == name]
+    filename = existing[0]['file'] if existing else f"{len(payload['columns'])}.npy"
+    tmp_file = os.path.join(path, f"{filename}.tmp-{os.getpid()}.npy")
+    np.save(tmp_file, values, allow_pickle=False)
+    os.replace(tmp_file, os.path.join(path, filename))
+
+    if existing:
+        existing[0]['dtype'] = values.dtype.str
+    else:
+        payload['columns'].append({'name': name, 'file': filename, 'dtype': values.dtype.str})
+
+    tmp_meta = f"{meta_path}.tmp-{os.getpid()}"
+    with open(tmp_meta, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_meta, meta_path)
+
+def load_frame(path, mmap: bool = True, columns: list = None) -> pd.DataFrame:
+    """
+    Loads a DataFrame written by `save_frame`.
+
+    Args:
+        path: Directory created by `save_frame`.
+        mmap: If True (default) columns are memory-mapped copy-on-write, so the
+              load is O(1) and later in-place edits never touch the files.
+        columns: Optional subset of columns to load (default: all, in stored order).
+
+    Returns:
+        pd.DataFrame: Frame with a fresh RangeIndex.
+    """
+    with open(os.path.join(path, META_FILE)) as f:
+        payload = json.load(f)
+
+    mode = 'c' if mmap else None
+    data = {}
+    stored = payload['columns']
+    if columns is not None:
+        by_name = {c['name']: c for c in stored}
+        missing = [c for c in columns if c not in by_name]
+        if missing:
+            raise KeyError(f"Columns not in stored frame {path}: {missing}")
+        stored = [by_name[c] for c in columns]
+
+    for col in stored:
+        values = np.load(os.path.join(path, col['file']), mmap_mode=mode, allow_pickle=False)
+        # Plain ndarray view over the mapping (keeps the memmap subclass out of pandas)
+        data[col['name']] = np.asarray(values)
+
+    # copy=False keeps one block per column, each backed by its own mapping
+    return pd.DataFrame(data, copy=False)
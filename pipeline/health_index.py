@@ -1,34 +1,31 @@
 import pandas as pd
 import numpy as np
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import MinMaxScaler
+from sklearn.decomposition import PCA, IncrementalPCA
 import matplotlib.pyplot as plt
 import re
+import functools
+from pipeline.config import HI_FIT_METHOD, HI_BATCH_ROWS
+from pipeline.data_loader import float_dtype_of
 
-def add_health_index(df: pd.DataFrame, feature_cols: list = None, n_components: int = 1) -> tuple:
+# Ways to fit the HI projection (see HealthIndexModel)
+HI_FIT_METHODS = ("covariance", "incremental", "randomized", "pca")
+
+# HI input patterns: original sensors (sX), rolling means (sX_rmY) and trends (sX_trend)
+_ORIGINAL_RE = re.compile(r'^s\d+$')
+_ROLLING_MEAN_RE = re.compile(r'_rm\d+$')
+
+def select_health_features(candidates) -> list:
     """
-    Computes a Health Index (HI) using PCA with specific feature selection and smoothing.
-    
-    Args:
-        df: Input DataFrame.
-        feature_cols: Optional list of candidate features. If None, considers all columns.
-                     Function applies internal filtering regardless.
-        n_components: Number of PCA components (default 1).
-        
-    Returns:
-        tuple: (df, pca_object)
-            df: DataFrame with 'health_index_raw' and 'health_index' columns.
-            pca_object: Fitted PCA object.
+    Picks the HI inputs out of a list of column names.
+
+    Candidates: original sensors (sX), rolling means (sX_rmY), trends (sX_trend).
+    Excluded: delta, drift, op conditions and the id/target/HI columns.
+    The selection is computed once per distinct candidate list.
     """
-    df_hi = df.copy()
-    
-    # Feature Selection Logic
-    # Candidates: original sensors (sX), rolling means (sX_rmY), trends (sX_trend)
-    # Exclude: delta, drift, op conditions
-    
-    # Identify all columns if feature_cols not provided
-    candidates = feature_cols if feature_cols is not None else df_hi.columns
-    
+    return list(_select_health_features(tuple(candidates)))
+
+@functools.lru_cache(maxsize=64)
+def _select_health_features(candidates: tuple) -> tuple:
     selected_features = []
     
     for col in candidates:
@@ -40,47 +37,351 @@ def add_health_index(df: pd.DataFrame, feature_cols: list = None, n_components:
             
         # Include patterns
         # 1. Original sensors: "s" followed by digits only
-        is_original = bool(re.match(r'^s\d+$', col))
+        is_original = bool(_ORIGINAL_RE.match(col))
         # 2. Rolling mean: ends with _rm followed by digits
-        is_rolling_mean = bool(re.search(r'_rm\d+$', col))
+        is_rolling_mean = bool(_ROLLING_MEAN_RE.search(col))
         # 3. Trend: ends with _trend
         is_trend = col.endswith('_trend')
         
         if is_original or is_rolling_mean or is_trend:
             selected_features.append(col)
-            
-    print(f"Selected {len(selected_features)} features for PCA out of {len(candidates)} candidates.")
-    # print(f"Features: {selected_features}")
 
-    if not selected_features:
-        raise ValueError("No features selected for PCA. Check column names.")
+    return tuple(selected_features)
 
-    # Fit PCA
-    pca = PCA(n_components=n_components)
-    # Fit on the selected features
-    df_hi['health_index_raw'] = pca.fit_transform(df_hi[selected_features])
-    
-    # Smoothing
-    # For each engine, smooth health_index_raw using rolling mean (window=5)
-    # We use transform to keep the index aligned
-    df_hi['health_index_raw'] = df_hi.groupby('engine_id')['health_index_raw'].transform(
-        lambda x: x.rolling(window=5, min_periods=1).mean()
-    )
-    
-    # Normalize between 0 and 1 (Global min-max)
-    scaler = MinMaxScaler()
-    df_hi['health_index'] = scaler.fit_transform(df_hi[['health_index_raw']])
-    
-    # Determine direction
-    # We want Healthy (early cycles) ~ 1 and Failing (late cycles) ~ 0
-    # Check correlation with cycle
-    correlation = df_hi['health_index'].corr(df_hi['cycle'])
+class StreamingCovariance:
+    """Streaming, mergeable mean/covariance of a fixed set of columns (shifted sums, float64)."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.n = 0
+        self.shift = None
+        self.s = np.zeros(len(self.columns))
+        self.ss = np.zeros((len(self.columns), len(self.columns)))
+
+    def update(self, data) -> "StreamingCovariance":
+        """Folds one chunk in (a DataFrame holding the columns, or a 2D array in column order)."""
+        if isinstance(data, pd.DataFrame):
+            x = data[self.columns].to_numpy(dtype=np.float64)
+        else:
+            x = np.asarray(data, dtype=np.float64).reshape(-1, len(self.columns))
+        if len(x) == 0:
+            return self
+        if self.shift is None:
+            # Shift by the first chunk's mean to keep the raw sums well conditioned
+            self.shift = x.mean(axis=0)
+        x = x - self.shift
+        self.n += len(x)
+        self.s += x.sum(axis=0)
+        self.ss += x.T @ x
+        return self
+
+    def mean(self):
+        return self.shift + self.s / self.n
+
+    def cov(self):
+        return self.scatter() / (self.n - 1)
+
+    def scatter(self):
+        # Sum of outer products of the deviations from the mean
+        m = self.s / self.n
+        return self.ss - self.n * np.outer(m, m)
+
+    def merge(self, other: "StreamingCovariance") -> "StreamingCovariance":
+        """Adds the statistics of another accumulator over the same columns (e.g. from a worker)."""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.shift, self.s, self.ss = other.n, other.shift, other.s.copy(), other.ss.copy()
+            return self
+        n = self.n + other.n
+        mean_a, mean_b = self.mean(), other.mean()
+        delta = mean_b - mean_a
+        scatter = self.scatter() + other.scatter() + np.outer(delta, delta) * self.n * other.n / n
+        # Re-anchor the shift at the merged mean: the shifted sum is then 0 and the
+        # shifted co-moment is the merged scatter
+        self.n, self.shift = n, mean_a + delta * other.n / n
+        self.s = np.zeros_like(self.s)
+        self.ss = scatter
+        return self
+
+def first_component(cov) -> np.ndarray:
+    """Leading eigenvector of a covariance matrix, signed like sklearn's PCA (largest |loading| positive)."""
+    _, vecs = np.linalg.eigh(cov)
+    comp = vecs[:, -1]
+    if comp[np.argmax(np.abs(comp))] < 0:
+        comp = -comp
+    return comp
+
+def pca_from_component(feature_cols: list, mean, component) -> PCA:
+    """
+    Builds a fitted one-component PCA from a precomputed mean and loading vector.
+
+    Lets pipelines that fit the HI projection from a (merged) covariance instead of
+    `PCA.fit` hand back the same object `add_health_index` returns.
+
+    Args:
+        feature_cols: HI input columns, in the order of `mean`/`component`.
+        mean: Per-column mean of the HI inputs.
+        component: Leading principal axis (unit length).
+
+    Returns:
+        PCA: `transform` projects onto `component` like a PCA fitted on the data.
+    """
+    pca = PCA(n_components=1)
+    pca.mean_ = np.asarray(mean, dtype=np.float64)
+    pca.components_ = np.asarray(component, dtype=np.float64).reshape(1, -1)
+    pca.n_components_ = 1
+    pca.n_features_in_ = len(feature_cols)
+    pca.feature_names_in_ = np.asarray(feature_cols, dtype=object)
+    return pca
+
+def trailing_segment_mean(values: np.ndarray, engine_ids: np.ndarray, window: int) -> np.ndarray:
+    """
+    Per-engine trailing mean over the last `window` rows (min_periods=1), in float64.
+
+    One prefix-sum pass over all engines: row i averages rows max(i - window + 1,
+    engine start)..i. Rows may come in any order as long as each engine's rows are in
+    cycle order; NaNs are skipped like pandas rolling.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    ids = np.asarray(engine_ids)
+    n = len(x)
+    if n == 0:
+        return x.copy()
+
+    order = None
+    if not np.all(ids[1:] >= ids[:-1]):
+        # Engines are not contiguous: work on a stable grouping and scatter back
+        order = np.argsort(ids, kind='stable')
+        x, ids = x[order], ids[order]
+
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    pos = np.arange(n) - np.repeat(starts, lengths)
+    lo = np.arange(n) + 1 - np.minimum(pos + 1, window)
+
+    missing = np.isnan(x)
+    if missing.any():
+        # Window sums and counts of the non-NaN values
+        valid = np.r_[0, np.cumsum(~missing)]
+        c = np.r_[0.0, np.cumsum(np.where(missing, 0.0, x))]
+        count = (valid[1:] - valid[lo]).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = np.where(count > 0, (c[1:] - c[lo]) / count, np.nan)
+    else:
+        # Shifted by each engine's first value so the running sums stay small
+        shift = np.repeat(x[starts], lengths)
+        c = np.r_[0.0, np.cumsum(x - shift)]
+        out = (c[1:] - c[lo]) / (np.arange(n) + 1 - lo) + shift
+
+    if order is not None:
+        result = np.empty_like(out)
+        result[order] = out
+        return result
+    return out
+
+def smooth_health_index(df: pd.DataFrame, col: str = 'health_index_raw', window: int = 5) -> pd.Series:
+    """
+    For each engine, smooths `col` using a trailing rolling mean (min_periods=1).
+
+    Computed with `trailing_segment_mean` (one pass over all engines); the result
+    keeps the frame's index.
+    """
+    out = trailing_segment_mean(df[col].to_numpy(), df['engine_id'].to_numpy(), window)
+    return pd.Series(out, index=df.index, name=col)
+
+class HealthIndexModel:
+    """
+    Fitted Health Index: selected inputs, first principal axis, min-max range and orientation.
+
+    `fit` selects the HI inputs once and fits the projection with one of
+    HI_FIT_METHODS:
+      covariance   one batched pass accumulating the covariance, then its leading
+                   eigenvector (exact; the default)
+      incremental  sklearn IncrementalPCA, partial_fit over row batches
+      randomized   sklearn PCA with the randomized SVD solver (needs the full matrix)
+      pca          sklearn PCA with the full SVD (needs the full matrix)
+    The raw HI is then smoothed per engine, min-max scaled over the training data
+    and flipped if it rises with cycle (1 = healthy, 0 = failure).
+
+    Everything `transform` needs is kept (features, mean, component, hi_min,
+    hi_max, flip, window), so applying the HI to new data is a mat-vec, a
+    segmented rolling mean and an affine map, with nothing refitted.
+    """
+
+    def __init__(self, method: str = HI_FIT_METHOD, window: int = 5, batch_size: int = HI_BATCH_ROWS,
+                 random_state: int = 0):
+        if method not in HI_FIT_METHODS:
+            raise ValueError(f"method must be one of {HI_FIT_METHODS}, got {method!r}")
+        self.method = method
+        self.window = window
+        self.batch_size = batch_size
+        self.random_state = random_state
+
+        # Fitted state
+        self.features = None
+        self.mean_ = None
+        self.component_ = None
+        self.hi_min = None
+        self.hi_max = None
+        self.flip = False
+        self.pca_ = None
+
+    @classmethod
+    def from_params(cls, features: list, mean, component, hi_min: float, hi_max: float, flip: bool,
+                    window: int = 5) -> "HealthIndexModel":
+        """Model from an already fitted projection (e.g. merged out-of-core or parallel fits)."""
+        model = cls(window=window)
+        model.features = list(features)
+        model.mean_ = np.asarray(mean, dtype=np.float64)
+        model.component_ = np.asarray(component, dtype=np.float64)
+        model.hi_min, model.hi_max, model.flip = float(hi_min), float(hi_max), bool(flip)
+        return model
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.component_ is not None
+
+    def _batches(self, df):
+        # (lo, hi, x) row batches of the HI inputs as one reused float64 buffer, filled
+        # column by column (selecting the columns as a frame would copy them all first)
+        columns = [df[c].to_numpy() for c in self.features]
+        step = max(int(self.batch_size), 1)
+        buf = np.empty((min(step, len(df)), len(columns)), order='F')
+        for lo in range(0, len(df), step):
+            hi = min(lo + step, len(df))
+            x = buf[:hi - lo]
+            for j, col in enumerate(columns):
+                x[:, j] = col[lo:hi]
+            yield lo, hi, x
+
+    def _fit_projection(self, df):
+        if self.method == "covariance":
+            covariance = StreamingCovariance(self.features)
+            for _, _, x in self._batches(df):
+                covariance.update(x)
+            self.mean_ = covariance.mean()
+            self.component_ = first_component(covariance.cov())
+            return
+        if self.method == "incremental":
+            pca = IncrementalPCA(n_components=1)
+            tail = None
+            for lo, hi, x in self._batches(df):
+                # IncrementalPCA needs at least 2 rows per batch; a 1-row tail joins the next fit
+                if hi - lo < 2:
+                    tail = x.copy()
+                    continue
+                pca.partial_fit(x)
+            if tail is not None and not hasattr(pca, 'components_'):
+                pca.partial_fit(np.vstack([tail, tail]))
+        else:
+            # Same solver choice as PCA() for "pca" (the previous behaviour)
+            solver = "randomized" if self.method == "randomized" else "auto"
+            pca = PCA(n_components=1, svd_solver=solver, random_state=self.random_state)
+            pca.fit(df[self.features].to_numpy(dtype=np.float64))
+        self.mean_ = pca.mean_.astype(np.float64)
+        self.component_ = pca.components_[0].astype(np.float64)
+        if self.method == "pca":
+            # Keep the sklearn object itself (explained variance etc.)
+            pca.feature_names_in_ = np.asarray(self.features, dtype=object)
+            self.pca_ = pca
+
+    def project(self, df: pd.DataFrame) -> np.ndarray:
+        """Unsmoothed HI: (x - mean) . component, in float64, computed in row batches."""
+        out = np.empty(len(df))
+        offset = self.mean_ @ self.component_
+        for lo, hi, x in self._batches(df):
+            out[lo:hi] = x @ self.component_ - offset
+        return out
+
+    def _smoothed(self, df):
+        dtype = float_dtype_of(df, self.features)
+        raw = trailing_segment_mean(self.project(df), df['engine_id'].to_numpy(), self.window)
+        return raw.astype(dtype), dtype
+
+    def _scaled(self, raw, dtype):
+        span = self.hi_max - self.hi_min
+        hi = (raw.astype(np.float64) - self.hi_min) / (span if span > 0 else 1.0)
+        return (1 - hi if self.flip else hi).astype(dtype)
+
+    def fit(self, df: pd.DataFrame, feature_cols: list = None) -> "HealthIndexModel":
+        """Fits the projection, range and orientation on a feature frame (sorted per engine)."""
+        self.fit_transform(df, feature_cols)
+        return self
+
+    def fit_transform(self, df: pd.DataFrame, feature_cols: list = None, inplace: bool = False) -> pd.DataFrame:
+        """
+        Fits on `df` and adds health_index_raw / health_index (one projection pass).
+
+        Args:
+            df: Feature frame with engine_id and cycle.
+            feature_cols: Optional candidate columns (default: all columns); the HI
+                          inputs are selected from them.
+            inplace: If True, the HI columns are added to `df` itself.
+        """
+        candidates = list(feature_cols if feature_cols is not None else df.columns)
+        self.features = select_health_features(candidates)
+        print(f"Selected {len(self.features)} features for PCA out of {len(candidates)} candidates "
+              f"({self.method} fit).")
+        if not self.features:
+            raise ValueError("No features selected for PCA. Check column names.")
+
+        self._fit_projection(df)
+        raw, dtype = self._smoothed(df)
+
+        # Global min-max of the smoothed HI; we want Healthy (early cycles) ~ 1 and
+        # Failing (late cycles) ~ 0, so flip it when it rises with cycle
+        raw64 = raw.astype(np.float64)
+        self.hi_min = float(raw64.min())
+        self.hi_max = float(raw64.max())
+        cycle = df['cycle'].to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.flip = bool(np.corrcoef(raw64, cycle)[0, 1] > 0) if len(raw64) > 1 else False
+
+        df_hi = df if inplace else df.copy()
+        df_hi['health_index_raw'] = raw
+        df_hi['health_index'] = self._scaled(raw, dtype)
+        return df_hi
+
+    def transform(self, df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        """Adds health_index_raw / health_index with the fitted parameters (nothing is refit)."""
+        if not self.is_fitted:
+            raise RuntimeError("HealthIndexModel is not fitted")
+        raw, dtype = self._smoothed(df)
+        df_hi = df if inplace else df.copy()
+        df_hi['health_index_raw'] = raw
+        df_hi['health_index'] = self._scaled(raw, dtype)
+        return df_hi
+
+    def to_pca(self) -> PCA:
+        """The projection as a fitted sklearn PCA (the fitted object itself for method 'pca')."""
+        if self.pca_ is not None:
+            return self.pca_
+        return pca_from_component(self.features, self.mean_, self.component_)
+
+def add_health_index(df: pd.DataFrame, feature_cols: list = None, n_components: int = 1,
+                     inplace: bool = False, method: str = HI_FIT_METHOD) -> tuple:
+    """
+    Computes a Health Index (HI) using PCA with specific feature selection and smoothing.
     
-    # If correlation is positive, HI increases with cycle (0 -> 1). We want 1 -> 0.
-    if correlation > 0:
-        df_hi['health_index'] = 1 - df_hi['health_index']
+    Args:
+        df: Input DataFrame.
+        feature_cols: Optional list of candidate features. If None, considers all columns.
+                     Function applies internal filtering regardless.
+        n_components: Number of PCA components (only the first one forms the HI).
+        inplace: If True, the HI columns are added to `df` itself (no frame copy).
+        method: How the projection is fitted (see HealthIndexModel / HI_FIT_METHODS).
         
-    return df_hi, pca
+    Returns:
+        tuple: (df, pca_object)
+            df: DataFrame with 'health_index_raw' and 'health_index' columns.
+            pca_object: Fitted PCA object (use HealthIndexModel to keep range and orientation too).
+    """
+    if n_components != 1:
+        raise ValueError("The health index uses exactly one principal component")
+    model = HealthIndexModel(method=method)
+    df_hi = model.fit_transform(df, feature_cols, inplace=inplace)
+    return df_hi, model.to_pca()
 
 if __name__ == "__main__":
     from pipeline.data_loader import load_and_label
@@ -0,0 +1,139 @@
+import os
+import io
+import time
+import numpy as np
+import pandas as pd
+from pipeline.data_loader import read_cmapss, RUL_CAP
+
+class LogFollower:
+    """
+    Tail-follows a growing CMAPSS-format log and parses only the appended rows.
+
+    Every `poll()` reads the bytes written since the previous call, keeps an
+    incomplete trailing line for the next call, and returns just the new complete
+    rows. Per-engine max_cycle bookkeeping is updated from those rows only, so the
+    cost of a poll is proportional to what was appended, not to the file size.
+
+    RUL follows the same definition as `load_and_label` (max cycle seen for the
+    engine minus the current cycle, capped): the rows of a poll are labeled with
+    the bookkeeping as of that poll. Because a running engine's max cycle keeps
+    growing, earlier rows can be relabeled with `current_rul`.
+
+    If the file shrinks or is replaced (log rotation), the follower starts over
+    from the beginning of the new file and resets its bookkeeping.
+    """
+
+    def __init__(self, filepath, usecols: list = None, rul_cap: int = RUL_CAP):
+        self.filepath = filepath
+        self.usecols = usecols
+        self.rul_cap = rul_cap
+        self.offset = 0
+        self.n_rows = 0
+        self.max_cycle = {}
+        self._partial = b''
+        self._inode = None
+
+    def reset(self):
+        """Forgets the read position and all per-engine bookkeeping."""
+        self.offset = 0
+        self.n_rows = 0
+        self.max_cycle = {}
+        self._partial = b''
+
+    def poll(self) -> pd.DataFrame:
+        """
+        Reads and labels the rows appended since the last poll.
+
+        Returns:
+            pd.DataFrame: New rows in file order, with an 'RUL' column
+                          (empty frame if nothing new was appended).
+        """
+        st = os.stat(self.filepath)
+        if self._inode is not None and (st.st_ino != self._inode or st.st_size < self.offset):
+            print(f"{self.filepath} was truncated or replaced; re-reading from the start.")
+            self.reset()
+        self._inode = st.st_ino
+
+        if st.st_size == self.offset:
+            return self._empty()
+
+        with open(self.filepath, 'rb') as f:
+            f.seek(self.offset)
+            buf = f.read(st.st_size - self.offset)
+        self.offset += len(buf)
+
+        # Only parse complete lines; keep the tail for the next poll
+        buf = self._partial + buf
+        cut = buf.rfind(b'\n') + 1
+        complete, self._partial = buf[:cut], buf[cut:]
+        if not complete.strip():
+            return self._empty()
+
+        df = read_cmapss(io.BytesIO(complete), usecols=self.usecols)
+        self._update_bookkeeping(df)
+        df['RUL'] = self.current_rul(df['engine_id'].to_numpy(), df['cycle'].to_numpy())
+        self.n_rows += len(df)
+        return df
+
+    def follow(self, interval: float = 2.0, timeout: float = None):
+        """
+        Polls forever (or until `timeout` seconds pass) and yields each non-empty batch.
+
+        Args:
+            interval: Seconds to sleep between polls that found nothing new.
+            timeout: Optional overall time limit.
+
+        Yields:
+            pd.DataFrame: Newly appended, labeled rows.
+        """
+        start = time.monotonic()
+        while timeout is None or time.monotonic() - start < timeout:
+            df = self.poll()
+            if len(df):
+                yield df
+            else:
+                time.sleep(interval)
+
+    def current_rul(self, engine_ids, cycles) -> np.ndarray:
+        """RUL of (engine, cycle) pairs under the current max_cycle bookkeeping."""
+        engine_ids = np.asarray(engine_ids)
+        cycles = np.asarray(cycles)
+        uniq, inverse = np.unique(engine_ids, return_inverse=True)
+        max_cycle = np.array([self.max_cycle[e] for e in uniq.tolist()], dtype=cycles.dtype)
+        return np.minimum(max_cycle[inverse] - cycles, self.rul_cap)
+
+    def _update_bookkeeping(self, df):
+        batch_max = df.groupby('engine_id', sort=False)['cycle'].max()
+        for engine, cycle in zip(batch_max.index.tolist(), batch_max.tolist()):
+            if cycle > self.max_cycle.get(engine, -1):
+                self.max_cycle[engine] = cycle
+
+    def _empty(self):
+        return read_cmapss(io.BytesIO(b''), usecols=self.usecols).assign(RUL=np.array([], dtype=np.int32))
+
+if __name__ == "__main__":
+    import tempfile
+    from pipeline.config import DATA_PATH, TRAIN_FILE
+
+    # Simulate a live log by appending the training file in uneven pieces
+    src = os.path.join(DATA_PATH, TRAIN_FILE)
+    with open(src, 'rb') as f:
+        raw = f.read()
+
+    with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as tmp:
+        live_path = tmp.name
+
+    try:
+        follower = LogFollower(live_path)
+        pieces = np.linspace(0, len(raw), 8).astype(int)
+        for start, end in zip(pieces[:-1], pieces[1:]):
+            with open(live_path, 'ab') as f:
+                f.write(raw[start:end])  # may end mid-line
+            t0 = time.perf_counter()
+            new_rows = follower.poll()
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"Appended {end - start:>8} bytes -> {len(new_rows):>5} new rows "
+                  f"({follower.n_rows} total, {len(follower.max_cycle)} engines) in {ms:.1f} ms")
+        print(f"Longest engine so far: {max(follower.max_cycle.values())} cycles")
+    finally:
+        os.remove(live_path)
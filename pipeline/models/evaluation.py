@@ -10,8 +10,8 @@ import numpy as np
 from pipeline.models.xgb_baseline import XGBoostBaseline
 from pipeline.utils import compute_metrics, plot_actual_vs_pred, plot_residuals
 from pipeline.models.transformer_model import RULTransformer
-from pipeline.dataset_builder import build_sequence_dataset
-from pipeline.models.train_transformer import DEVICE
+from pipeline.models.window_dataset import WindowDataset, make_loader
+from pipeline.models.train_transformer import DEVICE, load_sequence_store
 
 OUTPUT_DIR = "output"
 
@@ -60,9 +60,14 @@ def evaluate_track_a(model_path, X, y):
         print(f"CRITICAL ERROR: {e}")
 
 
-def evaluate_track_b(model_path, df, features):
+def evaluate_track_b(model_path, df=None, features=None, store=None):
     """
     Evaluates the Transformer model.
+
+    Args:
+        model_path: Path to the saved state dict (.pt)
+        df, features: Processed frame and its model input columns, or
+        store: SequenceStore whose mapped rows are windowed instead (no rebuild).
     """
     print(f"\n--- Evaluating Transformer from {model_path} ---")
     
@@ -74,9 +79,13 @@ def evaluate_track_b(model_path, df, features):
     # Ensure window matches training (50)
     window = 50
     print(f"Building sequences (Window={window})...")
-    X_seq, y_seq = build_sequence_dataset(df, features, window=window)
+    if store is not None:
+        dataset = store.dataset(window=window)
+        features = store.features
+    else:
+        dataset = WindowDataset.from_frame(df, features, window=window)
     
-    if len(X_seq) == 0:
+    if len(dataset) == 0:
         print("Error: No sequences built.")
         return
         
@@ -90,11 +99,7 @@ def evaluate_track_b(model_path, df, features):
     
     # 3. Predict
     print("Predicting...")
-    dataset = torch.utils.data.TensorDataset(
-        torch.tensor(X_seq, dtype=torch.float32),
-        torch.tensor(y_seq, dtype=torch.float32)
-    )
-    dataloader = torch.utils.data.DataLoader(dataset, batch_size=64, shuffle=False)
+    dataloader = make_loader(dataset, batch_size=64, shuffle=False, device=DEVICE)
     
     preds = []
     targets = []
@@ -142,8 +147,5 @@ if __name__ == "__main__":
     
     trans_path = "pipeline/models/checkpoints/transformer.pt"
     
-    # Re-derive features to match training (includes health_index)
-    exclude_cols = ['engine_id', 'cycle', 'RUL']
-    features_all = [c for c in df.columns if c not in exclude_cols]
-    
-    evaluate_track_b(trans_path, df, features_all)
+    # Windows over the shared sequence store (same features as training, includes health_index)
+    evaluate_track_b(trans_path, store=load_sequence_store())
@@ -0,0 +1,44 @@
+import os
+import json
+from pipeline.feature_engineering import FEATURE_VERSION
+
+# Features of checkpoints saved before their metadata was recorded
+LEGACY_FEATURES = {'feature_version': 1}
+
+def meta_path(checkpoint_path: str) -> str:
+    """Metadata file stored next to a model checkpoint."""
+    return f"{checkpoint_path}.meta.json"
+
+def current_features() -> dict:
+    """Version of the features the pipeline computes now."""
+    return {'feature_version': FEATURE_VERSION}
+
+def save_checkpoint_meta(checkpoint_path: str):
+    """Records the features a checkpoint was trained on (call after saving it)."""
+    with open(meta_path(checkpoint_path), 'w') as f:
+        json.dump(current_features(), f, indent=2)
+
+def load_checkpoint_meta(checkpoint_path: str) -> dict:
+    """Features a checkpoint was trained on (LEGACY_FEATURES if it has no metadata)."""
+    try:
+        with open(meta_path(checkpoint_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict(LEGACY_FEATURES)
+
+def feature_mismatch(checkpoint_path: str) -> str:
+    """
+    Describes how the features a checkpoint was trained on differ from the current ones.
+
+    Returns:
+        str: A warning message, or None if they match (or there is no checkpoint).
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+    trained, current = load_checkpoint_meta(checkpoint_path), current_features()
+    diffs = [f"{key} {trained.get(key)} (now {value})" for key, value in current.items()
+             if trained.get(key) != value]
+    if not diffs:
+        return None
+    return (f"{checkpoint_path} was trained on different features: {', '.join(diffs)}. "
+            f"Its predictions are unreliable until it is retrained.")
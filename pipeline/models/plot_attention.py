@@ -42,7 +42,7 @@ def plot_attention():
     # Take the last sequence (closest to failure)
     sample_idx = len(X_seq) - 1
     # Add batch dimension: (1, SeqLen, Feat)
-    X_sample = torch.tensor(X_seq[sample_idx:sample_idx+1], dtype=torch.float32).to(DEVICE)
+    X_sample = torch.as_tensor(X_seq[sample_idx:sample_idx+1], dtype=torch.float32).to(DEVICE)
     y_sample = y_seq[sample_idx]
     
     print(f"Selected sample {sample_idx}. Shape: {X_sample.shape}. True RUL: {y_sample}")
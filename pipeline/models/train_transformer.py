@@ -1,19 +1,21 @@
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import TensorDataset, DataLoader
 import numpy as np
 import os
 import copy
 import sys
 from pipeline.models.transformer_model import RULTransformer
-from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.config import SEQUENCE_DTYPE
 # Import pipeline components to build dataset on the fly if needed
 # But better to reuse specific functions or the run_pipeline variables if pass-able.
 # Here we will re-run the dataset builder logic to be standalone.
-from pipeline.models.xgb_baseline import load_full_data
+from pipeline.models.xgb_baseline import load_full_data, full_data_fingerprint
 from pipeline.dataset_builder import build_sequence_dataset
+from pipeline.models.window_dataset import make_loader, WindowSubsampler
+from pipeline.sequence_store import SequenceStore, get_or_build
 from pipeline.utils import compute_metrics
+from pipeline.models.model_meta import save_checkpoint_meta, feature_mismatch
 import plotext as plt
 
 import time
@@ -21,6 +23,20 @@ import time
 DEBUG_FAST = False
 
 BATCH_SIZE = 32
+WINDOW = 50
+# Shortest training sample: prefixes of 10..WINDOW cycles (padded and masked) are trained
+# too, so early-life engines can be scored; validation keeps the full windows
+MIN_LENGTH = 10
+# Windows drawn per epoch: every WINDOW_STRIDE-th window of every engine, at a new random
+# offset each epoch (consecutive windows are near-duplicates), with windows at or below
+# LOW_RUL drawn LOW_RUL_WEIGHT times as often. Off by default: on FD001 a stride of 4
+# cuts the epoch time ~4x but reached a worse validation RMSE for the same training
+# time (benchmarks/bench_subsampling.py)
+WINDOW_STRIDE = 1
+LOW_RUL = 30
+LOW_RUL_WEIGHT = 1.0
+# Worker processes gathering batches (none on a single core, where they only add overhead)
+NUM_WORKERS = min(4, (os.cpu_count() or 1) - 1)
 EPOCHS = 50 
 LR = 1e-3
 PATIENCE = 20 # Increased to force longer training
@@ -29,11 +45,29 @@ DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print(f"Imports done. Device: {DEVICE}")
 sys.stdout.flush()
 
-def load_seq_data():
+def _split_engines(engine_ids):
     """
-    Loads data and splits it by ENGINE ID to prevent leakage.
+    Splits engine ids 80/20 into train and validation engines (fixed seed).
     Returns:
-        X_train_seq, y_train_seq, X_val_seq, y_val_seq, input_dim
+        train_engines, val_engines
+    """
+    # --- SPLIT BY ENGINE ID ---
+    engine_ids = np.array(engine_ids)
+    np.random.seed(42) # Fixed seed for reproducibility
+    np.random.shuffle(engine_ids)
+    
+    split_idx = int(len(engine_ids) * 0.8)
+    train_engines = engine_ids[:split_idx]
+    val_engines = engine_ids[split_idx:]
+    
+    print(f"Total Engines: {len(engine_ids)}. Train: {len(train_engines)}, Val: {len(val_engines)}")
+    return train_engines, val_engines
+
+def _split_frames():
+    """
+    Loads the processed data and splits it by ENGINE ID to prevent leakage.
+    Returns:
+        df_train, df_val, feature_cols
     """
     print("Loading full data...")
     sys.stdout.flush()
@@ -45,20 +79,20 @@ def load_seq_data():
     # Ensure features match
     feature_cols = [c for c in df.columns if c not in exclude_cols]
     
-    # --- SPLIT BY ENGINE ID ---
-    engine_ids = df['engine_id'].unique()
-    np.random.seed(42) # Fixed seed for reproducibility
-    np.random.shuffle(engine_ids)
-    
-    split_idx = int(len(engine_ids) * 0.8)
-    train_engines = engine_ids[:split_idx]
-    val_engines = engine_ids[split_idx:]
-    
-    print(f"Total Engines: {len(engine_ids)}. Train: {len(train_engines)}, Val: {len(val_engines)}")
+    train_engines, val_engines = _split_engines(df['engine_id'].unique())
     
     # Filter DataFrames
-    df_train = df[df['engine_id'].isin(train_engines)].copy()
-    df_val = df[df['engine_id'].isin(val_engines)].copy()
+    df_train = df[df['engine_id'].isin(train_engines)]
+    df_val = df[df['engine_id'].isin(val_engines)]
+    return df_train, df_val, feature_cols
+
+def load_seq_data():
+    """
+    Loads data and splits it by ENGINE ID to prevent leakage.
+    Returns:
+        X_train_seq, y_train_seq, X_val_seq, y_val_seq, input_dim
+    """
+    df_train, df_val, feature_cols = _split_frames()
     
     print(f"Building Sequence Datasets with {len(feature_cols)} features...")
     if DEBUG_FAST:
@@ -70,13 +104,13 @@ def load_seq_data():
     
     # Build Train Sequences
     print("Building Train Sequences...")
-    X_train, y_train = build_sequence_dataset(df_train, feature_cols, window=50, max_samples=max_samp)
+    X_train, y_train = build_sequence_dataset(df_train, feature_cols, window=WINDOW, max_samples=max_samp)
     
     # Build Val Sequences
     # Note: validation shouldn't strictly be limited by max_samp same as train if we want full validation, 
     # but for debug speed we limit it too.
     print("Building Val Sequences...")
-    X_val, y_val = build_sequence_dataset(df_val, feature_cols, window=50, max_samples=max_samp)
+    X_val, y_val = build_sequence_dataset(df_val, feature_cols, window=WINDOW, max_samples=max_samp)
     
     print(f"Sequences built.")
     print(f"Train: {X_train.shape}, Val: {X_val.shape}")
@@ -84,6 +118,98 @@ def load_seq_data():
         
     return X_train, y_train, X_val, y_val, len(feature_cols)
 
+def load_sequence_store(window: int = WINDOW, dtype: str = SEQUENCE_DTYPE) -> SequenceStore:
+    """
+    Opens the memory-mapped sequence store of the training data, building it if needed.
+
+    The store is keyed by the fingerprint of the `load_full_data` frame (input
+    files' content, pipeline code, stage parameters), so it is rebuilt only when
+    any of them changes; otherwise not even the frame is loaded. Its rows are every
+    column but engine_id, cycle and RUL (the Transformer's inputs).
+    """
+    def load_frame():
+        print("Loading full data...")
+        sys.stdout.flush()
+        df, _ = load_full_data()
+        exclude_cols = ['engine_id', 'cycle', 'RUL']
+        return df, [c for c in df.columns if c not in exclude_cols]
+
+    return get_or_build(full_data_fingerprint(), load_frame, window=window, dtype=dtype)
+
+def load_window_datasets(window: int = WINDOW, min_length: int = None):
+    """
+    Like load_seq_data, but as lazy WindowDatasets over the sequence store: the
+    engine rows are memory-mapped once (shared with other processes and the
+    DataLoader workers) and windows are sliced per batch.
+    With `min_length` the train split also holds the shorter prefixes (padded
+    batches with a padding mask); the validation split keeps full windows.
+    Returns:
+        train_ds, val_ds, input_dim
+    """
+    store = load_sequence_store(window)
+    train_engines, val_engines = _split_engines(store.engine_ids)
+    max_samp = 2000 if DEBUG_FAST else None
+    
+    train_ds = store.dataset(train_engines, window=window, max_samples=max_samp, min_length=min_length)
+    val_ds = store.dataset(val_engines, window=window, max_samples=max_samp)
+    
+    print(f"Window datasets built (window={window}, {len(store.features)} features).")
+    print(f"Train: {len(train_ds)} samples, Val: {len(val_ds)} windows over {len(store.rows)} stored rows")
+    sys.stdout.flush()
+    
+    return train_ds, val_ds, len(store.features)
+
+def train_sampler(train_ds, stride: int = WINDOW_STRIDE, low_rul_weight: float = LOW_RUL_WEIGHT, seed=None):
+    """The per-epoch window sampler of the training set (None: every window each epoch)."""
+    if stride <= 1 and low_rul_weight == 1:
+        return None
+    return WindowSubsampler(train_ds, stride=stride, low_rul=LOW_RUL, low_rul_weight=low_rul_weight, seed=seed)
+
+def train_epoch(model, train_dl, optimizer, criterion):
+    """
+    One pass over the training loader.
+    Returns:
+        mean training loss per sample
+    """
+    model.train()
+    total_loss = 0
+    n_samples = 0
+    
+    for batch_idx, batch in enumerate(train_dl):
+        # (X, y) or, for length-bucketed prefixes, (X, y, padding_mask)
+        X_batch, y_batch = batch[0].to(DEVICE), batch[1].to(DEVICE)
+        mask = batch[2].to(DEVICE) if len(batch) > 2 else None
+        
+        optimizer.zero_grad()
+        outputs = model(X_batch, src_key_padding_mask=mask)
+        loss = criterion(outputs, y_batch)
+        loss.backward()
+        optimizer.step()
+        
+        total_loss += loss.item() * X_batch.size(0)
+        n_samples += X_batch.size(0)
+        
+    return total_loss / max(n_samples, 1)
+
+def validate(model, val_dl):
+    """
+    Predicts every validation window.
+    Returns:
+        rmse, mae
+    """
+    model.eval()
+    val_preds = []
+    val_targets = []
+    with torch.no_grad():
+        for batch in val_dl:
+            X_batch = batch[0].to(DEVICE)
+            mask = batch[2].to(DEVICE) if len(batch) > 2 else None
+            outputs = model(X_batch, src_key_padding_mask=mask)
+            val_preds.extend(outputs.cpu().numpy())
+            val_targets.extend(batch[1].numpy())
+            
+    return compute_metrics(np.array(val_targets), np.array(val_preds))
+
 def train_transformer():
     print("Using device:", DEVICE)
     print(f"--- Starting Track B: Transformer Training on {DEVICE} ---")
@@ -91,21 +217,27 @@ def train_transformer():
         print("!!! DEBUG FAST MODE ENABLED !!!")
     
     # 1. Data
-    X_train_np, y_train_np, X_val_np, y_val_np, input_dim = load_seq_data()
-    
-    # Tensor
-    train_ds = TensorDataset(torch.tensor(X_train_np, dtype=torch.float32), torch.tensor(y_train_np, dtype=torch.float32))
-    val_ds = TensorDataset(torch.tensor(X_val_np, dtype=torch.float32), torch.tensor(y_val_np, dtype=torch.float32))
+    # Windows are sliced from the engine rows per batch (memory O(rows), not O(samples x window))
+    train_ds, val_ds, input_dim = load_window_datasets(min_length=MIN_LENGTH)
     
-    train_dl = DataLoader(train_ds, batch_size=BATCH_SIZE, shuffle=True, num_workers=0, pin_memory=True)
-    val_dl = DataLoader(val_ds, batch_size=BATCH_SIZE, shuffle=False, num_workers=0, pin_memory=True)
+    # Only a strided subset of the (overlapping) windows per epoch, if configured
+    sampler = train_sampler(train_ds)
+    if sampler is not None:
+        print(f"Drawing {len(sampler)} of {len(train_ds)} training samples per epoch")
+    train_dl = make_loader(train_ds, BATCH_SIZE, shuffle=True, num_workers=NUM_WORKERS, device=DEVICE,
+                           sampler=sampler)
+    val_dl = make_loader(val_ds, BATCH_SIZE, shuffle=False, num_workers=NUM_WORKERS, device=DEVICE)
     
     # 2. Model
     model = RULTransformer(input_dim=input_dim, d_model=64, nhead=4, num_layers=2, dropout=0.1).to(DEVICE)
 
-    # Resume if checkpoint exists
+    # Resume if checkpoint exists (and was trained on the current features)
     ckpt_path = "pipeline/models/checkpoints/transformer.pt"
-    if os.path.exists(ckpt_path):
+    mismatch = feature_mismatch(ckpt_path)
+    if mismatch:
+        print(f"Not resuming: {mismatch}")
+        print("Starting from scratch...")
+    elif os.path.exists(ckpt_path):
         print(f"Resuming training from {ckpt_path}...")
         try:
             model.load_state_dict(torch.load(ckpt_path, map_location=DEVICE))
@@ -126,34 +258,10 @@ def train_transformer():
     print("\nStarting Training Loop...")
     for epoch in range(EPOCHS):
         start_time = time.time()
-        model.train()
-        total_loss = 0
-        
-        for batch_idx, (X_batch, y_batch) in enumerate(train_dl):
-            X_batch, y_batch = X_batch.to(DEVICE), y_batch.to(DEVICE)
-            
-            optimizer.zero_grad()
-            outputs = model(X_batch)
-            loss = criterion(outputs, y_batch)
-            loss.backward()
-            optimizer.step()
-            
-            total_loss += loss.item() * X_batch.size(0)
-            
-        avg_train_loss = total_loss / len(train_ds)
+        avg_train_loss = train_epoch(model, train_dl, optimizer, criterion)
         
         # Validation
-        model.eval()
-        val_preds = []
-        val_targets = []
-        with torch.no_grad():
-            for X_batch, y_batch in val_dl:
-                X_batch = X_batch.to(DEVICE)
-                outputs = model(X_batch)
-                val_preds.extend(outputs.cpu().numpy())
-                val_targets.extend(y_batch.numpy())
-                
-        rmse, mae = compute_metrics(np.array(val_targets), np.array(val_preds))
+        rmse, mae = validate(model, val_dl)
         
         epoch_time = time.time() - start_time
         
@@ -170,6 +278,7 @@ def train_transformer():
             save_path = "pipeline/models/checkpoints/transformer.pt"
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
             torch.save(best_model_wts, save_path)
+            save_checkpoint_meta(save_path)
         else:
             patience_counter += 1
             
@@ -66,25 +66,35 @@ class RULTransformer(nn.Module):
         # 3. Transformer Encoder
         # Use our custom layer
         encoder_layer = CustomTransformerEncoderLayer(d_model=d_model, nhead=nhead, dropout=dropout, batch_first=True)
-        self.transformer_encoder = nn.TransformerEncoder(encoder_layer, num_layers=num_layers)
+        # No nested-tensor fast path: the custom layer needs the padded tensor (and its
+        # attention weights) even when a padding mask is given
+        self.transformer_encoder = nn.TransformerEncoder(encoder_layer, num_layers=num_layers,
+                                                         enable_nested_tensor=False)
         
         # 4. Output Head
         self.decoder = nn.Linear(d_model, output_dim)
         
         self.d_model = d_model
 
-    def forward(self, src, return_attention=False):
+    def forward(self, src, return_attention=False, src_key_padding_mask=None):
         # src shape: [Batch, SeqLen, Features]
+        # src_key_padding_mask: optional [Batch, SeqLen] bool, True at padded steps;
+        # sequences are padded at the end (see WindowDataset with min_length)
         
         # Embed and Add Position
         x = self.embedding(src) * math.sqrt(self.d_model)
         x = self.pos_encoder(x)
         
-        # Transformer Pass
-        output = self.transformer_encoder(x)
+        # Transformer Pass (padded steps are never attended to)
+        output = self.transformer_encoder(x, src_key_padding_mask=src_key_padding_mask)
         
         # Global Average Pooling or Take Last Token?
-        x_last = output[:, -1, :] 
+        # Last token, i.e. the last valid step of every sequence when padded
+        if src_key_padding_mask is None:
+            x_last = output[:, -1, :]
+        else:
+            last = (~src_key_padding_mask).sum(dim=1) - 1
+            x_last = output[torch.arange(output.size(0), device=output.device), last]
         
         # Prediction
         rul_pred = self.decoder(x_last)
@@ -3,7 +3,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 from pipeline.models.transformer_model import RULTransformer
-from pipeline.models.train_transformer import load_seq_data, DEVICE
+from pipeline.models.train_transformer import load_window_datasets, DEVICE
 
 OUTPUT_DIR = "output/uncertainty"
 
@@ -42,25 +42,24 @@ def run_uncertainty_analysis():
     
     # 1. Load Data
     # We want a few samples to test. 
-    # load_seq_data() returns (X_train, y_train, X_val, y_val, input_dim). 
-    X_train_np, y_train_np, X_val_np, y_val_np, input_dim = load_seq_data()
+    # load_window_datasets() returns (train_ds, val_ds, input_dim) over the shared
+    # sequence store; only the sampled windows are gathered.
+    train_ds, val_ds, input_dim = load_window_datasets()
     
     # Use Validation set for this analysis to be fair
-    target_X = X_val_np
-    target_y = y_val_np
-    
-    print(f"Using Validation set for Uncertainty Analysis. Size: {target_X.shape}")
+    print(f"Using Validation set for Uncertainty Analysis. Size: {len(val_ds)} windows")
     
     # Pick 5 random sample indices or specific ones
-    if len(target_X) > 5:
+    if len(val_ds) > 5:
         # Fixed seed for reproducibility of example
         np.random.seed(42)
-        indices = np.random.choice(len(target_X), 5, replace=False)
+        indices = np.random.choice(len(val_ds), 5, replace=False)
     else:
-        indices = np.arange(len(target_X))
+        indices = np.arange(len(val_ds))
         
-    X_sample = torch.tensor(target_X[indices], dtype=torch.float32).to(DEVICE)
-    y_sample = target_y[indices]
+    X_batch, y_batch = val_ds[indices]
+    X_sample = X_batch.to(DEVICE)
+    y_sample = y_batch.numpy()
     
     # 2. Load Model
     model_path = "pipeline/models/checkpoints/transformer.pt"
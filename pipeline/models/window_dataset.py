@@ -0,0 +1,316 @@
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset, DataLoader, Sampler, BatchSampler, RandomSampler, SequentialSampler
+from pipeline.feature_engineering import segment_positions
+from pipeline.dataset_builder import window_counts
+
+class WindowDataset(Dataset):
+    """
+    Sliding-window sequence dataset that slices windows on demand.
+
+    Holds one contiguous float32 (rows, features) array of all engine rows, the
+    targets of the rows, and an index of the windows: the row where each engine
+    starts and the end row of every window. A window is never materialized until
+    it is requested, so memory is O(rows) instead of O(samples x window) like
+    `build_sequence_dataset`, and `with_window` re-indexes the same base arrays
+    for another window length. The rows may be a read-only memory map (e.g. a
+    SequenceStore, possibly float16); batches are always float32.
+
+    Indexing with an int returns one (window, features) sample; indexing with a
+    list/array of indices returns a whole batch gathered by one fancy index over
+    the base array. `make_loader` feeds it index batches from a BatchSampler
+    (DataLoader batch_size=None), so collation is that single gather, also inside
+    worker processes.
+
+    With `min_length` below `window` the dataset also holds the shorter prefixes:
+    a sample ends at every row at least `min_length - 1` rows into its engine and
+    covers up to `window` rows, so early-life engines and engines shorter than the
+    window are included. Items are then (X, y, padding_mask): a batch is padded at
+    the end to its longest sample and padding_mask is True at the padded steps
+    (the `src_key_padding_mask` of RULTransformer). `make_loader` batches such a
+    dataset by length (LengthBucketSampler) to keep the padding small.
+    """
+
+    def __init__(self, data: np.ndarray, targets: np.ndarray, engine_starts: np.ndarray,
+                 engine_lengths: np.ndarray, window: int = 30, max_samples: int = None,
+                 min_length: int = None):
+        """
+        Args:
+            data: (rows, features) feature rows, engines as contiguous runs.
+            targets: (rows,) target of every row.
+            engine_starts, engine_lengths: Row where each engine begins and its row count.
+            window: Window length (the longest sample).
+            max_samples: Optional limit on the number of windows (as in build_sequence_dataset).
+            min_length: Shortest sample (default: window, i.e. only full windows).
+        """
+        # float16 rows (a SequenceStore) are kept as they are and cast per batch;
+        # memory-mapped rows stay mapped
+        self.data = _as_rows(data)
+        self.targets = _as_rows(targets)
+        self.engine_starts = np.asarray(engine_starts, dtype=np.int64)
+        self.engine_lengths = np.asarray(engine_lengths, dtype=np.int64)
+        self.window = window
+        self.max_samples = max_samples
+        self.min_length = window if min_length is None else min(max(int(min_length), 1), window)
+
+        # Sample i covers rows ends[i] - lengths[i] + 1 .. ends[i]; engine[i] is its engine
+        counts = window_counts(self.engine_lengths, self.min_length, max_samples)
+        self.engine = np.repeat(np.arange(len(counts)), counts)
+        position = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                    + self.min_length - 1)
+        self.ends = np.repeat(self.engine_starts, counts) + position
+        self.lengths = np.minimum(position + 1, window)
+        self._offsets = np.arange(1 - window, 1)
+
+    @property
+    def variable_length(self) -> bool:
+        """True if samples can be shorter than the window (items carry a padding mask)."""
+        return self.min_length < self.window
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, feature_cols: list, window: int = 30, target_col: str = "RUL",
+                   max_samples: int = None, min_length: int = None) -> "WindowDataset":
+        """
+        Dataset over a processed frame (same windows and order as build_sequence_dataset).
+
+        Args:
+            df: Input DataFrame (engines are ordered by engine_id, rows keep their order).
+            feature_cols: List of feature columns to include.
+            window: Size of the sliding window.
+            target_col: Name of the target column.
+            max_samples: Optional limit on number of samples.
+            min_length: Shortest sample (default: window).
+        """
+        engine_ids = df['engine_id'].to_numpy()
+        if len(engine_ids) and (engine_ids[1:] < engine_ids[:-1]).any():
+            df = df.iloc[np.argsort(engine_ids, kind='stable')]
+            engine_ids = df['engine_id'].to_numpy()
+        starts, lengths, _ = segment_positions(engine_ids)
+        return cls(df[feature_cols].to_numpy(np.float32), df[target_col].to_numpy(np.float32),
+                   starts, lengths, window, max_samples, min_length)
+
+    def with_window(self, window: int, max_samples: int = None, min_length: int = None) -> "WindowDataset":
+        """The same rows indexed with another window length (the base arrays are shared)."""
+        return WindowDataset(self.data, self.targets, self.engine_starts, self.engine_lengths, window,
+                             max_samples, min_length)
+
+    @property
+    def n_features(self) -> int:
+        return self.data.shape[1]
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, index):
+        ends = self.ends[index]
+        if self.variable_length:
+            return self._padded(np.atleast_1d(ends), np.atleast_1d(self.lengths[index]), np.ndim(ends) == 0)
+        if np.ndim(ends) == 0:
+            x = np.array(self.data[ends - self.window + 1:ends + 1], dtype=np.float32)
+            return torch.from_numpy(x), torch.tensor(float(self.targets[ends]))
+        # One gather of the whole batch: (batch, window) row indices
+        rows = ends[:, None] + self._offsets
+        return (torch.from_numpy(self.data[rows].astype(np.float32, copy=False)),
+                torch.from_numpy(np.asarray(self.targets[ends], dtype=np.float32)))
+
+    def _padded(self, ends, lengths, single):
+        # One gather of (batch, longest) rows, each sample from its first row on; the
+        # steps after a sample's end repeat its last row and are zeroed and masked
+        steps = np.arange(lengths.max())
+        valid = steps[None, :] < lengths[:, None]
+        rows = np.where(valid, (ends - lengths + 1)[:, None] + steps, ends[:, None])
+        x = self.data[rows].astype(np.float32, copy=False)
+        x[~valid] = 0
+        y = np.asarray(self.targets[ends], dtype=np.float32)
+        x, y, mask = torch.from_numpy(x), torch.from_numpy(y), torch.from_numpy(~valid)
+        return (x[0], y[0], mask[0]) if single else (x, y, mask)
+
+    def arrays(self) -> tuple:
+        """Every window gathered into (X_seq, y_seq) arrays, as build_sequence_dataset returns them."""
+        if self.variable_length:
+            raise ValueError("Variable-length samples cannot be stacked; index batches instead")
+        rows = self.ends[:, None] + self._offsets
+        return self.data[rows], np.asarray(self.targets[self.ends])
+
+    def __getstate__(self):
+        # Memory-mapped arrays travel to spawned DataLoader workers as their file, not their bytes
+        state = self.__dict__.copy()
+        for key in ('data', 'targets'):
+            state[key] = _MappedArray.of(state[key]) or state[key]
+        return state
+
+    def __setstate__(self, state):
+        for key in ('data', 'targets'):
+            if isinstance(state[key], _MappedArray):
+                state[key] = state[key].open()
+        self.__dict__.update(state)
+
+
+class _MappedArray:
+    """Picklable reference to a read-only memory-mapped .npy array."""
+
+    def __init__(self, filename, dtype, shape, offset):
+        self.filename, self.dtype, self.shape, self.offset = filename, dtype, shape, offset
+
+    @classmethod
+    def of(cls, a):
+        base = a
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        if base is None or base.filename is None or a.shape != base.shape or not a.flags.c_contiguous:
+            return None
+        return cls(base.filename, a.dtype.str, a.shape, base.offset)
+
+    def open(self):
+        return np.memmap(self.filename, dtype=np.dtype(self.dtype), mode='r', shape=self.shape, offset=self.offset)
+
+
+def _as_rows(a):
+    a = a if isinstance(a, np.ndarray) else np.asarray(a)
+    if a.dtype not in (np.float16, np.float32):
+        a = a.astype(np.float32)
+    return a if a.flags.c_contiguous else np.ascontiguousarray(a)
+
+
+class LengthBucketSampler(Sampler):
+    """
+    Batches of indices with similar sample lengths (for variable-length WindowDatasets).
+
+    With shuffle, every epoch shuffles the samples, cuts them into pools of
+    `pool_batches` batches, sorts each pool by length and cuts it into batches,
+    then shuffles the batch order: batches are random but nearly uniform in
+    length, so padding to the longest sample of a batch costs little. Without
+    shuffle the samples are simply batched in length order.
+    """
+
+    def __init__(self, lengths, batch_size: int, shuffle: bool = True, pool_batches: int = 50,
+                 seed: int = None, sampler: Sampler = None):
+        """
+        Args:
+            lengths: Length of every sample (WindowDataset.lengths).
+            batch_size: Samples per batch.
+            shuffle: Random batches every epoch (otherwise length order).
+            pool_batches: Batches per length-sorted pool.
+            seed: Optional seed of the shuffling.
+            sampler: Optional sampler of the indices drawn each epoch (e.g. a
+                     WindowSubsampler) instead of all samples once.
+        """
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.pool_batches = pool_batches
+        self.rng = np.random.default_rng(seed)
+        self.sampler = sampler
+
+    def __len__(self):
+        n = len(self.lengths) if self.sampler is None else len(self.sampler)
+        return -(-n // self.batch_size)
+
+    def __iter__(self):
+        if self.sampler is not None:
+            order = np.fromiter(self.sampler, dtype=np.int64)
+        elif self.shuffle:
+            order = self.rng.permutation(len(self.lengths))
+        else:
+            order = np.arange(len(self.lengths))
+        n = len(order)
+        if not self.shuffle:
+            order = order[np.argsort(self.lengths[order], kind='stable')]
+            return iter([order[i:i + self.batch_size].tolist() for i in range(0, n, self.batch_size)])
+
+        pool = self.batch_size * self.pool_batches
+        batches = []
+        for lo in range(0, n, pool):
+            chunk = order[lo:lo + pool]
+            chunk = chunk[np.argsort(self.lengths[chunk], kind='stable')]
+            batches += [chunk[i:i + self.batch_size].tolist() for i in range(0, len(chunk), self.batch_size)]
+        return iter([batches[i] for i in self.rng.permutation(len(batches))])
+
+
+class WindowSubsampler(Sampler):
+    """
+    Draws a subset of the windows of every engine each epoch.
+
+    Consecutive windows share all but one row, so an epoch over every window
+    mostly repeats near-duplicates. Each window gets an expected number of draws
+    per epoch, `fraction` (or 1 / `stride`), multiplied by `low_rul_weight` when
+    its target is at most `low_rul` (oversampling the end of life, where the
+    error matters most). The draws are taken by systematic sampling along each
+    engine: with a random offset per engine and epoch, every window whose
+    cumulative expected count crosses an integer is drawn. Uniform rates thus give
+    evenly spaced windows (exactly every `stride`-th window) that shift every epoch,
+    so all windows are still seen over the epochs; rates above 1 repeat windows.
+    The drawn indices are yielded in random order.
+    """
+
+    def __init__(self, dataset: WindowDataset, fraction: float = None, stride: int = 1,
+                 low_rul: float = None, low_rul_weight: float = 1.0, seed: int = None):
+        """
+        Args:
+            dataset: WindowDataset to draw from.
+            fraction: Expected fraction of every engine's windows drawn per epoch
+                      (default: 1 / stride).
+            stride: Draw every stride-th window (when no fraction is given).
+            low_rul: Targets at or below this count as low RUL (None: no oversampling).
+            low_rul_weight: Draw-rate multiplier of the low-RUL windows.
+            seed: Optional seed of the offsets and the order.
+        """
+        self.engine = dataset.engine
+        rate = fraction if fraction is not None else 1.0 / max(int(stride), 1)
+        self.rates = np.full(len(dataset), float(rate))
+        if low_rul is not None:
+            targets = np.asarray(dataset.targets[dataset.ends], dtype=np.float64)
+            self.rates[targets <= low_rul] *= low_rul_weight
+        # Engine runs of the samples (samples are ordered by engine)
+        self.starts = np.flatnonzero(np.r_[True, self.engine[1:] != self.engine[:-1]]) if len(dataset) \
+            else np.zeros(0, dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return int(round(self.rates.sum()))
+
+    def __iter__(self):
+        n = len(self.rates)
+        if n == 0:
+            return iter([])
+        # Cumulative expected draws within each engine, shifted by its random offset;
+        # draws of window i = floor(c_i + u) - floor(c_{i-1} + u)
+        cum = np.cumsum(self.rates)
+        before = np.r_[0.0, cum[:-1]]
+        engine_before = np.repeat(before[self.starts], np.diff(np.r_[self.starts, n]))
+        u = np.repeat(self.rng.random(len(self.starts)), np.diff(np.r_[self.starts, n]))
+        draws = (np.floor(cum - engine_before + u) - np.floor(before - engine_before + u)).astype(np.int64)
+        indices = np.repeat(np.arange(n), draws)
+        return iter(self.rng.permutation(indices).tolist())
+
+
+def make_loader(dataset: WindowDataset, batch_size: int, shuffle: bool = False, num_workers: int = 0,
+                device: torch.device = None, seed: int = None, sampler: Sampler = None) -> DataLoader:
+    """
+    DataLoader that collates each batch with one gather in `WindowDataset.__getitem__`.
+
+    Variable-length datasets are batched by length (LengthBucketSampler) and yield
+    (X, y, padding_mask) batches; full-window datasets yield (X, y).
+
+    Args:
+        dataset: WindowDataset.
+        batch_size: Windows per batch (the last batch may be smaller).
+        shuffle: Draw the windows in random order every epoch.
+        num_workers: Worker processes gathering batches (0 = in the main process).
+        device: Training device; pinned host memory is only used for CUDA.
+        seed: Optional seed of the shuffling order.
+        sampler: Optional sampler of the windows of every epoch (e.g. WindowSubsampler)
+                 instead of all windows.
+    """
+    if dataset.variable_length:
+        batch_sampler = LengthBucketSampler(dataset.lengths, batch_size, shuffle=shuffle, seed=seed,
+                                            sampler=sampler)
+    else:
+        if sampler is None:
+            generator = torch.Generator().manual_seed(seed) if seed is not None else None
+            sampler = RandomSampler(dataset, generator=generator) if shuffle else SequentialSampler(dataset)
+        batch_sampler = BatchSampler(sampler, batch_size, drop_last=False)
+    return DataLoader(dataset, batch_size=None, sampler=batch_sampler,
+                      num_workers=num_workers, persistent_workers=num_workers > 0,
+                      pin_memory=device is not None and device.type == "cuda")
@@ -4,13 +4,13 @@ import pandas as pd
 import joblib
 import os
 from sklearn.model_selection import GroupKFold
-from pipeline.config import DATA_PATH, TRAIN_FILE
-from pipeline.data_loader import load_and_label
-from pipeline.sensor_cleaner import remove_constant_sensors
-from pipeline.normalizer import normalize_dataframe
-from pipeline.feature_engineering import add_degradation_features
-from pipeline.health_index import add_health_index
+from pipeline.config import DATA_PATH, TRAIN_FILES, USE_CACHE, PRECISION, ENGINE_ID_STRIDE
+from pipeline.data_loader import load_fleet, resolve_sources
+from pipeline.artifact_cache import ArtifactCache
+from pipeline.preprocessing import PreprocessingPipeline, PREPROCESSING_PATH
+from pipeline.backends import get_backend
 from pipeline.utils import compute_metrics
+from pipeline.models.model_meta import save_checkpoint_meta, feature_mismatch
 
 METRICS_PATH = "pipeline/models/checkpoints"
 XGB_MODEL_PATH = os.path.join(os.path.dirname(__file__), "checkpoints", "xgb_model.pkl")
@@ -39,6 +39,7 @@ class XGBoostBaseline:
     def save(self, path):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         joblib.dump(self.model, path)
+        save_checkpoint_meta(path)
         print(f"Model saved to {path}")
         
     @staticmethod
@@ -50,35 +51,81 @@ class XGBoostBaseline:
 
 
 
-def load_full_data():
+def _full_data_key_parts(required: list = None) -> tuple:
+    """Input files and stage parameters that identify a `load_full_data` result."""
+    sources = resolve_sources(TRAIN_FILES, data_path=DATA_PATH)
+    from_checkpoint = required is not None and os.path.exists(PREPROCESSING_PATH)
+    # The saved pipeline is an input too when it is replayed
+    inputs = sources + ([PREPROCESSING_PATH] if from_checkpoint else [])
+    params = {
+        'stage': 'load_full_data',
+        'train_files': TRAIN_FILES,
+        'required': list(required) if required is not None else None,
+        'preprocessing': PreprocessingPipeline().get_params(),
+        'precision': PRECISION,
+        'engine_id_stride': ENGINE_ID_STRIDE,
+    }
+    return inputs, params
+
+def full_data_fingerprint(required: list = None) -> str:
+    """
+    Fingerprint of the `load_full_data(required)` result without building it.
+
+    Changes whenever the input files' content, the pipeline code or the stage
+    parameters (normalization, windows, precision, ...) change, like the artifact
+    cache key it is.
+    """
+    inputs, params = _full_data_key_parts(required)
+    return ArtifactCache().key(inputs, params)
+
+def load_full_data(required: list = None, use_cache: bool = USE_CACHE):
     """
     Runs the Phase 1 pipeline to get the fully processed DataFrame 
     (not just the last rows, but full trajectory).
+
+    The result is stored in the content-addressed artifact cache (see
+    pipeline/artifact_cache.py), keyed by the input files' content, the pipeline
+    code and the stage parameters, so every script calling this with the same
+    inputs memory-maps one stored frame instead of rerunning the chain.
+
+    Args:
+        required: Optional list of columns the consuming models need, e.g.
+                  `required_features(xgb_model)`. If given and a fitted preprocessing
+                  pipeline is saved, it is replayed computing only those columns (and
+                  their dependencies) instead of fitting and generating everything.
+        use_cache: Read/write the artifact cache.
+
+    Returns:
+        tuple: (df_final, feature_cols); feature_cols is `required` when given.
     """
-    file_path = os.path.join(DATA_PATH, TRAIN_FILE)
-    print(f"Loading data from {file_path}...")
-    
-    # 1. Load
-    df = load_and_label(file_path)
-    
-    # 2. Clean
-    df_clean, kept_sensors = remove_constant_sensors(df)
-    
-    # 3. Normalize
-    setting_cols = ['op1', 'op2', 'op3']
-    features_to_normalize = setting_cols + kept_sensors
-    df_norm, _ = normalize_dataframe(df_clean, features_to_normalize)
-    
-    # 4. Features
-    df_feat = add_degradation_features(df_norm, kept_sensors)
-    
-    # 5. Health Index
-    print("Computing Health Index...")
-    exclude_cols = ['engine_id', 'cycle', 'RUL']
-    # Select features usually used for modeling
-    feature_cols = [c for c in df_feat.columns if c not in exclude_cols]
-    
-    df_final, _ = add_health_index(df_feat, feature_cols)
+    from_checkpoint = required is not None and os.path.exists(PREPROCESSING_PATH)
+
+    def build():
+        print(f"Loading data from {DATA_PATH} {TRAIN_FILES}...")
+        
+        # 1. Load (all configured subsets, engine ids namespaced per subset)
+        # 2-5. Clean, normalize, features and Health Index
+        if from_checkpoint:
+            # Fitted parameters from training, only the required columns
+            df = load_fleet(TRAIN_FILES, data_path=DATA_PATH)
+            preprocessor = PreprocessingPipeline.load(PREPROCESSING_PATH)
+            df_final = preprocessor.transform(df, inplace=True, required=list(required) + ['health_index'])
+        else:
+            # Fitted on this data (fitting needs every candidate feature for the HI), on the
+            # configured backend: a lazy backend runs load and all stages as one query
+            preprocessor = PreprocessingPipeline()
+            df = get_backend(preprocessor.backend).load(TRAIN_FILES, data_path=DATA_PATH)
+            df_final = preprocessor.fit_transform(df)
+        feature_cols = list(required) if required is not None else preprocessor.feature_cols
+        return df_final, {'feature_cols': feature_cols}
+
+    if use_cache:
+        inputs, params = _full_data_key_parts(required)
+        df_final, meta = ArtifactCache().get_or_build(inputs, params, build,
+                                                      description=f"load_full_data {TRAIN_FILES}")
+    else:
+        df_final, meta = build()
+    feature_cols = meta['feature_cols']
     
     print(f"Columns after processing: {df_final.columns.tolist()[:10]} ...")
     
@@ -149,6 +196,9 @@ def load_xgb_model():
         raise FileNotFoundError(f"XGBoost model not found at {XGB_MODEL_PATH}")
     model = joblib.load(XGB_MODEL_PATH)
     print(f"Loaded XGBoost model from: {XGB_MODEL_PATH}")
+    mismatch = feature_mismatch(XGB_MODEL_PATH)
+    if mismatch:
+        print(f"Warning: {mismatch}")
     return model
 
 
@@ -2,13 +2,20 @@ import pandas as pd
 from sklearn.preprocessing import StandardScaler
 import numpy as np
 
-def normalize_dataframe(df: pd.DataFrame, feature_cols: list) -> tuple:
+def normalize_dataframe(df: pd.DataFrame, feature_cols: list, scaler: StandardScaler = None, stats=None,
+                        inplace: bool = False) -> tuple:
     """
     Normalizes specific columns of a DataFrame using StandardScaler.
 
     Args:
         df: Input DataFrame.
         feature_cols: List of column names to normalize.
+        scaler: Optional already-fitted StandardScaler. If given it is applied as-is
+                (no refit), e.g. for chunks of a larger fleet or for test data.
+        stats: Optional RunningMoments covering `feature_cols`; the scaler is then
+               built from it instead of fitting on `df`.
+        inplace: If True, the columns of `df` are overwritten and `df` itself is
+                 returned (no frame copy); the caller hands over ownership of the frame.
 
     Returns:
         tuple: (normalized_df, scaler)
@@ -16,17 +23,207 @@ def normalize_dataframe(df: pd.DataFrame, feature_cols: list) -> tuple:
             scaler: Fitted StandardScaler object.
     """
     # Create a copy to avoid settingWithCopyWarning or modifying original
-    df_norm = df.copy()
+    df_norm = df if inplace else df.copy()
     
     # Initialize and fit scaler
-    scaler = StandardScaler()
-    scaler.fit(df[feature_cols])
+    if scaler is None and stats is not None:
+        scaler = stats.to_scaler(feature_cols)
+    elif scaler is None:
+        scaler = StandardScaler()
+        scaler.fit(df[feature_cols])
     
     # Transform data
     df_norm[feature_cols] = scaler.transform(df[feature_cols])
     
     return df_norm, scaler
 
+def scaler_from_stats(feature_cols: list, mean, var, n_samples: int) -> StandardScaler:
+    """
+    Builds a fitted StandardScaler from precomputed column statistics.
+
+    Lets out-of-core and parallel pipelines fit the scaler from streamed
+    count/mean/variance instead of calling `fit` on a materialized frame.
+
+    Args:
+        feature_cols: Column names, in the order of `mean`/`var`.
+        mean: Per-column mean.
+        var: Per-column population variance (ddof=0, as StandardScaler uses).
+        n_samples: Number of rows the statistics were computed on.
+
+    Returns:
+        StandardScaler: Equivalent to `StandardScaler().fit(df[feature_cols])`.
+    """
+    mean = np.asarray(mean, dtype=np.float64)
+    var = np.asarray(var, dtype=np.float64)
+
+    scaler = StandardScaler()
+    scaler.mean_ = mean
+    scaler.var_ = var
+    # Same zero-variance guard as StandardScaler (constant columns are left unscaled)
+    scale = np.sqrt(var)
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+    scaler.scale_ = scale
+    scaler.n_samples_seen_ = int(n_samples)
+    scaler.n_features_in_ = len(feature_cols)
+    scaler.feature_names_in_ = np.asarray(feature_cols, dtype=object)
+    return scaler
+
+class RegimeNormalizer:
+    """
+    Operating-regime-aware standardization.
+
+    The multi-condition subsets (FD002/FD004) run at a handful of discrete
+    operating points, and the sensor levels depend strongly on the regime, so a
+    single global scaler mostly encodes "which regime" instead of degradation.
+    `fit` clusters the operating settings into regimes once (KMeans, centroids
+    stored) and computes per-regime mean/std of every feature into two
+    (n_regimes x n_features) matrices. `transform` assigns each row to its
+    nearest centroid and normalizes all rows in one gather:
+    (X - mean_[regime]) / scale_[regime].
+    """
+
+    def __init__(self, n_regimes: int = 6, setting_cols: list = None, max_fit_rows: int = 200_000,
+                 random_state: int = 42):
+        self.n_regimes = n_regimes
+        self.setting_cols = list(setting_cols) if setting_cols is not None else ['op1', 'op2', 'op3']
+        self.max_fit_rows = max_fit_rows
+        self.random_state = random_state
+
+        # Fitted state
+        self.feature_cols = None
+        self.settings_center_ = None
+        self.settings_scale_ = None
+        self.centroids_ = None
+        self.mean_ = None
+        self.scale_ = None
+        self.counts_ = None
+
+    def fit(self, df: pd.DataFrame, feature_cols: list) -> "RegimeNormalizer":
+        """
+        Finds the regimes and the per-regime feature statistics.
+
+        Args:
+            df: DataFrame with the operating settings and `feature_cols`.
+            feature_cols: Columns to normalize per regime.
+
+        Returns:
+            self
+        """
+        from sklearn.cluster import KMeans
+
+        self.feature_cols = list(feature_cols)
+        settings = df[self.setting_cols].to_numpy(dtype=np.float64)
+
+        # Cluster in standardized setting space so no setting dominates by its units
+        self.settings_center_ = settings.mean(axis=0)
+        scale = settings.std(axis=0)
+        scale[scale == 0] = 1.0
+        self.settings_scale_ = scale
+
+        # The centroids only need a sample; the statistics below use every row
+        sample = settings
+        if len(settings) > self.max_fit_rows:
+            rng = np.random.default_rng(self.random_state)
+            sample = settings[rng.choice(len(settings), self.max_fit_rows, replace=False)]
+        n_clusters = min(self.n_regimes, len(np.unique(sample, axis=0)))
+        kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=self.random_state)
+        kmeans.fit((sample - self.settings_center_) / self.settings_scale_)
+        self.centroids_ = kmeans.cluster_centers_
+
+        # Per-regime moments with one bincount per feature (no groupby over regimes)
+        regimes = self.assign(df)
+        x = df[self.feature_cols].to_numpy(dtype=np.float64)
+        r = len(self.centroids_)
+        counts = np.bincount(regimes, minlength=r).astype(np.float64)
+        safe = np.maximum(counts, 1)[:, None]
+        sums = np.stack([np.bincount(regimes, weights=x[:, j], minlength=r) for j in range(x.shape[1])], axis=1)
+        mean = sums / safe
+        centered = x - mean[regimes]
+        m2 = np.stack([np.bincount(regimes, weights=centered[:, j] ** 2, minlength=r) for j in range(x.shape[1])], axis=1)
+        std = np.sqrt(m2 / safe)
+
+        # Same zero-variance rule as StandardScaler
+        std[std < 10 * np.finfo(np.float64).eps] = 1.0
+        self.mean_ = mean
+        self.scale_ = std
+        self.counts_ = counts.astype(np.int64)
+        print(f"Regime normalizer: {r} regimes, rows per regime {self.counts_.tolist()}")
+        return self
+
+    def assign(self, df: pd.DataFrame, block_rows: int = 1 << 20) -> np.ndarray:
+        """
+        Returns the regime (nearest centroid) of every row.
+
+        Distances are computed as |c|^2 - 2 z.c (|z|^2 is the same for every
+        centroid) in float32 blocks, so memory stays at block_rows x n_regimes
+        regardless of the frame size.
+        """
+        if self.centroids_ is None:
+            raise RuntimeError("RegimeNormalizer is not fitted.")
+        settings = df[self.setting_cols].to_numpy(dtype=np.float32)
+        center = self.settings_center_.astype(np.float32)
+        inv_scale = (1.0 / self.settings_scale_).astype(np.float32)
+        c = self.centroids_.astype(np.float32)
+        c_sq = (c ** 2).sum(axis=1)
+
+        regimes = np.empty(len(settings), dtype=np.intp)
+        for start in range(0, len(settings), block_rows):
+            z = (settings[start:start + block_rows] - center) * inv_scale
+            regimes[start:start + block_rows] = np.argmin(c_sq - 2 * z @ c.T, axis=1)
+        return regimes
+
+    def transform(self, df: pd.DataFrame, regimes: np.ndarray = None, inplace: bool = False) -> pd.DataFrame:
+        """
+        Normalizes `feature_cols` of every row with the statistics of its regime.
+
+        The parameters are kept as (n_features x n_regimes) matrices of 1/std and
+        -mean/std, so the whole frame is normalized with two gathers and one
+        multiply-add, column-major like the pandas blocks (no per-regime loop).
+
+        Args:
+            df: DataFrame with the operating settings and the fitted feature columns.
+            regimes: Optional precomputed `assign(df)`.
+            inplace: If True, overwrite the columns of `df` itself instead of a copy.
+
+        Returns:
+            pd.DataFrame: df (or a copy) with the feature columns normalized.
+        """
+        if regimes is None:
+            regimes = self.assign(df)
+
+        # (features x rows) view: each row of x_t is one column of df
+        x_t = df[self.feature_cols].to_numpy().T
+        dtype = x_t.dtype if x_t.dtype.kind == 'f' else np.float64
+        inv_scale = (1.0 / self.scale_).T.astype(dtype)
+        shift = (-self.mean_ / self.scale_).T.astype(dtype)
+
+        out = np.take(inv_scale, regimes, axis=1)
+        out *= x_t
+        out += np.take(shift, regimes, axis=1)
+
+        df_norm = df if inplace else df.copy()
+        for col, values in zip(self.feature_cols, out):
+            df_norm[col] = values
+        return df_norm
+
+def normalize_by_regime(df: pd.DataFrame, feature_cols: list, normalizer: RegimeNormalizer = None,
+                        n_regimes: int = 6) -> tuple:
+    """
+    Regime-aware counterpart of `normalize_dataframe`.
+
+    Args:
+        df: Input DataFrame (must contain op1..op3).
+        feature_cols: Columns to normalize per operating regime (typically the kept sensors).
+        normalizer: Optional already-fitted RegimeNormalizer (applied as-is, no refit).
+        n_regimes: Number of regimes when fitting a new normalizer.
+
+    Returns:
+        tuple: (normalized_df, normalizer)
+    """
+    if normalizer is None:
+        normalizer = RegimeNormalizer(n_regimes=n_regimes).fit(df, feature_cols)
+    return normalizer.transform(df), normalizer
+
 if __name__ == "__main__":
     from pipeline.data_loader import load_and_label
     from pipeline.sensor_cleaner import remove_constant_sensors
@@ -0,0 +1,306 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from pipeline.config import FEATURE_WINDOWS
+from pipeline.data_loader import SETTING_COLS, SENSOR_COLS, SORT_KEYS, is_sorted, float_dtype_of
+from pipeline.normalizer import normalize_dataframe, scaler_from_stats
+from pipeline.streaming_stats import RunningMoments
+from pipeline.feature_engineering import add_degradation_features, feature_column_names, segment_positions, _row_tiles
+from pipeline.health_index import select_health_features, smooth_health_index, StreamingCovariance, first_component
+
+# Two-pass engine-partitioned executor for the preprocessing chain:
+#   stats    every shard reduces its raw settings/sensors to RunningMoments; the parent
+#            merges them into the constant-sensor screen and the scaler
+#   features every shard normalizes, engineers features and accumulates the HI
+#            covariance, writing its rows straight into the shared output block
+#   project  the parent fits the HI projection from the merged covariance; every shard
+#            projects and smooths its raw HI, the parent applies the global min-max
+# Inputs and fitted parameters live in shared memory and the output in one memory-
+# mapped (columns x rows) block, so shards exchange only row ranges and small
+# reductions, and the result frame is a set of views over that block.
+
+# Engine-aligned shards per worker process (several per worker balances uneven shards)
+SHARDS_PER_PROCESS = 4
+
+class SharedArrays:
+    """
+    Named NumPy arrays packed into one SharedMemory block.
+
+    The parent creates the block; `spec` is a small picklable description that
+    worker processes pass to `attach` to get read-only views without any copy.
+    """
+
+    def __init__(self, arrays: dict):
+        layout, offset = [], 0
+        for name, a in arrays.items():
+            a = np.ascontiguousarray(a)
+            layout.append((name, offset, a.shape, a.dtype.str))
+            offset += -(-a.nbytes // 64) * 64
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.spec = (self.shm.name, layout)
+        for (name, off, shape, dtype), a in zip(layout, arrays.values()):
+            np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=off)[...] = a
+
+    @staticmethod
+    def attach(spec) -> tuple:
+        """Returns (shm, {name: view}); keep `shm` referenced while the views are used."""
+        name, layout = spec
+        shm = shared_memory.SharedMemory(name=name)
+        views = {}
+        for key, off, shape, dtype in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=off)
+            view.flags.writeable = False
+            views[key] = view
+        return shm, views
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+# Per-process cache of attached shared blocks (keyed by block name)
+_ATTACHED = {}
+
+def _views(spec) -> dict:
+    name = spec[0]
+    if name not in _ATTACHED:
+        _ATTACHED[name] = SharedArrays.attach(spec)
+    return _ATTACHED[name][1]
+
+def _output(ctx) -> np.ndarray:
+    key = ctx['out_path']
+    if key not in _ATTACHED:
+        _ATTACHED[key] = (None, np.memmap(key, dtype=ctx['dtype'], mode='r+', shape=ctx['out_shape']))
+    return _ATTACHED[key][1]
+
+def _detach(*keys):
+    """Drops this process's cached attachments of the given blocks, closing shared ones."""
+    for key in keys:
+        shm, views = _ATTACHED.pop(key, (None, None))
+        # The views must be gone before the block can be unmapped; a memmap output is
+        # only dropped from the cache (the returned frame is a view of it)
+        del views
+        if shm is not None:
+            shm.close()
+
+def _shard_moments(ctx, lo, hi):
+    raw = _views(ctx['inputs'])['raw']
+    return RunningMoments(ctx['raw_cols']).update(raw[:, lo:hi].T)
+
+def _shard_features(ctx, lo, hi):
+    inputs = _views(ctx['inputs'])
+    params = _views(ctx['params'])
+    raw_cols = ctx['raw_cols']
+    dtype = np.dtype(ctx['dtype']).type
+
+    # The shard as a frame of its own (complete engines, already sorted)
+    data = {'engine_id': inputs['engine_id'][lo:hi].copy(), 'cycle': inputs['cycle'][lo:hi].copy()}
+    for c in SETTING_COLS + ctx['kept_sensors']:
+        data[c] = inputs['raw'][raw_cols.index(c), lo:hi].astype(dtype)
+    df = pd.DataFrame(data)
+
+    if ctx['regime_normalizer'] is not None:
+        df = ctx['regime_normalizer'].transform(df, inplace=True)
+    scaler = scaler_from_stats(ctx['global_cols'], params['scaler_mean'], params['scaler_var'], ctx['n_rows'])
+    df, _ = normalize_dataframe(df, ctx['global_cols'], scaler=scaler, inplace=True)
+    df = add_degradation_features(df, ctx['kept_sensors'], windows=ctx['windows'], inplace=True)
+
+    out = _output(ctx)
+    # Everything but the two HI rows, which are filled by the projection pass
+    for i, c in enumerate(ctx['value_cols'][:-2]):
+        out[i, lo:hi] = df[c].to_numpy()
+
+    covariance = StreamingCovariance(ctx['hi_features'])
+    covariance.update(df)
+    return covariance
+
+def _shard_health_index(ctx, lo, hi):
+    params = _views(ctx['params'])
+    out = _output(ctx)
+    rows = [ctx['value_cols'].index(c) for c in ctx['hi_features']]
+    x = out[rows, lo:hi].astype(np.float64).T
+    raw = (x - params['pca_mean']) @ params['pca_component']
+
+    ids = _views(ctx['inputs'])['engine_id'][lo:hi]
+    smoothed = smooth_health_index(pd.DataFrame({'engine_id': ids, 'health_index_raw': raw}),
+                                   window=ctx['hi_window']).to_numpy()
+    raw_row = ctx['value_cols'].index('health_index_raw')
+    out[raw_row, lo:hi] = smoothed
+    smoothed = out[raw_row, lo:hi].astype(np.float64)
+
+    # Partial min/max and the raw-HI/cycle co-moment (merged for the orientation check)
+    cycle = _views(ctx['inputs'])['cycle'][lo:hi].astype(np.float64)
+    mr, mc = smoothed.mean(), cycle.mean()
+    return smoothed.min(), smoothed.max(), len(cycle), mr, mc, ((smoothed - mr) * (cycle - mc)).sum()
+
+def _run(pool, fn, ctx, shards):
+    if pool is None:
+        return [fn(ctx, lo, hi) for lo, hi in shards]
+    n = len(shards)
+    return list(pool.map(fn, [ctx] * n, [lo for lo, _ in shards], [hi for _, hi in shards]))
+
+def run_parallel(df: pd.DataFrame, processes: int = None, threshold: float = 1e-6, windows: list = None,
+                 hi_window: int = 5, regime_normalizer=None) -> tuple:
+    """
+    Runs clean -> normalize -> features -> health index with engines sharded over processes.
+
+    Produces the same frame as `PreprocessingPipeline().fit_transform(df)` (up to
+    float rounding in the HI projection, which is fitted from the merged covariance
+    like pipeline/chunked.py). Only the global fits (sensor variance, scaler, PCA,
+    HI range) need the whole fleet; they are merged from per-shard reductions.
+
+    Args:
+        df: Labeled frame (load_and_label / load_fleet output).
+        processes: Worker processes (default: os.cpu_count(); 1 runs in-process).
+        threshold: Variance threshold of the constant-sensor screen.
+        windows: Rolling windows of the features (default: FEATURE_WINDOWS).
+        hi_window: Trailing window of the HI smoothing.
+        regime_normalizer: Optional fitted RegimeNormalizer for the sensors
+                           (NORMALIZATION = "regime"); the settings stay globally scaled.
+
+    Returns:
+        tuple: (df_final, fitted) where fitted holds kept_sensors, scaler, feature_cols,
+               hi_features, pca_mean, pca_component, hi_min, hi_max and hi_flip.
+    """
+    processes = processes or os.cpu_count() or 1
+    windows = list(FEATURE_WINDOWS if windows is None else windows)
+    if not is_sorted(df):
+        df = df.sort_values(by=SORT_KEYS)
+    dtype = np.dtype(float_dtype_of(df, [c for c in SENSOR_COLS if c in df.columns]))
+    sensor_cols = [c for c in df.columns if c in SENSOR_COLS]
+    raw_cols = SETTING_COLS + sensor_cols
+    n_rows = len(df)
+
+    starts, _, _ = segment_positions(df['engine_id'].to_numpy())
+    shards = _row_tiles(starts, n_rows, -(-n_rows // (processes * SHARDS_PER_PROCESS)))
+    print(f"Parallel run: {n_rows} rows, {len(starts)} engines, {len(shards)} shards, {processes} processes")
+
+    inputs = SharedArrays({
+        'engine_id': df['engine_id'].to_numpy(),
+        'cycle': df['cycle'].to_numpy(),
+        'raw': df[raw_cols].to_numpy(dtype=dtype).T,
+    })
+    params = None
+    out_path = None
+    pool = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    try:
+        ctx = {'inputs': inputs.spec, 'raw_cols': raw_cols, 'dtype': dtype.str}
+
+        # Pass 1: global statistics
+        moments = RunningMoments(raw_cols)
+        for part in _run(pool, _shard_moments, ctx, shards):
+            moments.merge(part)
+        sample_var = moments.var(ddof=1)
+        kept_sensors = [s for s in sensor_cols if sample_var[s] >= threshold]
+        print(f"Sensors removed: {[s for s in sensor_cols if s not in kept_sensors]}")
+        global_cols = list(SETTING_COLS) if regime_normalizer is not None else SETTING_COLS + kept_sensors
+        scaler = moments.to_scaler(global_cols)
+
+        # Output block: normalized settings/sensors, features and the HI, one row per column
+        names = feature_column_names(kept_sensors, windows=windows)
+        value_cols = SETTING_COLS + kept_sensors + names + ['health_index_raw', 'health_index']
+        hi_features = select_health_features(SETTING_COLS + kept_sensors + names)
+        out_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        fd, out_path = tempfile.mkstemp(prefix='rul-parallel-', suffix='.bin', dir=out_dir)
+        os.close(fd)
+        out = np.memmap(out_path, dtype=dtype, mode='w+', shape=(len(value_cols), n_rows))
+
+        params = SharedArrays({'scaler_mean': scaler.mean_, 'scaler_var': scaler.var_})
+        ctx.update({'params': params.spec, 'kept_sensors': kept_sensors, 'global_cols': global_cols,
+                    'n_rows': n_rows, 'windows': windows, 'value_cols': value_cols,
+                    'hi_features': hi_features, 'hi_window': hi_window,
+                    'regime_normalizer': regime_normalizer,
+                    'out_path': out_path, 'out_shape': out.shape})
+
+        # Pass 2: per-shard features + HI covariance
+        covariance = StreamingCovariance(hi_features)
+        for part in _run(pool, _shard_features, ctx, shards):
+            covariance.merge(part)
+
+        # Fit the projection, then project/smooth per shard
+        pca_mean = covariance.mean()
+        component = first_component(covariance.cov())
+        _detach(params.shm.name)
+        params.release()
+        params = SharedArrays({'scaler_mean': scaler.mean_, 'scaler_var': scaler.var_,
+                               'pca_mean': pca_mean, 'pca_component': component})
+        ctx['params'] = params.spec
+
+        hi_min, hi_max = np.inf, -np.inf
+        n, mean_r, mean_c, co = 0, 0.0, 0.0, 0.0
+        for lo_b, hi_b, n_b, mr_b, mc_b, co_b in _run(pool, _shard_health_index, ctx, shards):
+            hi_min, hi_max = min(hi_min, lo_b), max(hi_max, hi_b)
+            n_ab = n + n_b
+            co += co_b + (mr_b - mean_r) * (mc_b - mean_c) * n * n_b / n_ab
+            mean_r += (mr_b - mean_r) * n_b / n_ab
+            mean_c += (mc_b - mean_c) * n_b / n_ab
+            n = n_ab
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        # With processes=1 the shards ran here and attached the blocks in this process
+        _detach(inputs.shm.name, *([params.shm.name] if params is not None else []), out_path)
+        inputs.release()
+        if params is not None:
+            params.release()
+        if out_path is not None:
+            # The parent's mapping stays valid after the name is removed
+            os.unlink(out_path)
+
+    # Same orientation rule as add_health_index: positive correlation with cycle -> flip
+    hi_flip = bool(co > 0)
+    hi_range = (hi_max - hi_min) or 1.0
+    hi = (out[-2].astype(np.float64) - hi_min) / hi_range
+    out[-1] = 1 - hi if hi_flip else hi
+
+    # Zero-copy gather: every output column is a view of one row of the mapped block
+    data = {'engine_id': df['engine_id'].to_numpy(), 'cycle': df['cycle'].to_numpy()}
+    for i, c in enumerate(SETTING_COLS + kept_sensors):
+        data[c] = np.asarray(out[i])
+    if 'RUL' in df.columns:
+        data['RUL'] = df['RUL'].to_numpy()
+    for i, c in enumerate(value_cols[len(SETTING_COLS) + len(kept_sensors):]):
+        data[c] = np.asarray(out[len(SETTING_COLS) + len(kept_sensors) + i])
+    df_final = pd.DataFrame(data, copy=False)
+
+    fitted = {
+        'kept_sensors': kept_sensors,
+        'scaler': scaler,
+        'feature_cols': [c for c in df_final.columns if c not in ['engine_id', 'cycle', 'RUL']
+                         and c not in ('health_index_raw', 'health_index')],
+        'hi_features': hi_features,
+        'pca_mean': pca_mean,
+        'pca_component': component,
+        'hi_min': float(hi_min),
+        'hi_max': float(hi_max),
+        'hi_flip': hi_flip,
+    }
+    return df_final, fitted
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from pipeline.config import DATA_PATH, TRAIN_FILE
+    from pipeline.data_loader import load_and_label
+    from pipeline.preprocessing import PreprocessingPipeline
+
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    df = load_and_label(os.path.join(DATA_PATH, TRAIN_FILE))
+
+    start = time.perf_counter()
+    reference = PreprocessingPipeline().fit_transform(df)
+    t_serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df_par, fitted = run_parallel(df, processes=processes)
+    t_parallel = time.perf_counter() - start
+
+    cols = [c for c in reference.columns if c != 'health_index_raw']
+    a = df_par[cols].to_numpy(np.float64)
+    b = reference[cols].to_numpy(np.float64)
+    err = (np.abs(a - b) / (np.abs(b).max(axis=0) + 1)).max()
+    print(f"Same columns: {list(df_par.columns) == list(reference.columns)}")
+    print(f"Serial {t_serial:.2f}s, parallel ({processes} processes) {t_parallel:.2f}s, "
+          f"max relative difference {err:.1e}")
@@ -0,0 +1,308 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from pipeline.config import NORMALIZATION, N_REGIMES, FEATURE_WINDOWS, BACKEND, HI_FIT_METHOD
+from pipeline.data_loader import SETTING_COLS
+from pipeline.sensor_cleaner import remove_constant_sensors
+from pipeline.normalizer import normalize_dataframe, RegimeNormalizer
+from pipeline.streaming_stats import RunningMoments
+from pipeline.feature_engineering import add_degradation_features, feature_column_names
+from pipeline.health_index import HealthIndexModel
+from pipeline.backends import get_backend
+
+PREPROCESSING_PATH = os.path.join(os.path.dirname(__file__), "models", "checkpoints", "preprocessing.pkl")
+
+EXCLUDE_COLS = ['engine_id', 'cycle', 'RUL']
+
+HI_COLS = ['health_index_raw', 'health_index']
+
+def required_features(*models):
+    """
+    Input columns the given fitted models were trained on, in first-seen order.
+
+    Understands XGBoost models (XGBRegressor / Booster / XGBoostBaseline) and
+    scikit-learn estimators (feature_names_in_). Returns None when any model does not
+    record its input names (e.g. the Transformer), meaning every feature is needed.
+    """
+    names = []
+    for model in models:
+        # XGBoostBaseline wraps the regressor in .model
+        model = getattr(model, 'model', model)
+        if hasattr(model, 'get_booster'):
+            feats = model.get_booster().feature_names
+        else:
+            feats = getattr(model, 'feature_names', None)
+        if feats is None:
+            feats = getattr(model, 'feature_names_in_', None)
+        if feats is None:
+            return None
+        names += [f for f in feats if f not in names]
+    return names
+
+class PreprocessingPipeline:
+    """
+    Fitted clean -> normalize -> features -> health index chain.
+
+    `fit` runs the usual training stages once and keeps everything they learned:
+    the kept sensors, the scaler (or the per-regime normalizer), the feature window
+    settings, the PCA projection and the HI min-max range/orientation (plus the
+    training max RUL used for the health percentage). `transform` replays those stages on new data with the
+    fitted parameters only, so test and serving data go through exactly the
+    training transform without refitting anything or reloading the training file.
+    """
+
+    def __init__(self, threshold: float = 1e-6, window_short: int = 5, window_long: int = 10,
+                 hi_window: int = 5, n_components: int = 1, normalization: str = NORMALIZATION,
+                 n_regimes: int = N_REGIMES, windows: list = None, backend: str = BACKEND,
+                 hi_method: str = HI_FIT_METHOD):
+        if normalization not in ("global", "regime"):
+            raise ValueError(f"normalization must be 'global' or 'regime', got {normalization!r}")
+        self.threshold = threshold
+        self.window_short = window_short
+        self.window_long = window_long
+        self.windows = list(FEATURE_WINDOWS if windows is None else windows)
+        self.hi_window = hi_window
+        self.n_components = n_components
+        self.normalization = normalization
+        self.n_regimes = n_regimes
+        self.backend = backend
+        self.hi_method = hi_method
+
+        # Fitted state (set by fit)
+        self.kept_sensors = None
+        self.scaler = None
+        self.regime_normalizer = None
+        self.feature_cols = None
+        self.hi_features = None
+        self.pca = None
+        self.hi_min = None
+        self.hi_max = None
+        self.hi_flip = False
+        self.health_model = None
+        self.max_rul = None
+
+    def get_params(self) -> dict:
+        """Constructor settings (what determines the fit besides the data)."""
+        return {
+            'threshold': self.threshold,
+            'window_short': self.window_short,
+            'window_long': self.window_long,
+            'windows': list(self.windows),
+            'hi_window': self.hi_window,
+            'n_components': self.n_components,
+            'normalization': self.normalization,
+            'n_regimes': self.n_regimes,
+            'backend': self.backend,
+            'hi_method': self.hi_method,
+        }
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.pca is not None
+
+    def fit(self, df: pd.DataFrame) -> "PreprocessingPipeline":
+        """Fits all stages on a labeled training frame."""
+        self.fit_transform(df)
+        return self
+
+    def fit_transform(self, df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        """
+        Fits all stages on a labeled training frame and returns the processed frame.
+
+        Args:
+            df: Output of load_and_label / load_fleet (or of `load` of the configured backend).
+            inplace: If True, `df` itself is cleaned and extended (ownership transfer)
+                     instead of being copied first. Later stages always work in place
+                     on the frame produced by the first one.
+
+        Returns:
+            pd.DataFrame: Same result as the step-by-step training chain.
+        """
+        backend = get_backend(self.backend)
+        if backend.name != "pandas":
+            if self.normalization == "global":
+                # The whole chain as one query of that backend (fills the same fitted state)
+                return backend.fit_transform(df, self)
+            print(f"Regime normalization is not available on the {backend.name} backend, using pandas")
+            if not isinstance(df, pd.DataFrame):
+                df, inplace = backend.to_pandas(df), True
+
+        # One pass of column statistics drives both the sensor screen and the scaler
+        sensor_cols = [c for c in df.columns if c.startswith('s')]
+        stats = RunningMoments.from_frame(df, SETTING_COLS + sensor_cols)
+
+        df_clean, self.kept_sensors = remove_constant_sensors(df, threshold=self.threshold, stats=stats,
+                                                              inplace=inplace)
+        if self.normalization == "regime":
+            # Sensors per operating regime, settings with the global scaler
+            self.regime_normalizer = RegimeNormalizer(self.n_regimes).fit(df_clean, self.kept_sensors)
+            df_clean = self.regime_normalizer.transform(df_clean, inplace=True)
+        df_norm, self.scaler = normalize_dataframe(df_clean, self._global_cols(), stats=stats, inplace=True)
+
+        df_feat = add_degradation_features(df_norm, self.kept_sensors, self.window_short, self.window_long,
+                                           windows=self.windows, inplace=True)
+        self.feature_cols = [c for c in df_feat.columns if c not in EXCLUDE_COLS]
+
+        # Projection, min-max range and orientation are kept for transform()
+        model = HealthIndexModel(method=self.hi_method, window=self.hi_window)
+        df_final = model.fit_transform(df_feat, self.feature_cols, inplace=True)
+        self.set_health_model(model)
+
+        if 'RUL' in df.columns:
+            self.max_rul = float(df['RUL'].max())
+        return df_final
+
+    def transform(self, df: pd.DataFrame, inplace: bool = False, required: list = None) -> pd.DataFrame:
+        """
+        Applies the fitted stages to new data (no parameter is re-estimated).
+
+        Per-engine quantities (rolling windows, drift baseline, HI smoothing) are
+        still computed from each engine's own history, exactly as in training.
+
+        Args:
+            df: Raw frame with engine_id, cycle, op1..op3 and at least the kept sensors.
+            inplace: If True, `df` itself is cleaned and extended instead of a copy.
+            required: Optional list of columns the caller needs (e.g. from
+                      `required_features(model)`); only the engineered columns behind
+                      them are computed, including the HI inputs if the health index
+                      is required. Default: every training feature column.
+
+        Returns:
+            pd.DataFrame: Frame with the training feature columns (or the required
+                          ones), health_index_raw and health_index (if required).
+        """
+        engineered, need_hi = self.resolve_required(required)
+        df_norm = self.normalize(df, inplace=inplace)
+        df_feat = add_degradation_features(df_norm, self.kept_sensors, self.window_short, self.window_long,
+                                           windows=self.windows, inplace=True,
+                                           required=engineered)
+        if not need_hi:
+            return df_feat
+
+        # Health index with the training projection, range and orientation
+        return self.health_model.transform(df_feat, inplace=True)
+
+    def set_health_model(self, model: HealthIndexModel):
+        """Stores a fitted HealthIndexModel (and its parameters in the flat HI attributes)."""
+        self.health_model = model
+        self.pca = model.to_pca()
+        self.hi_features = list(model.features)
+        self.hi_min, self.hi_max, self.hi_flip = model.hi_min, model.hi_max, model.flip
+
+    def resolve_required(self, required: list = None) -> tuple:
+        """
+        Resolves the columns a caller needs into the work transform() has to do.
+
+        Args:
+            required: Output columns needed (None for everything).
+
+        Returns:
+            tuple: (engineered, need_hi)
+                engineered: Generated feature columns to compute (None for all of them);
+                            includes the HI inputs when the health index is required.
+                need_hi: Whether health_index_raw / health_index must be computed.
+        """
+        if required is None:
+            return None, True
+        if not self.is_fitted:
+            raise RuntimeError("PreprocessingPipeline is not fitted. Call fit() or load() first.")
+
+        generated = feature_column_names(self.kept_sensors, self.window_short, self.window_long,
+                                         self.windows)
+        available = set(generated) | set(SETTING_COLS) | set(self.kept_sensors) | set(HI_COLS) | set(EXCLUDE_COLS)
+        unknown = [c for c in required if c not in available]
+        if unknown:
+            raise KeyError(f"Required columns are not produced by the fitted pipeline: {unknown}")
+
+        need_hi = any(c in HI_COLS for c in required)
+        # The health index is projected from these columns, so they are dependencies
+        wanted = set(required) | (set(self.hi_features) if need_hi else set())
+        return [c for c in generated if c in wanted], need_hi
+
+    def normalize(self, df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        """
+        Applies only the fitted cleaning and normalization stages (row-wise, no history needed).
+
+        Args:
+            df: Raw frame with engine_id, cycle, op1..op3 and at least the kept sensors.
+            inplace: If True, `df` itself is cleaned and normalized instead of a copy.
+
+        Returns:
+            pd.DataFrame: Frame with the non-kept sensors dropped and settings/sensors normalized.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("PreprocessingPipeline is not fitted. Call fit() or load() first.")
+
+        missing = [c for c in SETTING_COLS + self.kept_sensors if c not in df.columns]
+        if missing:
+            raise KeyError(f"Input is missing columns required by the fitted pipeline: {missing}")
+
+        drop = [c for c in df.columns if c.startswith('s') and c not in self.kept_sensors]
+        if inplace:
+            df.drop(columns=drop, inplace=True)
+            df_clean = df
+        else:
+            df_clean = df.drop(columns=drop)
+
+        # df_clean is owned from here on, so the remaining stages work in place
+        if self.regime_normalizer is not None:
+            df_clean = self.regime_normalizer.transform(df_clean, inplace=True)
+        df_norm, _ = normalize_dataframe(df_clean, self._global_cols(), scaler=self.scaler, inplace=True)
+        return df_norm
+
+    def _global_cols(self) -> list:
+        # Columns handled by the global scaler
+        if self.normalization == "regime":
+            return list(SETTING_COLS)
+        return SETTING_COLS + self.kept_sensors
+
+    def save(self, path: str = PREPROCESSING_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self, path)
+        print(f"Preprocessing pipeline saved to {path}")
+
+    @staticmethod
+    def load(path: str = PREPROCESSING_PATH) -> "PreprocessingPipeline":
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Preprocessing pipeline not found at {path}")
+        pipeline = joblib.load(path)
+        if not isinstance(pipeline, PreprocessingPipeline):
+            raise TypeError(f"{path} does not contain a PreprocessingPipeline")
+        return pipeline
+
+if __name__ == "__main__":
+    import tempfile
+    from pipeline.data_loader import load_and_label
+    from pipeline.config import DATA_PATH, TRAIN_FILE, TEST_FILE
+
+    df_train = load_and_label(os.path.join(DATA_PATH, TRAIN_FILE))
+    pipeline = PreprocessingPipeline()
+    df_fit = pipeline.fit_transform(df_train)
+
+    # Round trip through disk, then replay on the training data: must match fit_transform
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "preprocessing.pkl")
+        pipeline.save(path)
+        restored = PreprocessingPipeline.load(path)
+
+    df_replay = restored.transform(df_train)
+    cols = pipeline.feature_cols + ['health_index']
+    diff = np.abs(df_fit[cols].to_numpy() - df_replay[cols].to_numpy()) / (1 + np.abs(df_fit[cols].to_numpy()))
+    print(f"Kept sensors: {pipeline.kept_sensors}, HI features: {len(pipeline.hi_features)}, max RUL: {pipeline.max_rul}")
+    print(f"Replay on training data, max relative difference: {diff.max():.2e}")
+
+    # Lazy replay: a model that only reads a few columns (plus the health index)
+    subset = ['s2', 's11_rm10', 's4_trend', 'health_index']
+    engineered, _ = restored.resolve_required(subset)
+    df_lazy = restored.transform(df_train, required=subset)
+    lazy_diff = max(float(np.abs(df_lazy[c].to_numpy(np.float64) - df_fit[c].to_numpy(np.float64)).max())
+                    for c in subset)
+    print(f"Required {subset}: computed {len(engineered)} of {len(pipeline.feature_cols)} columns "
+          f"(HI inputs included), max difference {lazy_diff:.2e}")
+
+    test_path = os.path.join(DATA_PATH, TEST_FILE)
+    if os.path.exists(test_path):
+        df_test = restored.transform(load_and_label(test_path))
+        print(f"Test data transformed without refit: {df_test.shape}, "
+              f"HI range [{df_test['health_index'].min():.3f}, {df_test['health_index'].max():.3f}]")
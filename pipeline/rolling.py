@@ -0,0 +1,143 @@
+import numpy as np
+
+def _prefix(a):
+    # Prefix sums with a leading zero row: sum of rows [i, j) is out[j] - out[i]
+    out = np.empty((len(a) + 1,) + a.shape[1:], dtype=np.float64, order='F')
+    out[0] = 0.0
+    np.cumsum(a, axis=0, out=out[1:])
+    return out
+
+class SegmentRolling:
+    """
+    Trailing rolling mean / std / OLS slope over engine segments, for any set of windows.
+
+    The values are shifted by each engine's first reading and reduced once to
+    prefix sums of x, x^2 and tau*x (tau = row position inside the engine). Any
+    window statistic is then a difference of two prefix-sum rows, so every extra
+    window costs a few vector operations instead of another rolling pass.
+
+    A window is only evaluated when it lies completely inside one engine
+    (position >= window - 1); it never reads the previous engine's rows, so no
+    contamination has to be masked afterwards. Incomplete windows are 0, and
+    windows that contain a NaN are NaN (like pandas rolling with min_periods=window).
+
+    Works on one column (shape (rows,)) or several at once (shape (rows, columns));
+    results of the 2D form are column-major, so `result.T` is a contiguous
+    (columns, rows) array.
+    """
+
+    def __init__(self, values, pos):
+        """
+        Args:
+            values: Column(s) sorted by (engine_id, cycle).
+            pos: Position of every row inside its engine (see `segment_positions`).
+        """
+        # Column-major, so every column's cumulative sums run over contiguous memory
+        x = np.asfortranarray(values, dtype=np.float64)
+        self.pos = np.asarray(pos)
+        self.n = len(x)
+        tau = self.pos.astype(np.float64).reshape((-1,) + (1,) * (x.ndim - 1))
+
+        # Shift each engine by its first reading: the sums stay small, which keeps
+        # the variance (a difference of sums) well conditioned for raw sensor levels
+        segment = np.cumsum(self.pos == 0) - 1
+        first = x[self.pos == 0]
+        self.shift = np.take(first.T, segment, axis=-1).T if len(first) else np.zeros_like(x)
+        xs = x - self.shift
+
+        missing = np.isnan(xs)
+        self.c_nan = None
+        if missing.any():
+            self.c_nan = _prefix(missing.astype(np.float64))
+            xs = np.where(missing, 0.0, xs)
+
+        self.c1 = _prefix(xs)
+        self.c2 = _prefix(xs * xs)
+        self.ct = _prefix(tau * xs)
+
+    def _sums(self, c, w):
+        # Sum over rows (i - w, i] for every row i (rows with i < w - 1 get a partial sum;
+        # they are invalid anyway because such a window cannot fit in one engine)
+        out = np.empty_like(c[1:])
+        out[:w - 1] = c[1:w]
+        if w <= self.n:
+            out[w - 1:] = c[w:] - c[:-w]
+        return out
+
+    def _zeros(self):
+        return np.zeros_like(self.c1[1:])
+
+    def _finish(self, stat, w):
+        valid = self.pos >= w - 1
+        if stat.ndim > 1:
+            valid = valid[:, None]
+        out = np.where(valid, stat, 0.0)
+        if self.c_nan is not None:
+            has_nan = self._sums(self.c_nan, w) > 0
+            out[has_nan & valid] = np.nan
+        return out
+
+    def sum(self, w: int) -> np.ndarray:
+        """Trailing window sum (0 where the window is incomplete)."""
+        return self._finish(self._sums(self.c1, w) + w * self.shift, w)
+
+    def mean(self, w: int) -> np.ndarray:
+        """Trailing window mean (0 where the window is incomplete)."""
+        return self._finish(self._sums(self.c1, w) / w + self.shift, w)
+
+    def std(self, w: int, ddof: int = 1) -> np.ndarray:
+        """Trailing window standard deviation (0 where the window is incomplete or w <= ddof)."""
+        if w <= ddof:
+            return self._zeros()
+        s1 = self._sums(self.c1, w)
+        s2 = self._sums(self.c2, w)
+        var = (s2 - s1 * s1 / w) / (w - ddof)
+        return self._finish(np.sqrt(np.maximum(var, 0.0)), w)
+
+    def slope(self, w: int) -> np.ndarray:
+        """
+        Trailing least-squares slope per row over the last `w` rows
+        (0 where the window is incomplete or w < 2).
+        """
+        if w < 2:
+            return self._zeros()
+        s1 = self._sums(self.c1, w)
+        st = self._sums(self.ct, w)
+        tau_mean = self.pos - (w - 1) / 2.0
+        if s1.ndim > 1:
+            tau_mean = tau_mean[:, None]
+        # sum((tau - mean_tau) * x) / sum((tau - mean_tau)^2); the shift drops out
+        return self._finish((st - tau_mean * s1) / (w * (w * w - 1) / 12.0), w)
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+
+    # Random fleet: 2000 engines of 50-350 cycles, compared with per-engine pandas rolling
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(50, 350, 2000)
+    ids = np.repeat(np.arange(len(lengths)), lengths)
+    pos = np.arange(len(ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    x = 500 + np.cumsum(rng.normal(0, 1, len(ids)))
+
+    windows = [5, 10, 20, 30, 50]
+    start = time.perf_counter()
+    roll = SegmentRolling(x, pos)
+    results = {w: (roll.mean(w), roll.std(w), roll.slope(w)) for w in windows}
+    seconds = time.perf_counter() - start
+
+    g = pd.Series(x).groupby(ids)
+    for w in windows:
+        ref_mean = g.rolling(w).mean().to_numpy()
+        ref_std = g.rolling(w).std().to_numpy()
+        ok = ~np.isnan(ref_mean)
+        err_mean = np.abs(results[w][0][ok] - ref_mean[ok]).max()
+        err_std = np.abs(results[w][1][ok] - ref_std[ok]).max()
+        print(f"window {w:>2}: max |mean err| {err_mean:.1e}, max |std err| {err_std:.1e}")
+
+    # Slope check on the last window of engine 0
+    w = 10
+    end = lengths[0] - 1
+    ref_slope = np.polyfit(np.arange(w), x[end - w + 1:end + 1], 1)[0]
+    print(f"slope check: {results[w][2][end]:.6f} vs polyfit {ref_slope:.6f}")
+    print(f"{len(x)} rows, {len(windows)} windows x (mean, std, slope) in {seconds:.3f}s")
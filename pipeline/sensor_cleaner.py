@@ -1,7 +1,9 @@
 import pandas as pd
 import numpy as np
+from pipeline.streaming_stats import RunningMoments
 
-def remove_constant_sensors(df: pd.DataFrame, sensor_prefix: str = "s", threshold: float = 1e-6):
+def remove_constant_sensors(df: pd.DataFrame, sensor_prefix: str = "s", threshold: float = 1e-6,
+                            stats: RunningMoments = None, inplace: bool = False):
     """
     Identifies and removes sensor columns with variance below a specified threshold.
 
@@ -9,6 +11,11 @@ def remove_constant_sensors(df: pd.DataFrame, sensor_prefix: str = "s", threshol
         df: Input DataFrame containing sensor data.
         sensor_prefix: Prefix of sensor column names (default "s").
         threshold: Variance threshold below which a sensor is considered constant (default 1e-6).
+        stats: Optional RunningMoments covering the sensor columns. If given, the
+               variances are taken from it instead of another pass over `df`
+               (e.g. when they were streamed over chunks or merged across processes).
+        inplace: If True, the columns are dropped from `df` itself (no copy) and
+                 `df` is returned; the caller hands over ownership of the frame.
 
     Returns:
         tuple: (cleaned_df, kept_sensors)
@@ -22,14 +29,20 @@ def remove_constant_sensors(df: pd.DataFrame, sensor_prefix: str = "s", threshol
     
     # Compute variance for each sensor
     # We use var(ddof=1) which is unbiased sample variance, standard in pandas
-    variances = df[sensor_cols].var()
+    if stats is None:
+        stats = RunningMoments.from_frame(df, sensor_cols)
+    variances = stats.var(ddof=1)[sensor_cols]
     
     # Identify sensors to drop and keep
     drop_sensors = variances[variances < threshold].index.tolist()
     kept_sensors = variances[variances >= threshold].index.tolist()
     
     # Drop the constant sensors
-    cleaned_df = df.drop(columns=drop_sensors)
+    if inplace:
+        df.drop(columns=drop_sensors, inplace=True)
+        cleaned_df = df
+    else:
+        cleaned_df = df.drop(columns=drop_sensors)
     
     # Print statistics
     print(f"Original sensor count: {len(sensor_cols)}")
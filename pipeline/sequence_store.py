@@ -0,0 +1,211 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from pipeline.config import CACHE_PATH, SEQUENCE_DTYPE
+from pipeline.feature_engineering import segment_positions
+
+SEQUENCE_STORE_PATH = os.path.join(CACHE_PATH, "sequences")
+
+# Bump whenever the stored layout changes
+SEQUENCE_STORE_VERSION = 1
+
+META_FILE = "meta.json"
+
+# Rows converted per block while writing (bounds the temporary copy)
+WRITE_BLOCK_ROWS = 1 << 16
+
+class SequenceStore:
+    """
+    Persisted, memory-mapped feature rows for the sequence models.
+
+    A store is a directory with
+        rows.npy        (rows, features) feature rows, engine-ordered, float32 or float16
+        targets.npy     (rows,) float32 target of every row
+        engine_ids.npy  (engines,) engine id of every engine run
+        offsets.npy     (engines + 1,) first row of every engine (and the row count)
+        meta.json       features, target, default window, dtype and the fingerprint of
+                        the processed data the rows were taken from
+    Windows are never stored: `dataset` indexes them over the rows (WindowDataset),
+    so one store serves every window length.
+
+    `open` maps the arrays read-only, so any number of processes (training,
+    evaluation, the backend, DataLoader workers) share one copy through the page
+    cache. A store is written next to its final location and swapped in with a
+    rename, so readers never see a half-written one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.features = self.meta['features']
+        self.window = self.meta['window']
+        self.fingerprint = self.meta['fingerprint']
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode='r', allow_pickle=False)
+
+        self.rows = load("rows.npy")
+        self.targets = load("targets.npy")
+        self.engine_ids = load("engine_ids.npy")
+        self.offsets = load("offsets.npy")
+
+    @classmethod
+    def open(cls, path: str = None, fingerprint: str = None, dtype: str = SEQUENCE_DTYPE):
+        """
+        Opens the store for `fingerprint` (see `store_path`), or None if it is missing or stale.
+
+        Args:
+            path: Store directory (default: derived from fingerprint and dtype).
+            fingerprint: Fingerprint of the processed data it must have been built from.
+            dtype: Row dtype ("float32" or "float16").
+        """
+        path = path or store_path(fingerprint, dtype)
+        try:
+            store = cls(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        if store.meta.get('version') != SEQUENCE_STORE_VERSION:
+            return None
+        if fingerprint is not None and store.fingerprint != fingerprint:
+            return None
+        return store
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, feature_cols: list, fingerprint: str, window: int = 30,
+              target_col: str = "RUL", dtype: str = SEQUENCE_DTYPE, path: str = None) -> "SequenceStore":
+        """
+        Writes the rows of a processed frame as a store and opens it.
+
+        Args:
+            df: Processed frame sorted by (engine_id, cycle) (load_full_data output).
+            feature_cols: Feature columns of the rows (the sequence model inputs).
+            fingerprint: Identity of `df`, e.g. `full_data_fingerprint()`; the store is
+                         only reused for the same fingerprint.
+            window: Default window length of `dataset`.
+            target_col: Name of the target column.
+            dtype: Row dtype; "float16" halves the store (targets stay float32).
+            path: Store directory (default: derived from fingerprint and dtype).
+
+        Returns:
+            SequenceStore: The opened store.
+        """
+        path = path or store_path(fingerprint, dtype)
+        engine_ids = df['engine_id'].to_numpy()
+        if len(engine_ids) and (engine_ids[1:] < engine_ids[:-1]).any():
+            raise ValueError("The frame must be sorted by engine_id")
+        n_rows = len(df)
+        starts, _, _ = segment_positions(engine_ids)
+
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        # Rows are converted block by block straight into the mapped file; values beyond
+        # the dtype's range (e.g. drift over a constant baseline in float16) are clipped
+        dtype = np.dtype(dtype)
+        limit = np.finfo(dtype).max
+        rows = np.lib.format.open_memmap(os.path.join(tmp_path, "rows.npy"), mode='w+',
+                                         dtype=dtype, shape=(n_rows, len(feature_cols)))
+        clipped = 0
+        for lo in range(0, n_rows, WRITE_BLOCK_ROWS):
+            hi = min(lo + WRITE_BLOCK_ROWS, n_rows)
+            block = df[feature_cols].iloc[lo:hi].to_numpy(np.float32)
+            clipped += int((np.abs(block) > limit).sum())
+            rows[lo:hi] = np.clip(block, -limit, limit)
+        rows.flush()
+        if clipped:
+            print(f"Warning: {clipped} values outside the {dtype.name} range were clipped")
+        del rows
+        np.save(os.path.join(tmp_path, "targets.npy"), df[target_col].to_numpy(np.float32), allow_pickle=False)
+        np.save(os.path.join(tmp_path, "engine_ids.npy"), engine_ids[starts], allow_pickle=False)
+        np.save(os.path.join(tmp_path, "offsets.npy"), np.r_[starts, n_rows].astype(np.int64), allow_pickle=False)
+
+        meta = {
+            'version': SEQUENCE_STORE_VERSION,
+            'fingerprint': fingerprint,
+            'features': list(feature_cols),
+            'target': target_col,
+            'window': window,
+            'dtype': dtype.name,
+            'n_rows': n_rows,
+            'n_engines': len(starts),
+        }
+        with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        os.replace(tmp_path, path)
+        print(f"Sequence store written to {path}: {n_rows} rows x {len(feature_cols)} features ({meta['dtype']})")
+        return cls(path)
+
+    def dataset(self, engines=None, window: int = None, max_samples: int = None, min_length: int = None):
+        """
+        WindowDataset over the mapped rows (nothing is copied).
+
+        Args:
+            engines: Optional engine ids to include (default: all), e.g. one split.
+            window: Window length (default: the store's window).
+            max_samples: Optional limit on the number of windows.
+            min_length: Shortest sample (default: the window; shorter prefixes are padded).
+        """
+        from pipeline.models.window_dataset import WindowDataset
+
+        starts = np.asarray(self.offsets[:-1])
+        lengths = np.diff(self.offsets)
+        if engines is not None:
+            keep = np.isin(self.engine_ids, np.asarray(engines))
+            starts, lengths = starts[keep], lengths[keep]
+        return WindowDataset(self.rows, self.targets, starts, lengths,
+                             self.window if window is None else window, max_samples, min_length)
+
+    def engine_rows(self, engine_id) -> slice:
+        """Row range of one engine (empty if the engine is not stored)."""
+        i = np.searchsorted(self.engine_ids, engine_id)
+        if i >= len(self.engine_ids) or self.engine_ids[i] != engine_id:
+            return slice(0, 0)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+def store_path(fingerprint: str, dtype: str = SEQUENCE_DTYPE, root: str = SEQUENCE_STORE_PATH) -> str:
+    """Directory of the store built from `fingerprint` with rows of `dtype`."""
+    h = hashlib.blake2b(f"v{SEQUENCE_STORE_VERSION}|{fingerprint}|{np.dtype(dtype).name}".encode(),
+                        digest_size=16)
+    return os.path.join(root, h.hexdigest())
+
+def get_or_build(fingerprint: str, load_frame, window: int = 30, dtype: str = SEQUENCE_DTYPE,
+                 root: str = SEQUENCE_STORE_PATH) -> SequenceStore:
+    """
+    Opens the store for `fingerprint`, building it (and dropping stale stores) on a miss.
+
+    Args:
+        fingerprint: Identity of the processed data (e.g. `full_data_fingerprint()`).
+        load_frame: Callable returning (df, feature_cols), only called on a miss.
+        window: Default window length of a new store.
+        dtype: Row dtype ("float32" or "float16").
+        root: Directory holding the stores.
+    """
+    path = store_path(fingerprint, dtype, root)
+    store = SequenceStore.open(path, fingerprint)
+    if store is not None:
+        print(f"Sequence store hit: {path}")
+        return store
+
+    df, feature_cols = load_frame()
+    store = SequenceStore.build(df, feature_cols, fingerprint, window=window, dtype=dtype, path=path)
+    # Stores of older data are never opened again (other dtypes of this data are kept)
+    for name in os.listdir(root):
+        other = os.path.join(root, name)
+        if other == path or '.tmp-' in name or not os.path.isdir(other):
+            continue
+        try:
+            with open(os.path.join(other, META_FILE)) as f:
+                stale = json.load(f).get('fingerprint') != fingerprint
+        except (OSError, ValueError):
+            stale = True
+        if stale:
+            shutil.rmtree(other, ignore_errors=True)
+    return store
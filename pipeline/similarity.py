@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.neighbors import KDTree
+from pipeline.config import SIMILARITY_WINDOW, SIMILARITY_K, SIMILARITY_METHOD
+from pipeline.feature_engineering import segment_positions
+
+SIMILARITY_METHODS = ("brute", "kdtree")
+
+# Upper bound on the elements of one query-block x index distance matrix of the brute
+# search (float32, so 16M elements are 64 MB)
+BLOCK_ELEMENTS = 1 << 24
+
+def last_windows(df: pd.DataFrame, window: int = SIMILARITY_WINDOW, col: str = 'health_index') -> tuple:
+    """
+    The trailing `window` values of `col` of every engine, as one query matrix.
+
+    Engines with fewer rows are left-padded with their first value (a short history
+    is treated as a healthy, flat start).
+
+    Args:
+        df: Frame sorted by (engine_id, cycle) with `col`.
+        window: Embedding length.
+        col: Trajectory column.
+
+    Returns:
+        tuple: (engine_ids, Q) with Q of shape (engines, window), float32.
+    """
+    ids = df['engine_id'].to_numpy()
+    values = df[col].to_numpy(np.float32)
+    starts, lengths, _ = segment_positions(ids)
+    ends = starts + lengths
+    # Row of every (engine, step), clipped to the engine's first row where it is too short
+    rows = ends[:, None] - window + np.arange(window)
+    rows = np.maximum(rows, starts[:, None])
+    return ids[starts], np.ascontiguousarray(values[rows])
+
+class TrajectoryIndex:
+    """
+    Nearest-trajectory index over fixed-length Health Index windows of training engines.
+
+    Every training engine contributes one embedding per offset: the `window`
+    consecutive HI values ending at that cycle (offsets every `stride` cycles),
+    stored row by row in one contiguous (windows, window) float32 matrix together
+    with the engine id and the RUL at the window's last cycle.
+
+    A query is the recent HI window of an engine. Its neighbors are the `k`
+    training engines whose best-matching offset is closest (Euclidean distance),
+    each engine counted once at that offset; the matched RUL is what was left of
+    that engine's life at the matched cycle. Two exact search methods:
+      brute   blocked NumPy distance matrix (|q|^2 - 2 q.x + |x|^2), reduced to the
+              minimum per engine segment, then a partial sort over engines
+      kdtree  sklearn KDTree over the windows; the k nearest windows are fetched
+              with a growing k until they cover k distinct engines (the first hit
+              of an engine is its best offset, so the result equals brute)
+    Both answer whole batches of queries (one per engine of the fleet) at once.
+    """
+
+    def __init__(self, window: int = SIMILARITY_WINDOW, stride: int = 1, method: str = SIMILARITY_METHOD,
+                 col: str = 'health_index'):
+        if method not in SIMILARITY_METHODS:
+            raise ValueError(f"method must be one of {SIMILARITY_METHODS}, got {method!r}")
+        self.window = window
+        self.stride = stride
+        self.method = method
+        self.col = col
+
+        # Built state
+        self.embeddings = None
+        self.engine_ids = None
+        self.rul = None
+        self.engines = None
+        self.segment_starts = None
+        self._sq_norms = None
+        self._tree = None
+
+    def build(self, df: pd.DataFrame, target_col: str = 'RUL') -> "TrajectoryIndex":
+        """
+        Indexes every complete window of the training frame.
+
+        Args:
+            df: Frame sorted by (engine_id, cycle) with the trajectory column
+                (add_health_index output) and `target_col`. Engines shorter than
+                `window` contribute no window.
+            target_col: Remaining-life column read at each window's last cycle.
+
+        Returns:
+            TrajectoryIndex: self
+        """
+        ids = df['engine_id'].to_numpy()
+        values = np.ascontiguousarray(df[self.col].to_numpy(np.float32))
+        _, _, pos = segment_positions(ids)
+
+        # Windows end at rows whose position in the engine is >= window - 1
+        ends = np.flatnonzero((pos >= self.window - 1) & ((pos - (self.window - 1)) % self.stride == 0))
+        windows = np.lib.stride_tricks.sliding_window_view(values, self.window)
+        self.embeddings = np.ascontiguousarray(windows[ends - (self.window - 1)])
+        self.engine_ids = ids[ends]
+        self.rul = df[target_col].to_numpy(np.float32)[ends]
+
+        self.segment_starts, _, _ = segment_positions(self.engine_ids)
+        self.engines = self.engine_ids[self.segment_starts]
+        self._sq_norms = np.einsum('ij,ij->i', self.embeddings, self.embeddings)
+        self._tree = KDTree(self.embeddings) if self.method == "kdtree" else None
+        print(f"Indexed {len(self.embeddings)} HI windows of {len(self.engines)} engines "
+              f"(window={self.window}, stride={self.stride}, {self.method}).")
+        return self
+
+    def query(self, Q, k: int = SIMILARITY_K, exclude=None) -> tuple:
+        """
+        Finds the `k` most similar training engines for every query window.
+
+        Args:
+            Q: Query windows, shape (window,) or (queries, window).
+            k: Number of neighbor engines.
+            exclude: Optional engine id per query (scalar or array) left out of its
+                     own neighbors, e.g. the query engine itself when the index was
+                     built on the same data.
+
+        Returns:
+            tuple: (distances, engine_ids, rul), each (queries, k), sorted by distance.
+                   Columns beyond the number of available engines hold inf / -1 / nan.
+        """
+        if self.embeddings is None:
+            raise ValueError("The index is not built. Call build() first.")
+        Q = np.atleast_2d(np.asarray(Q, dtype=np.float32))
+        if Q.shape[1] != self.window:
+            raise ValueError(f"Query windows must have {self.window} values, got {Q.shape[1]}")
+        if exclude is not None:
+            exclude = np.broadcast_to(np.asarray(exclude), (len(Q),))
+
+        if self.method == "kdtree":
+            dist, seg = self._query_tree(Q, k, exclude)
+        else:
+            dist, seg = self._query_brute(Q, k, exclude)
+
+        rows = np.where(seg >= 0, seg, 0)
+        engine_ids = np.where(seg >= 0, self.engine_ids[rows], -1)
+        rul = np.where(seg >= 0, self.rul[rows], np.nan)
+        return dist, engine_ids, rul
+
+    def _query_brute(self, Q, k, exclude):
+        n_queries = len(Q)
+        n_engines = len(self.engines)
+        k_eff = min(k, n_engines)
+        dist = np.full((n_queries, k), np.inf)
+        best = np.full((n_queries, k), -1, dtype=np.int64)
+        if exclude is not None:
+            excluded = np.searchsorted(self.engines, exclude)
+            excluded[(excluded >= n_engines) | (self.engines[np.minimum(excluded, n_engines - 1)] != exclude)] = -1
+
+        n_windows = len(self.embeddings)
+        block = max(1, BLOCK_ELEMENTS // max(n_windows, 1))
+        # Window columns of every engine, padded to the longest engine by repeating its
+        # last column (a repeat never precedes the first occurrence of a minimum)
+        segment_ends = np.r_[self.segment_starts[1:], n_windows]
+        max_len = int((segment_ends - self.segment_starts).max())
+        segment_cols = np.minimum(self.segment_starts[:, None] + np.arange(max_len),
+                                  segment_ends[:, None] - 1).astype(np.int32)
+        q_norms = np.einsum('ij,ij->i', Q, Q)
+        for lo in range(0, n_queries, block):
+            hi = min(lo + block, n_queries)
+            # Squared distances to every window, then the best offset of every engine
+            d2 = Q[lo:hi] @ self.embeddings.T
+            d2 *= -2
+            d2 += q_norms[lo:hi, None]
+            d2 += self._sq_norms[None, :]
+            per_engine = np.minimum.reduceat(d2, self.segment_starts, axis=1)
+            if exclude is not None:
+                r = np.flatnonzero(excluded[lo:hi] >= 0)
+                per_engine[r, excluded[lo:hi][r]] = np.inf
+
+            top = np.argpartition(per_engine, k_eff - 1, axis=1)[:, :k_eff] if k_eff < n_engines \
+                else np.broadcast_to(np.arange(n_engines), (hi - lo, n_engines))
+            top_d = np.take_along_axis(per_engine, top, axis=1)
+            order = np.argsort(top_d, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_d = np.take_along_axis(top_d, order, axis=1)
+
+            # Row of the matched offset inside each selected engine
+            cols = segment_cols[top]
+            cand = np.take_along_axis(d2, cols.reshape(hi - lo, -1), axis=1).reshape(cols.shape)
+            rows = np.take_along_axis(cols, cand.argmin(axis=2)[..., None], axis=2)[..., 0]
+            best[lo:hi, :k_eff] = np.where(np.isinf(top_d), -1, rows)
+        # Distances of the matches recomputed directly (the expanded form cancels in float32)
+        found = best >= 0
+        diff = Q[:, None, :] - self.embeddings[np.where(found, best, 0)]
+        dist[found] = np.sqrt(np.einsum('qkw,qkw->qk', diff, diff, dtype=np.float64))[found]
+        return dist, best
+
+    def _query_tree(self, Q, k, exclude):
+        n_queries = len(Q)
+        n_windows = len(self.embeddings)
+        dist = np.full((n_queries, k), np.inf)
+        best = np.full((n_queries, k), -1, dtype=np.int64)
+
+        pending = np.arange(n_queries)
+        n_fetch = min(4 * k, n_windows)
+        while len(pending):
+            d, idx = self._tree.query(Q[pending], k=n_fetch)
+            unresolved = []
+            for q, d_row, i_row in zip(pending, d, idx):
+                engines = self.engine_ids[i_row]
+                keep = np.ones(len(i_row), dtype=bool)
+                if exclude is not None:
+                    keep &= engines != exclude[q]
+                # First (nearest) window of every engine
+                _, first = np.unique(engines[keep], return_index=True)
+                first = np.flatnonzero(keep)[np.sort(first)]
+                if len(first) < k and n_fetch < n_windows:
+                    unresolved.append(q)
+                    continue
+                first = first[:k]
+                dist[q, :len(first)] = d_row[first]
+                best[q, :len(first)] = i_row[first]
+            pending = np.asarray(unresolved, dtype=np.int64)
+            n_fetch = min(2 * n_fetch, n_windows)
+        return dist, best
+
+    def predict(self, Q, k: int = SIMILARITY_K, exclude=None) -> np.ndarray:
+        """
+        Similarity-based RUL: inverse-distance weighted mean of the neighbors' matched RUL.
+
+        Args:
+            Q, k, exclude: As in `query`.
+
+        Returns:
+            np.ndarray: Estimated RUL per query window.
+        """
+        dist, _, rul = self.query(Q, k, exclude)
+        weights = np.where(np.isfinite(dist), 1.0 / (dist + 1e-6), 0.0)
+        return (weights * np.nan_to_num(rul)).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-12)
+
+    def predict_fleet(self, df: pd.DataFrame, k: int = SIMILARITY_K, exclude_self: bool = False) -> pd.Series:
+        """
+        Similarity RUL at the last cycle of every engine of `df`, in one batch query.
+
+        Args:
+            df: Frame sorted by (engine_id, cycle) with the trajectory column.
+            k: Number of neighbor engines.
+            exclude_self: Leave each engine out of its own neighbors (when `df` is
+                          the data the index was built on).
+
+        Returns:
+            pd.Series: Estimated RUL indexed by engine_id.
+        """
+        ids, Q = last_windows(df, self.window, self.col)
+        preds = self.predict(Q, k, exclude=ids if exclude_self else None)
+        return pd.Series(preds, index=pd.Index(ids, name='engine_id'), name='rul_similarity')
+
+    def save(self, path: str):
+        # The KD-tree is rebuilt on load (cheap, and keeps the file small)
+        tree, self._tree = self._tree, None
+        try:
+            joblib.dump(self, path)
+        finally:
+            self._tree = tree
+        print(f"Similarity index saved to {path}")
+
+    @staticmethod
+    def load(path: str) -> "TrajectoryIndex":
+        index = joblib.load(path)
+        if index.method == "kdtree" and index.embeddings is not None:
+            index._tree = KDTree(index.embeddings)
+        return index
+
+
+if __name__ == "__main__":
+    import os
+    from pipeline.config import DATA_PATH, TRAIN_FILE
+    from pipeline.data_loader import load_and_label
+    from pipeline.preprocessing import PreprocessingPipeline
+    from pipeline.utils import compute_metrics
+
+    df = load_and_label(os.path.join(DATA_PATH, TRAIN_FILE))
+    df = PreprocessingPipeline().fit_transform(df)
+    index = TrajectoryIndex().build(df)
+
+    # Leave-one-engine-out estimate 60 cycles before the end of every engine
+    cut = df[df.groupby('engine_id')['cycle'].transform('max') - df['cycle'] >= 60]
+    preds = index.predict_fleet(cut, exclude_self=True)
+    truth = cut.groupby('engine_id')['RUL'].last()
+    rmse, mae = compute_metrics(truth.loc[preds.index], preds)
+    print(f"Similarity RUL (k={SIMILARITY_K}): RMSE {rmse:.2f}, MAE {mae:.2f}")
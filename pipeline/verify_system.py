@@ -170,7 +170,7 @@ def verify_system():
                 
                 if X_seq is not None and len(X_seq) > 0:
                     # Take 1 sequence
-                    sample_seq = torch.tensor(X_seq[0:1], dtype=torch.float32).to(DEVICE)
+                    sample_seq = torch.as_tensor(X_seq[0:1], dtype=torch.float32).to(DEVICE)
                     true_rul = y_seq[0]
                     
                     with torch.no_grad():
@@ -198,7 +198,7 @@ def verify_system():
     print("\nSTEP 5 — MC Dropout Uncertainty Check")
     if results["Transformer"] == "PASS" and model is not None:
         try:
-            sample_seq = torch.tensor(X_seq[0:1], dtype=torch.float32).to(DEVICE)
+            sample_seq = torch.as_tensor(X_seq[0:1], dtype=torch.float32).to(DEVICE)
             # predict_uncertainty(model, X_seq, n_samples=50)
             mean_preds, std_preds, all_preds = predict_uncertainty(model, sample_seq, n_samples=30)
             
@@ -227,7 +227,7 @@ def verify_system():
             os.makedirs(output_dir, exist_ok=True)
             debug_plot_path = os.path.join(output_dir, "debug.png")
             
-            sample_seq = torch.tensor(X_seq[0:1], dtype=torch.float32).to(DEVICE)
+            sample_seq = torch.as_tensor(X_seq[0:1], dtype=torch.float32).to(DEVICE)
             
             with torch.no_grad():
                  pred, attn_weights = model(sample_seq, return_attention=True)
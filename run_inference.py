@@ -8,57 +8,60 @@ import joblib
 # Adjust path to ensure we can import pipeline
 sys.path.append(os.getcwd())
 
-from pipeline.data_loader import load_and_label
-from pipeline.sensor_cleaner import remove_constant_sensors
-from pipeline.normalizer import normalize_dataframe
-from pipeline.feature_engineering import add_degradation_features
-from pipeline.health_index import add_health_index
+from pipeline.data_loader import load_fleet
+from pipeline.preprocessing import PreprocessingPipeline, PREPROCESSING_PATH
 from pipeline.dataset_builder import build_sequence_dataset
 from pipeline.models.transformer_model import RULTransformer
 from pipeline.models.uncertainty import predict_uncertainty
 from pipeline.models.train_transformer import DEVICE
-from pipeline.utils import compute_health_percentage, infer_max_rul_from_training
-from pipeline.config import DATA_PATH, TEST_FILE, TRAIN_FILE
+from pipeline.utils import compute_health_percentage
+from pipeline.models.model_meta import feature_mismatch
+from pipeline.config import DATA_PATH, TEST_FILES, TRAIN_FILES
 
-def load_and_process_test_data():
+def load_preprocessing_pipeline():
     """
-    Loads test data and applies the same preprocessing pipeline as training.
+    Loads the preprocessing pipeline fitted during training.
+    If no checkpoint exists yet, it is fitted once on the training data and saved.
+    Returns:
+        PreprocessingPipeline: Fitted pipeline
+    """
+    try:
+        preprocessor = PreprocessingPipeline.load(PREPROCESSING_PATH)
+        print(f"Preprocessing pipeline loaded from {PREPROCESSING_PATH}")
+    except FileNotFoundError:
+        print(f"No preprocessing pipeline at {PREPROCESSING_PATH}; fitting it on the training data once...")
+        preprocessor = PreprocessingPipeline()
+        preprocessor.fit(load_fleet(TRAIN_FILES, data_path=DATA_PATH))
+        preprocessor.save(PREPROCESSING_PATH)
+    return preprocessor
+
+def load_and_process_test_data(preprocessor=None):
+    """
+    Loads test data and applies the preprocessing pipeline fitted on the training data
+    (kept sensors, scaler, feature windows, PCA and HI range/orientation; nothing is refit).
+    Args:
+        preprocessor: Optional fitted PreprocessingPipeline (loaded from its checkpoint if None)
     Returns:
         df_final: Processed DataFrame with health_index
-        feature_cols: List of feature column names
-        scaler: Normalizer (for reference if needed)
-        pca: PCA model (for reference if needed)
+        feature_cols: Transformer input columns (every column but engine_id, cycle and RUL,
+                      as in training)
+        preprocessor: The fitted PreprocessingPipeline used
     """
-    print("Loading test data...")
-    test_file_path = os.path.join(DATA_PATH, TEST_FILE)
+    if preprocessor is None:
+        preprocessor = load_preprocessing_pipeline()
     
+    print("Loading test data...")
     # 1. Load Data
-    df = load_and_label(test_file_path)
+    df = load_fleet(TEST_FILES, data_path=DATA_PATH)
     print(f"Test data loaded. Shape: {df.shape}")
     
-    # 2. Clean Sensors (use same logic as training)
-    df_clean, kept_sensors = remove_constant_sensors(df)
-    print(f"Shape after cleaning: {df_clean.shape}")
-    
-    # 3. Normalize Data
-    setting_cols = ['op1', 'op2', 'op3']
-    features_to_normalize = setting_cols + kept_sensors
-    df_norm, scaler = normalize_dataframe(df_clean, features_to_normalize)
-    print(f"Shape after normalization: {df_norm.shape}")
-    
-    # 4. Feature Engineering
-    df_feat = add_degradation_features(df_norm, kept_sensors)
-    print(f"Shape after feature engineering: {df_feat.shape}")
-    
-    # 5. Health Index
-    print("Computing health index...")
-    exclude_cols = ['engine_id', 'cycle', 'RUL']
-    feature_cols = [c for c in df_feat.columns if c not in exclude_cols]
-    
-    df_final, pca = add_health_index(df_feat, feature_cols)
+    # 2-5. Clean, normalize, features and Health Index with the training parameters
+    df_final = preprocessor.transform(df)
+    print(f"Shape after preprocessing: {df_final.shape}")
     print(f"Health Index computed. Min: {df_final['health_index'].min():.4f}, Max: {df_final['health_index'].max():.4f}")
     
-    return df_final, feature_cols, scaler, pca
+    feature_cols = [c for c in df_final.columns if c not in ['engine_id', 'cycle', 'RUL']]
+    return df_final, feature_cols, preprocessor
 
 def load_models():
     """
@@ -87,6 +90,12 @@ def load_models():
     xgb_model = joblib.load(xgb_path)
     print(f"XGBoost model loaded from {xgb_path}")
     
+    # Checkpoints trained on older feature definitions still load, but say so
+    for path in (trans_path, xgb_path):
+        mismatch = feature_mismatch(path)
+        if mismatch:
+            print(f"Warning: {mismatch}")
+    
     return transformer, xgb_model
 
 def run_inference():
@@ -103,14 +112,11 @@ def run_inference():
     print("=" * 60)
     
     # 1. Load and process test data
-    df_test, feature_cols, scaler, pca = load_and_process_test_data()
+    df_test, feature_cols, preprocessor = load_and_process_test_data()
     
-    # Get max_rul from training data for health percentage calculation
-    print("\nInferring max_rul from training data...")
-    train_file_path = os.path.join(DATA_PATH, TRAIN_FILE)
-    df_train_raw = load_and_label(train_file_path)
-    max_rul = infer_max_rul_from_training(df_train_raw)
-    print(f"Max RUL from training: {max_rul:.2f}")
+    # max_rul of the training data (for health percentage) is stored with the pipeline
+    max_rul = preprocessor.max_rul
+    print(f"\nMax RUL from training: {max_rul:.2f}")
     
     # 2. Build sequence dataset per engine
     print("\nBuilding sequence dataset (window=30)...")
@@ -128,8 +134,8 @@ def run_inference():
     
     # Load Transformer now that we know input_dim
     trans_path = "pipeline/models/checkpoints/transformer.pt"
-    transformer = RULTransformer(input_dim=input_dim, d_model=48, nhead=4, num_layers=1, dropout=0.1).to(DEVICE)
-    transformer.load_state_dict(torch.load(trans_path))
+    transformer = RULTransformer(input_dim=input_dim, d_model=64, nhead=4, num_layers=2, dropout=0.1).to(DEVICE)
+    transformer.load_state_dict(torch.load(trans_path, map_location=DEVICE))
     transformer.eval()
     print(f"Transformer model loaded successfully")
     
@@ -158,7 +164,7 @@ def run_inference():
         engine_id = engine_ids[i]
         
         # Prepare sample
-        sample_seq = torch.tensor(X_seq[i:i+1], dtype=torch.float32).to(DEVICE)
+        sample_seq = torch.as_tensor(X_seq[i:i+1], dtype=torch.float32).to(DEVICE)
         
         # Predict RUL using Transformer (primary model)
         with torch.no_grad():
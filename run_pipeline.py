@@ -1,10 +1,7 @@
-from pipeline.data_loader import load_and_label
-from pipeline.sensor_cleaner import remove_constant_sensors
-from pipeline.normalizer import normalize_dataframe
-from pipeline.feature_engineering import add_degradation_features
-from pipeline.health_index import add_health_index
+from pipeline.data_loader import load_fleet
+from pipeline.preprocessing import PreprocessingPipeline
 from pipeline.dataset_builder import build_tabular_dataset, build_sequence_dataset
-from pipeline.config import DATA_PATH, TRAIN_FILE
+from pipeline.config import DATA_PATH, TRAIN_FILES
 from pipeline.models.xgb_baseline import train_xgb_baseline_model
 from pipeline.models.evaluation import evaluate_track_a
 from pipeline.models.explainability import explain_track_a
@@ -14,42 +11,23 @@ import traceback
 def main():
     print("Running predictive maintenance pipeline...")
     
-    file_path = os.path.join(DATA_PATH, TRAIN_FILE)
-    
-    print(f"Loading data from {file_path}...")
+    print(f"Loading data from {DATA_PATH} {TRAIN_FILES}...")
     try:
         # 1. Load Data
-        df = load_and_label(file_path)
+        df = load_fleet(TRAIN_FILES, data_path=DATA_PATH)
         print(f"Data loaded successfully. Shape: {df.shape}")
         
-        # 2. Clean Sensors
-        print("\nCleaning sensors...")
-        df_clean, kept_sensors = remove_constant_sensors(df)
-        print(f"Shape after cleaning: {df_clean.shape}")
-        print(f"Kept sensors: {kept_sensors}")
-        
-        # 3. Normalize Data
-        print("\nNormalizing data...")
-        # Define features to normalize: settings (op1, op2, op3) + kept sensors
-        setting_cols = ['op1', 'op2', 'op3']
-        features_to_normalize = setting_cols + kept_sensors
-        
-        df_norm, scaler = normalize_dataframe(df_clean, features_to_normalize)
-        print(f"Shape after normalization: {df_norm.shape}")
+        # 2-5. Clean sensors, normalize, generate features and compute the Health Index.
+        # The fitted pipeline is saved so inference can replay it without refitting.
+        print("\nFitting preprocessing pipeline...")
+        preprocessor = PreprocessingPipeline()
+        df_final = preprocessor.fit_transform(df)
+        print(f"Kept sensors: {preprocessor.kept_sensors}")
+        print(f"Shape after preprocessing: {df_final.shape}")
+        print(f"Using {len(preprocessor.feature_cols)} features for HI calculation.")
+        preprocessor.save()
         
-        # 4. Feature Engineering
-        print("\nGenerating features...")
-        df_feat = add_degradation_features(df_norm, kept_sensors)
-        print(f"Shape after feature engineering: {df_feat.shape}")
-        print(f"Total number of columns: {df_feat.shape[1]}")
-        
-        # 5. Health Index
-        print("\nCalculating Health Index...")
         exclude_cols = ['engine_id', 'cycle', 'RUL']
-        feature_cols = [c for c in df_feat.columns if c not in exclude_cols]
-        print(f"Using {len(feature_cols)} features for HI calculation.")
-        
-        df_final, pca = add_health_index(df_feat, feature_cols)
         
         print(f"Health Index Min: {df_final['health_index'].min()}")
         print(f"Health Index Max: {df_final['health_index'].max()}")
@@ -111,8 +89,8 @@ def main():
         # Explain
         explain_track_a(model_path, X_full)
 
-    except FileNotFoundError:
-        print(f"Error: File not found at {file_path}")
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
     except Exception:
         print("An error occurred:")
         traceback.print_exc()